@@ -1,4 +1,5 @@
 from setup_firebase_deepseek import NewsManager
+from processing_ledger import backlog_query, ledger_update
 import asyncio
 import json
 import re
@@ -7,8 +8,14 @@ from firebase_admin import firestore
 
 
 class PublicFigureSummaryCategorizer:
-    def __init__(self):
-        self.news_manager = NewsManager()
+    def __init__(self, news_manager=None):
+        """
+        Args:
+            news_manager (NewsManager, optional): A shared manager to reuse. If omitted,
+                a new one is created and closed when the run finishes.
+        """
+        self._owns_manager = news_manager is None
+        self.news_manager = news_manager or NewsManager()
         self.categories = {
             "Creative Works": ["Music", "Film & TV", "Publications & Art", "Awards & Honors"],
             "Live & Broadcast": ["Concerts & Tours", "Fan Events", "Broadcast Appearances"],
@@ -21,7 +28,7 @@ class PublicFigureSummaryCategorizer:
         """
         Main function to fetch unprocessed public figure summaries and categorize them.
         If a figure_id is provided, it only processes that figure. Otherwise, it processes all figures.
-        It only processes summaries where 'is_processed_for_timeline' is False.
+        It only processes summaries in its ledger backlog ('ledger_stage' == 'summarized').
         """
         try:
             print("Starting public figure summary categorization process...")
@@ -58,9 +65,11 @@ class PublicFigureSummaryCategorizer:
                 
                 print(f"\nProcessing public figure {i+1}/{public_figure_count}: {public_figure_name} (ID: {public_figure_id})")
                 
-                # UPDATED QUERY: Fetch only documents where 'is_processed_for_timeline' is False.
-                summaries_ref = self.news_manager.db.collection("selected-figures").document(public_figure_id) \
-                                .collection("article-summaries").where("is_processed_for_timeline", "==", False).stream()
+                # Fetch only the summaries waiting to be categorized
+                summaries_ref = backlog_query(
+                    self.news_manager.db.collection("selected-figures").document(public_figure_id).collection("article-summaries"),
+                    "categorized"
+                ).stream()
                 
                 summaries = []
                 for summary_doc in summaries_ref:
@@ -78,9 +87,14 @@ class PublicFigureSummaryCategorizer:
                     summary_id = summary["id"]
                     summary_data = summary["data"]
                     
+                    summary_ref = self.news_manager.db.collection("selected-figures").document(public_figure_id) \
+                        .collection("article-summaries").document(summary_id)
+
                     summary_text = summary_data.get("summary", "")
                     if not summary_text:
                         print(f"  Skipping summary {j+1}/{summary_count} (ID: {summary_id}) - No summary text found.")
+                        # Nothing to categorize; advance it so it isn't re-read on every run
+                        summary_ref.update(ledger_update("categorized"))
                         continue
                     
                     print(f"  Categorizing summary {j+1}/{summary_count} (ID: {summary_id})")
@@ -94,15 +108,14 @@ class PublicFigureSummaryCategorizer:
                         print(f"  Failed to categorize summary {summary_id}. It will be re-processed on the next run.")
                         continue
                     
-                    # UPDATED UPDATE: Set 'is_processed_for_timeline' to True along with categories.
-                    self.news_manager.db.collection("selected-figures").document(public_figure_id) \
-                        .collection("article-summaries").document(summary_id).update({
-                            "mainCategory": categories_result["category"],
-                            "subcategory": categories_result["subcategory"],
-                            # "is_processed_for_timeline": True
-                        })
+                    # Store the categories and advance the ledger in the same write
+                    summary_ref.update({
+                        "mainCategory": categories_result["category"],
+                        "subcategory": categories_result["subcategory"],
+                        **ledger_update("categorized")
+                    })
                     
-                    print(f"  Successfully updated summary {summary_id} with categories and marked as processed.")
+                    print(f"  Successfully updated summary {summary_id} with categories and advanced it to 'categorized'.")
                     total_summaries_categorized += 1
             
             print(f"\nCategorization process completed! Categorized {total_summaries_categorized} new summaries.")
@@ -111,7 +124,8 @@ class PublicFigureSummaryCategorizer:
             print(f"An error occurred during the process: {e}")
             raise
         finally:
-            await self.news_manager.close()
+            if self._owns_manager:
+                await self.news_manager.close()
 
     async def categorize_summary(self, public_figure_name, summary_text):
         """
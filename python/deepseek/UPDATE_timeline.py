@@ -3,6 +3,9 @@ import json
 import argparse # Added
 from collections import defaultdict
 from setup_firebase_deepseek import NewsManager
+from compact_event_summaries_descriptions import COMPACTED_EVENT_MARKER_FIELD, COMPACTED_DESCRIPTION_MARKER_FIELD
+from processing_ledger import backlog_query, ledger_update, LEGACY_PROCESSED_FIELD
+from optimistic_writes import optimistic_write
 from typing import Union, Optional, Dict, Any, List
 
 # --- CONFIGURATION ---
@@ -12,9 +15,16 @@ CURATED_TIMELINE_COLLECTION = "curated-timeline"
 class CurationEngine:
     RECENT_EVENTS_CONTEXT_LIMIT = 50
     
-    def __init__(self, figure_id: str):
+    def __init__(self, figure_id: str, news_manager: NewsManager = None):
+        """
+        Args:
+            figure_id (str): The figure whose timeline is curated.
+            news_manager (NewsManager, optional): A shared manager to reuse. If omitted,
+                a new one is created and closed when the run finishes.
+        """
         self.figure_id = figure_id
-        self.news_manager = NewsManager()
+        self._owns_manager = news_manager is None
+        self.news_manager = news_manager or NewsManager()
         self.db = self.news_manager.db
         self.ai_client = self.news_manager.client
         self.ai_model = self.news_manager.model
@@ -92,6 +102,11 @@ class CurationEngine:
         **CRITICAL TITLE RULE 1:** The `event_title` you create must be a short, descriptive phrase summarizing a specific event.
         **CRITICAL TITLE RULE 2:** **AVOID creating overly broad, generic titles** like "Career Highlights" or "Group Activities."
 
+        **CRITICAL LENGTH RULE:** The text you return is displayed as-is, so write it in its final, compact form.
+        - `event_summary` must be 2-3 concise, engaging sentences.
+        - Each `timeline_points[].description` must be a single, clear, and concise sentence that keeps the key facts.
+        - Keep every existing `date` and `sourceIds` value of the points you return.
+
         You will ALWAYS return a complete `event_json` object with a concise title and a well-written summary.
         """
         user_prompt = f"""
@@ -139,6 +154,14 @@ class CurationEngine:
             "Incidents & Controversies": ["Legal & Scandal", "Accidents & Emergencies", "Public Backlash"]
         }
 
+    def _mark_compacted(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Sets the compaction markers at write time, since the curation prompt already returns compact text."""
+        event[COMPACTED_EVENT_MARKER_FIELD] = True
+        for point in event.get('timeline_points', []) or []:
+            if isinstance(point, dict):
+                point[COMPACTED_DESCRIPTION_MARKER_FIELD] = True
+        return event
+
     def _add_event_years(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Calculates and adds the 'event_years' field to an event object."""
         years = set()
@@ -151,13 +174,31 @@ class CurationEngine:
         return event
 
     # --- MODIFIED ---
+    def _mark_article_processed(self, source_id: str):
+        """Advances a summary past the timeline (its events are compacted at generation time)."""
+        article_ref = self.db.collection('selected-figures').document(self.figure_id).collection('article-summaries').document(source_id)
+        article_ref.update({LEGACY_PROCESSED_FIELD: True, **ledger_update("timeline_applied", "compacted")})
+
+    def _apply_decision(self, events: list, ai_decision: dict, event_json: dict) -> list:
+        """Returns `events` with a curation decision (CREATE_NEW or UPDATE_EXISTING) applied."""
+        events = list(events)
+        if ai_decision.get("action") == "UPDATE_EXISTING":
+            target_title = ai_decision.get("target_event_title")
+            if target_title:
+                for idx, event in enumerate(events):
+                    if event.get("event_title") == target_title:
+                        events[idx] = event_json
+                        return events
+        # CREATE_NEW, or an update whose target no longer exists
+        events.append(event_json)
+        return events
+
     def _fetch_unprocessed_articles(self) -> list:
-        """Fetches ALL unprocessed articles, regardless of their content."""
+        """Fetches ALL articles in the timeline's ledger backlog, regardless of their content."""
         print("Fetching ALL unprocessed articles...")
-        from google.cloud.firestore_v1.base_query import FieldFilter
         
         articles_ref = self.db.collection('selected-figures').document(self.figure_id).collection('article-summaries')
-        query = articles_ref.where(filter=FieldFilter('is_processed_for_timeline', '!=', True))
+        query = backlog_query(articles_ref, "timeline_applied")
         
         # We return the full document object now, not a custom dictionary
         articles = [doc for doc in query.stream()]
@@ -176,7 +217,8 @@ class CurationEngine:
 
         if not articles_to_process:
             print("No new articles to process. Update complete.")
-            await self.news_manager.close() # Close connection if nothing to do
+            if self._owns_manager:
+                await self.news_manager.close() # Close connection if nothing to do
             return
 
         for article_snapshot in articles_to_process:
@@ -191,8 +233,7 @@ class CurationEngine:
             if not event_contents or not isinstance(event_contents, dict):
                 print(f"  -> Article {source_id} has no 'event_contents'. Marking as processed.")
                 # Mark it as processed and immediately continue to the next article
-                article_ref = self.db.collection('selected-figures').document(self.figure_id).collection('article-summaries').document(source_id)
-                article_ref.update({"is_processed_for_timeline": True})
+                self._mark_article_processed(source_id)
                 continue # Skip to the next item in the main 'for' loop
             # --- END OF FIX ---
 
@@ -217,8 +258,8 @@ class CurationEngine:
 
                 # 3. Fetch existing events and apply context limit
                 timeline_doc_ref = self.db.collection('selected-figures').document(self.figure_id).collection(CURATED_TIMELINE_COLLECTION).document(main_cat)
-                existing_main_category_data = timeline_doc_ref.get().to_dict() or {}
-                curated_events_for_subcategory = existing_main_category_data.get(sub_cat, [])
+                timeline_snapshot = timeline_doc_ref.get()
+                curated_events_for_subcategory = (timeline_snapshot.to_dict() or {}).get(sub_cat, [])
 
                 # --- START OF MODIFICATION ---
                 limited_context_events = curated_events_for_subcategory
@@ -233,40 +274,30 @@ class CurationEngine:
                 # 4. Curation AI call (now with the limited list)
                 ai_decision = await self._call_curation_api(sub_cat, limited_context_events, new_event_point)
                 
-                if not ai_decision or "action" not in ai_decision or "event_json" not in ai_decision:
+                if not ai_decision or ai_decision.get("action") not in ("CREATE_NEW", "UPDATE_EXISTING") or "event_json" not in ai_decision:
                     print("    Action: Curation AI failed or returned invalid format. Skipping point.")
                     continue
 
                 # 5. Apply AI decision
-                action = ai_decision.get("action")
-                event_json = ai_decision.get("event_json")
-
-                if action == "CREATE_NEW":
-                    curated_events_for_subcategory.append(self._add_event_years(event_json))
-                elif action == "UPDATE_EXISTING":
-                    target_title = ai_decision.get("target_event_title")
-                    found_and_updated = False
-                    if target_title:
-                        for idx, event in enumerate(curated_events_for_subcategory):
-                            if event.get("event_title") == target_title:
-                                curated_events_for_subcategory[idx] = self._add_event_years(event_json)
-                                found_and_updated = True
-                                break
-                    if not found_and_updated:
-                        curated_events_for_subcategory.append(self._add_event_years(event_json))
-                
-                # 6. Save data back to Firestore
-                existing_main_category_data[sub_cat] = curated_events_for_subcategory
-                timeline_doc_ref.set(existing_main_category_data)
+                event_json = self._mark_compacted(self._add_event_years(ai_decision.get("event_json")))
+
+                # 6. Save data back to Firestore. Only this subcategory is written, guarded by the
+                # document's update time; if another writer changed it since our read, the
+                # decision is re-applied to their version instead of overwriting it
+                await optimistic_write(
+                    self.db, timeline_doc_ref,
+                    lambda snapshot, batch: {sub_cat: self._apply_decision((snapshot.to_dict() or {}).get(sub_cat, []), ai_decision, event_json)},
+                    label=CURATED_TIMELINE_COLLECTION, snapshot=timeline_snapshot
+                )
                 print(f"    -> Successfully updated timeline for [{main_cat}] > [{sub_cat}]")
 
             # 7. CRITICAL: Mark the entire article as processed after all its events are handled
-            article_ref = self.db.collection('selected-figures').document(self.figure_id).collection('article-summaries').document(source_id)
-            article_ref.update({"is_processed_for_timeline": True})
+            self._mark_article_processed(source_id)
             print(f"  -> Finished processing article {source_id} and marked as processed.")
         
         # Close the connection after the loop finishes
-        await self.news_manager.close()
+        if self._owns_manager:
+            await self.news_manager.close()
         print("\n--- Incremental Update Complete ---")
 
 
@@ -1,16 +1,27 @@
 # wiki_updater.py
 
 from setup_firebase_deepseek import NewsManager
+from wiki_history import archive_wiki_version, load_wiki_version
+from compact_overview import MIN_WORDS_TO_COMPACT
+from processing_ledger import backlog_query, ledger_update
+from batch_writer import BatchWriter
+from optimistic_writes import optimistic_write, WriteConflictError
 import asyncio
+import json
+import re
 from firebase_admin import firestore
 import argparse
 import sys
 
 class PublicFigureWikiUpdater:
-    def __init__(self):
-        self.news_manager = NewsManager()
-        # The field to check for unprocessed summaries
-        self.processing_flag_field = "is_processed_for_timeline"
+    def __init__(self, news_manager=None):
+        """
+        Args:
+            news_manager (NewsManager, optional): A shared manager to reuse. If omitted,
+                a new one is created and closed when the run finishes.
+        """
+        self._owns_manager = news_manager is None
+        self.news_manager = news_manager or NewsManager()
 
     async def update_all_wiki_content(self, specific_figure_id=None):
         """
@@ -60,7 +71,8 @@ class PublicFigureWikiUpdater:
             print(f"An error occurred in update_all_wiki_content: {e}")
             raise
         finally:
-            await self.news_manager.close()
+            if self._owns_manager:
+                await self.news_manager.close()
 
     async def update_wiki_content_for_figure(self, figure_id, figure_name):
         """
@@ -72,8 +84,8 @@ class PublicFigureWikiUpdater:
             summaries_ref = self.news_manager.db.collection("selected-figures").document(figure_id) \
                             .collection("article-summaries")
             
-            new_summaries_query = summaries_ref.where(field_path=self.processing_flag_field, op_string='==', value=False)
-            new_summary_docs = list(new_summaries_query.stream())
+            # The ledger backlog: categorized summaries not yet folded into the wiki
+            new_summary_docs = list(backlog_query(summaries_ref, "wiki_applied").stream())
 
             if not new_summary_docs:
                 print(f"No new article summaries found for '{figure_name}'. Skipping.")
@@ -83,9 +95,11 @@ class PublicFigureWikiUpdater:
 
             # 2. Group new summaries by the wiki document they affect (main, category, subcategory)
             updates_to_process = {}
+            summary_targets = {}  # summary ID -> wiki document IDs it contributes to
             for doc in new_summary_docs:
                 summary_data = doc.to_dict()
                 summary_text = summary_data.get("summary")
+                summary_targets[doc.id] = set()
                 if not summary_text:
                     continue
 
@@ -96,6 +110,7 @@ class PublicFigureWikiUpdater:
                 if "main-overview" not in updates_to_process:
                     updates_to_process["main-overview"] = []
                 updates_to_process["main-overview"].append(summary_text)
+                summary_targets[doc.id].add("main-overview")
 
                 # Add to category update list
                 if main_category:
@@ -103,6 +118,7 @@ class PublicFigureWikiUpdater:
                     if cat_doc_id not in updates_to_process:
                         updates_to_process[cat_doc_id] = []
                     updates_to_process[cat_doc_id].append(summary_text)
+                    summary_targets[doc.id].add(cat_doc_id)
                 
                 # Add to subcategory update list
                 if main_category and subcategory:
@@ -110,56 +126,31 @@ class PublicFigureWikiUpdater:
                     if subcat_doc_id not in updates_to_process:
                         updates_to_process[subcat_doc_id] = []
                     updates_to_process[subcat_doc_id].append(summary_text)
+                    summary_targets[doc.id].add(subcat_doc_id)
 
             # 3. For each wiki document that has new information, perform the update or creation
             wiki_content_ref = summaries_ref.parent.collection("wiki-content")
+            failed_doc_ids = set()
             for doc_id, new_summaries in updates_to_process.items():
-                
-                wiki_doc_ref = wiki_content_ref.document(doc_id)
-                existing_doc = wiki_doc_ref.get()
-
-                if existing_doc.exists:
-                    # Document exists - update it
-                    existing_content = existing_doc.to_dict().get("content", "")
-                    
-                    # Call the LLM to get potentially updated content
-                    new_content = await self._get_updated_content_from_llm(figure_name, existing_content, new_summaries)
-
-                    # Update Firestore only if the content has changed
-                    if new_content and new_content.strip() != existing_content.strip():
-                        wiki_doc_ref.update({
-                            "content": new_content,
-                            "lastUpdated": firestore.SERVER_TIMESTAMP,
-                            "is_compacted": False
-                        })
-                        print(f"  - Updated existing wiki document: '{doc_id}'")
-                    else:
-                        print(f"  - No significant changes needed for existing wiki document: '{doc_id}'")
-                else:
-                    # Document doesn't exist - create it
-                    print(f"  - Wiki document '{doc_id}' not found. Creating new document...")
-                    
-                    # Generate new content based on the summaries
-                    new_content = await self._create_new_content_from_llm(figure_name, doc_id, new_summaries)
-                    
-                    if new_content:
-                        # Create the new document
-                        wiki_doc_ref.set({
-                            "content": new_content,
-                            "lastUpdated": firestore.SERVER_TIMESTAMP,
-                            "is_compacted": False,
-                            "created": firestore.SERVER_TIMESTAMP
-                        })
-                        print(f"  - Successfully created new wiki document: '{doc_id}'")
-                    else:
-                        print(f"  - Failed to generate content for new wiki document: '{doc_id}'")
-
-            # 4. Mark all new summaries as processed in a batch
-            # batch = self.news_manager.db.batch()
-            # for doc in new_summary_docs:
-            #     batch.update(doc.reference, {self.processing_flag_field: True})
-            # batch.commit()
-            print(f"Successfully marked {len(new_summary_docs)} summaries as processed for '{figure_name}'.")
+                try:
+                    written = await self._write_wiki_document(wiki_content_ref.document(doc_id), doc_id, figure_name, new_summaries)
+                except WriteConflictError as e:
+                    print(f"  - Gave up on wiki document '{doc_id}': {e}")
+                    written = False
+                if not written:
+                    failed_doc_ids.add(doc_id)
+
+            # 4. Advance every summary whose wiki documents were all written; the
+            # rest stay in the backlog and are retried on the next run
+            writer = BatchWriter(self.news_manager.db)
+            applied = 0
+            for doc in new_summary_docs:
+                if summary_targets[doc.id] & failed_doc_ids:
+                    continue
+                writer.update(doc.reference, ledger_update("wiki_applied"))
+                applied += 1
+            writer.commit()
+            print(f"Successfully marked {applied}/{len(new_summary_docs)} summaries as wiki-applied for '{figure_name}'.")
 
             return True
 
@@ -167,6 +158,100 @@ class PublicFigureWikiUpdater:
             print(f"Error updating content for {figure_name}: {e}")
             return False
         
+    async def _write_wiki_document(self, wiki_doc_ref, doc_id, figure_name, new_summaries):
+        """
+        Folds new summaries into one wiki document, creating it if needed. The write is
+        guarded by the document's update time, so if another writer changed it while the
+        LLM was working, the summaries are merged again into their version instead of
+        overwriting it.
+
+        Returns:
+            bool: False if the LLM failed to produce content (the summaries are retried later).
+        """
+        outcome = {"ok": True}
+
+        async def build(snapshot, batch):
+            if snapshot.exists:
+                # Document exists - update it
+                existing_data = snapshot.to_dict()
+                existing_content = existing_data.get("content", "")
+                # The hot document only holds the compact overview; edit against the full text
+                if existing_data.get("full_content_hash"):
+                    existing_content = load_wiki_version(wiki_doc_ref, existing_data["full_content_hash"]) or existing_content
+
+                # Call the LLM to get potentially updated content (full and compact form)
+                new_content, compact_content = await self._get_updated_content_from_llm(figure_name, existing_content, new_summaries)
+
+                # Update Firestore only if the content has changed
+                if not new_content:
+                    print(f"  - Failed to generate updated content for wiki document: '{doc_id}'")
+                    outcome["ok"] = False
+                    return None
+                if new_content.strip() == existing_content.strip():
+                    print(f"  - No significant changes needed for existing wiki document: '{doc_id}'")
+                    return None
+                if existing_content:
+                    archive_wiki_version(wiki_doc_ref, existing_content, reason="wiki-update", batch=batch)
+                update_fields = self._build_wiki_fields(wiki_doc_ref, new_content, compact_content, batch)
+                update_fields.setdefault("full_content_hash", firestore.DELETE_FIELD)
+                outcome["message"] = f"  - Updated existing wiki document: '{doc_id}'"
+                return update_fields
+
+            # Document doesn't exist - create it
+            print(f"  - Wiki document '{doc_id}' not found. Creating new document...")
+
+            # Generate new content based on the summaries (full and compact form)
+            new_content, compact_content = await self._create_new_content_from_llm(figure_name, doc_id, new_summaries)
+            if not new_content:
+                print(f"  - Failed to generate content for new wiki document: '{doc_id}'")
+                outcome["ok"] = False
+                return None
+            outcome["message"] = f"  - Successfully created new wiki document: '{doc_id}'"
+            return {
+                **self._build_wiki_fields(wiki_doc_ref, new_content, compact_content, batch),
+                "created": firestore.SERVER_TIMESTAMP
+            }
+
+        if await optimistic_write(self.news_manager.db, wiki_doc_ref, build, label="wiki-content"):
+            print(outcome["message"])
+        return outcome["ok"]
+
+    def _build_wiki_fields(self, wiki_doc_ref, full_content, compact_content, batch):
+        """
+        Returns the fields to write to the hot 'wiki-content' document.
+        When the LLM returned a compact form, only that is rendered and the full
+        text is archived in 'wiki-history'. Otherwise the full text is written with
+        is_compacted=False so the compaction backfill can pick it up.
+        """
+        if len(full_content.split()) <= MIN_WORDS_TO_COMPACT:
+            compact_content = full_content
+        if not compact_content:
+            return {
+                "content": full_content,
+                "lastUpdated": firestore.SERVER_TIMESTAMP,
+                "is_compacted": False
+            }
+        fields = {
+            "content": compact_content,
+            "lastUpdated": firestore.SERVER_TIMESTAMP,
+            "is_compacted": True
+        }
+        if compact_content != full_content:
+            fields["full_content_hash"] = archive_wiki_version(wiki_doc_ref, full_content, reason="generated-full", batch=batch)
+        return fields
+
+    def _parse_content_response(self, result):
+        """Parses a {"content", "compact_content"} JSON response into a (full, compact) tuple."""
+        json_match = re.search(r"\{.*\}", result, re.DOTALL)
+        try:
+            data = json.loads(json_match.group(0) if json_match else result)
+            full_content = (data.get("content") or "").strip()
+            compact_content = (data.get("compact_content") or "").strip() or None
+            return full_content, compact_content
+        except (json.JSONDecodeError, AttributeError):
+            # Fall back to treating the whole response as uncompacted body text
+            return result.strip(), None
+
     async def _create_new_content_from_llm(self, figure_name, doc_id, summaries):
         """
         Calls the LLM to create new wiki content from scratch based on article summaries.
@@ -196,8 +281,10 @@ class PublicFigureWikiUpdater:
     5. If this is for a specific category (not main-overview), focus the content on that particular aspect of {figure_name}'s life and career.
     6. Do not include titles, headings, or section markers - provide only the body text.
     7. Ensure the content is substantial enough to be informative but concise enough to be readable.
+    8. Also provide a compact version of the same content: a concise overview of 2-3 sentences.
 
-    **New Content:**
+    Return a single JSON object with two keys:
+    {{"content": "The full body text", "compact_content": "The 2-3 sentence overview"}}
     """
 
         try:
@@ -207,16 +294,18 @@ class PublicFigureWikiUpdater:
                     {"role": "system", "content": "You are an expert biographical writer creating encyclopedic content."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.6  # Slightly higher temperature for creative content generation
+                temperature=0.6,  # Slightly higher temperature for creative content generation
+                response_format={"type": "json_object"}
             )
-            return response.choices[0].message.content.strip()
+            return self._parse_content_response(response.choices[0].message.content.strip())
         except Exception as e:
             print(f"Error calling LLM for new content creation: {e}")
-            return None
+            return None, None
 
     async def _get_updated_content_from_llm(self, figure_name, existing_content, new_summaries):
         """
         Calls the LLM with a specific "editor" prompt to integrate new info.
+        Returns (None, None) if the call fails.
         """
         summaries_str = "\n\n".join(f"- {s}" for s in new_summaries)
 
@@ -240,8 +329,10 @@ You are a meticulous editor responsible for updating the biographical profile of
 4.  Maintain a consistent, neutral, and encyclopedic tone. Avoid phrases like "Recently, it was reported..." or "According to new articles...".
 5.  If you determine that the new information is not significant enough to warrant a change, **return the "Existing Content" exactly as it is, with no modifications.**
 6.  Ensure the final output is only the body of the text, without any titles, headings, or explanatory notes.
+7.  Also provide a compact version of the revised content: a concise overview of 2-3 sentences.
 
-**Revised and Updated Content:**
+Return a single JSON object with two keys:
+{{"content": "The revised body text", "compact_content": "The 2-3 sentence overview"}}
 """
 
         try:
@@ -251,12 +342,14 @@ You are a meticulous editor responsible for updating the biographical profile of
                     {"role": "system", "content": "You are a skilled editor updating biographical content based on new source material."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.5 # Lower temperature for more deterministic editing
+                temperature=0.5, # Lower temperature for more deterministic editing
+                response_format={"type": "json_object"}
             )
-            return response.choices[0].message.content.strip()
+            return self._parse_content_response(response.choices[0].message.content.strip())
         except Exception as e:
             print(f"Error calling LLM for content update: {e}")
-            return existing_content # On error, return original to prevent data loss
+            # Nothing is written and the summaries stay pending, so the next run retries them
+            return None, None
 
 def parse_arguments():
     """Parse command line arguments."""
@@ -0,0 +1,158 @@
+# article_listener.py
+
+# Continuous ingestion for run_full_update.py --listen.
+#
+# New 'newsArticles' documents (public_figures_processed == False) are picked
+# up by a Firestore snapshot listener as soon as they are written, plus a
+# periodic polling sweep that catches anything the listener missed and is
+# the only source when listeners aren't available (e.g. local stand-ins).
+# Each article is ingested right away; the affected figures go through a
+# per-figure debounce before reaching the work queue, so several articles
+# about one figure within the window trigger a single wiki/timeline update.
+
+import asyncio
+import time
+
+# --- CONFIGURATION ---
+DEFAULT_DEBOUNCE_SECONDS = 120  # Quiet period after a figure's last new summary
+DEFAULT_MAX_DELAY_SECONDS = 600  # A figure that keeps getting articles is still updated this often
+DEFAULT_POLL_SECONDS = 300  # Safety sweep when the snapshot listener is running
+FALLBACK_POLL_SECONDS = 30  # Sweep interval when polling is the only source
+
+
+class FigureDebouncer:
+    """
+    Collects figure pushes and forwards each figure to the work queue once it
+    has been quiet for `delay` seconds, or `max_delay` seconds after its first
+    push, whichever comes first. Has the same `push(figure_id)` interface as
+    WorkQueue, so the extractor can push into it directly.
+    """
+    def __init__(self, work_queue, delay: float = DEFAULT_DEBOUNCE_SECONDS,
+                 max_delay: float = DEFAULT_MAX_DELAY_SECONDS):
+        """
+        Args:
+            work_queue (WorkQueue): Where debounced figures are pushed.
+            delay (float): Quiet period in seconds.
+            max_delay (float): Longest a figure is held back, in seconds.
+        """
+        self.work_queue = work_queue
+        self.delay = delay
+        self.max_delay = max_delay
+        self._first_push = {}  # figure_id -> monotonic time of its first pending push
+        self._timers = {}  # figure_id -> asyncio.TimerHandle
+        self.pushes = 0
+        self.flushes = 0
+
+    def push(self, figure_id: str):
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        self.pushes += 1
+        first = self._first_push.setdefault(figure_id, now)
+        if figure_id in self._timers:
+            self._timers[figure_id].cancel()
+        fire_in = max(min(self.delay, first + self.max_delay - now), 0)
+        self._timers[figure_id] = loop.call_later(fire_in, self._flush, figure_id)
+
+    def _flush(self, figure_id: str):
+        self._timers.pop(figure_id, None)
+        waited = time.monotonic() - self._first_push.pop(figure_id)
+        self.flushes += 1
+        self.work_queue.push(figure_id)
+        print(f"  -> Queued '{figure_id}' for update (debounced {waited:.0f}s)")
+
+    def flush_all(self):
+        """Forwards every held figure immediately (on shutdown)."""
+        for figure_id in list(self._timers):
+            self._timers[figure_id].cancel()
+            self._flush(figure_id)
+
+
+class ArticleListener:
+    """
+    Feeds new articles to the extractor as they arrive, until cancelled.
+    """
+    def __init__(self, extractor, debouncer: FigureDebouncer, poll_only: bool = False,
+                 poll_seconds: float = None):
+        """
+        Args:
+            extractor (PredefinedPublicFigureExtractor): Ingests each article.
+            debouncer (FigureDebouncer): Receives the figures with new summaries.
+            poll_only (bool): Don't use a snapshot listener; poll every `poll_seconds`.
+            poll_seconds (float, optional): Polling interval. Defaults to a slow safety
+                sweep with the listener, or a short interval when polling only.
+        """
+        self.extractor = extractor
+        self.debouncer = debouncer
+        self.db = extractor.news_manager.db
+        self.poll_only = poll_only
+        self.poll_seconds = poll_seconds or (FALLBACK_POLL_SECONDS if poll_only else DEFAULT_POLL_SECONDS)
+        self.articles_ingested = 0
+        self._articles = asyncio.Queue()
+        self._seen = set()  # Article IDs queued or being ingested
+        self._watch = None
+
+    def _query(self):
+        from firebase_admin import firestore
+
+        return self.db.collection("newsArticles").where(
+            filter=firestore.FieldFilter("public_figures_processed", "==", False)
+        )
+
+    def _enqueue(self, article_id: str, article_data: dict):
+        if article_id in self._seen:
+            return
+        self._seen.add(article_id)
+        self._articles.put_nowait((article_id, article_data))
+
+    def _start_snapshot_listener(self, loop) -> bool:
+        def on_snapshot(snapshots, changes, read_time):
+            # Runs on the listener's thread; hand the articles over to the event loop
+            for change in changes:
+                if change.type.name in ("ADDED", "MODIFIED"):
+                    loop.call_soon_threadsafe(self._enqueue, change.document.id, change.document.to_dict() or {})
+
+        try:
+            self._watch = self._query().on_snapshot(on_snapshot)
+        except Exception as e:
+            print(f"⚠️ Snapshot listener unavailable ({e}); falling back to polling every {FALLBACK_POLL_SECONDS}s")
+            self.poll_seconds = FALLBACK_POLL_SECONDS
+            return False
+        print("✓ Listening for new articles")
+        return True
+
+    async def _poll(self):
+        while True:
+            try:
+                docs = await asyncio.to_thread(lambda: list(self._query().stream()))
+                for doc in docs:
+                    self._enqueue(doc.id, doc.to_dict() or {})
+            except Exception as e:
+                print(f"⚠️ Polling for new articles failed: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def run(self):
+        """Ingests articles until cancelled. Held figures are flushed to the queue on the way out."""
+        if self.poll_only or not self._start_snapshot_listener(asyncio.get_running_loop()):
+            print(f"✓ Polling for new articles every {self.poll_seconds}s")
+        poller = asyncio.create_task(self._poll())
+        try:
+            while True:
+                article_id, article_data = await self._articles.get()
+                try:
+                    # A sweep can overlap with an ingestion that just finished; re-check the flag
+                    current = self.db.collection("newsArticles").document(article_id).get()
+                    if not current.exists or (current.to_dict() or {}).get("public_figures_processed"):
+                        continue
+                    print(f"\n📰 New article {article_id}")
+                    await self.extractor.process_article(article_id, article_data, work_queue=self.debouncer)
+                    self.articles_ingested += 1
+                except Exception as e:
+                    # process_article marks the article processed last, so the next sweep retries it
+                    print(f"❌ Failed to ingest article {article_id}: {e}")
+                finally:
+                    self._seen.discard(article_id)
+        finally:
+            poller.cancel()
+            if self._watch is not None:
+                self._watch.unsubscribe()
+            self.debouncer.flush_all()
@@ -1,37 +1,61 @@
+import argparse
 import asyncio
+import json
+import os
 import pytz
 from datetime import datetime
 
-# This script still needs the class from your original file to reuse its logic.
-from predefined_public_figure_extractor import PredefinedPublicFigureExtractor
+from figure_identity import normalize_name_for_doc_id
+from batch_writer import BatchWriter
 
-# --- MODIFICATION ---
-# Instead of initializing Firebase here, we import the 'db' instance
-# from your setup file. This assumes the variable is named 'db'.
-try:
-    from setup_firebase_deepseek import news_manager
-    # Now, create a 'db' variable by accessing the .db attribute from the manager.
-    db = news_manager.db
-    print("Successfully imported Firestore 'db' instance from the shared NewsManager.")
-except ImportError:
-    print("--- ERROR: Could not import 'news_manager' from setup_firebase_deepseek.py ---")
-    print("Please ensure the file exists and contains an instance named 'news_manager'.")
-    db = None
+# --- CONFIGURATION ---
+DEFAULT_CONCURRENCY = 8  # Maximum number of figures researched at once
+FLUSH_EVERY = 25  # Researched profiles are committed in batches of this size
+CHECKPOINT_FILE = "audit_figures_checkpoint.json"  # {name: researched profile} not yet known to be written
 
 
-def normalize_name_for_doc_id(name):
-    """Creates a Firestore document ID from a name, matching your existing logic."""
-    return name.lower().replace(" ", "").replace("-", "").replace(".", "")
+def _load_checkpoint(checkpoint_path):
+    """Returns the profiles researched by an interrupted run, keyed by figure name."""
+    if not os.path.exists(checkpoint_path):
+        return {}
+    try:
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Ignoring unreadable checkpoint '{checkpoint_path}': {e}")
+        return {}
+
 
+def _save_checkpoint(checkpoint_path, researched):
+    with open(checkpoint_path, "w", encoding="utf-8") as f:
+        json.dump(researched, f, ensure_ascii=False)
 
-async def audit_and_create_missing_figures():
+
+async def audit_and_create_missing_figures(concurrency=DEFAULT_CONCURRENCY, csv_filepath="k_celebrities_master.csv",
+                                           checkpoint_path=CHECKPOINT_FILE):
     """
     Audits the 'selected-figures' collection against the master CSV file
     and creates profiles for any missing public figures.
+
+    Missing figures are researched concurrently and written in batches. Every
+    researched profile is also saved to a checkpoint file, so an interrupted
+    run resumes without researching those figures again.
+
+    Args:
+        concurrency (int): Maximum number of figures researched at once.
+        csv_filepath (str): Path to the master CSV file.
+        checkpoint_path (str): File used to resume an interrupted run.
     """
-    # --- MODIFICATION ---
-    # We now assume 'db' is successfully imported from your setup file.
-    if not db:
+    # Deferred so that `--help` doesn't pay for the Firebase/DeepSeek imports.
+    # This script still needs the class from your original file to reuse its logic.
+    from predefined_public_figure_extractor import PredefinedPublicFigureExtractor
+    from setup_firebase_deepseek import get_news_manager
+
+    news_manager = get_news_manager()
+    try:
+        db = news_manager.db
+    except Exception as e:
+        print(f"--- ERROR: Could not initialize Firestore: {e} ---")
         print(
             "Exiting script because the Firestore database instance is not available."
         )
@@ -44,7 +68,7 @@ async def audit_and_create_missing_figures():
         # Note: Your PredefinedPublicFigureExtractor itself likely initializes the DeepSeek client
         # via its parent classes, so everything should work seamlessly.
         extractor = PredefinedPublicFigureExtractor(
-            csv_filepath="k_celebrities_master.csv"
+            csv_filepath=csv_filepath, news_manager=news_manager
         )
         all_csv_names = extractor.predefined_names
         if not all_csv_names:
@@ -87,37 +111,83 @@ async def audit_and_create_missing_figures():
     )
     print(f"Missing figures: {', '.join(missing_figures)}")
 
-    # Step 4: For each missing figure, perform research and create their profile.
-    for i, figure_name in enumerate(missing_figures):
-        print(
-            f"\n--- Processing missing figure {i+1}/{len(missing_figures)}: {figure_name} ---"
-        )
-        try:
+    # Step 4: Research the missing figures concurrently and write their profiles in batches.
+    # Profiles left in the checkpoint by an interrupted run are written without new research.
+    missing_names = set(missing_figures)
+    researched = {
+        name: info for name, info in _load_checkpoint(checkpoint_path).items() if name in missing_names
+    }
+    if researched:
+        print(f"Resuming: {len(researched)} profile(s) already researched by a previous run.")
+
+    writer = BatchWriter(db, max_ops=FLUSH_EVERY)
+    semaphore = asyncio.Semaphore(concurrency)
+    created = 0
+
+    def queue_profile(figure_name, public_figure_info):
+        new_figure_data = {
+            "name": figure_name,
+            "sources": [],
+            "lastUpdated": datetime.now(pytz.timezone("Asia/Seoul")).strftime(
+                "%Y-%m-%d"
+            ),
+            **public_figure_info,
+        }
+        doc_id = normalize_name_for_doc_id(figure_name)
+        writer.set(db.collection("selected-figures").document(doc_id), new_figure_data)
+        print(f"✅ Queued new profile for '{figure_name}' with doc ID '{doc_id}'.")
+
+    async def research(figure_name):
+        async with semaphore:
             print(f"Researching details for '{figure_name}'...")
-            public_figure_info = await extractor.research_public_figure(figure_name)
-
-            new_figure_data = {
-                "name": figure_name,
-                "sources": [],
-                "lastUpdated": datetime.now(pytz.timezone("Asia/Seoul")).strftime(
-                    "%Y-%m-%d"
-                ),
-                **public_figure_info,
-            }
-
-            doc_id = normalize_name_for_doc_id(figure_name)
-            doc_ref = db.collection("selected-figures").document(doc_id)
-            doc_ref.set(new_figure_data)
-            print(
-                f"✅ Successfully created new profile for '{figure_name}' with doc ID '{doc_id}'."
-            )
+            try:
+                return figure_name, await extractor.research_public_figure(figure_name)
+            except Exception as e:
+                print(f"‼️ Failed to research '{figure_name}': {e}")
+                return figure_name, None
+
+    for figure_name, public_figure_info in researched.items():
+        queue_profile(figure_name, public_figure_info)
+        created += 1
+
+    to_research = [name for name in missing_figures if name not in researched]
+    tasks = [asyncio.create_task(research(name)) for name in to_research]
+    for i, task in enumerate(asyncio.as_completed(tasks)):
+        figure_name, public_figure_info = await task
+        if public_figure_info is None:
+            continue
+
+        print(f"\n--- Researched missing figure {i+1}/{len(tasks)}: {figure_name} ---")
+        researched[figure_name] = public_figure_info
+        _save_checkpoint(checkpoint_path, researched)
+        queue_profile(figure_name, public_figure_info)
+        created += 1
+
+    writer.commit()
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)  # Everything researched has been written
+
+    failed = len(missing_figures) - created
+    await extractor.news_manager.close()
+    print(f"\n=== Audit and creation process complete. Created {created} profile(s) in "
+          f"{writer.commits} batch(es); {failed} failed and will be retried on the next run. ===")
 
-        except Exception as e:
-            print(f"‼️ Failed to process and create profile for '{figure_name}': {e}")
 
-    await extractor.news_manager.close()
-    print("\n=== Audit and creation process complete. ===")
+async def main():
+    parser = argparse.ArgumentParser(description="Creates profiles for figures in the master CSV that are missing from Firestore.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum number of figures researched at once (default: {DEFAULT_CONCURRENCY}).")
+    parser.add_argument("--csv", type=str, default="k_celebrities_master.csv", help="Path to the master CSV file.")
+    parser.add_argument("--checkpoint", type=str, default=CHECKPOINT_FILE,
+                        help=f"Checkpoint file used to resume an interrupted run (default: {CHECKPOINT_FILE}).")
+    args = parser.parse_args()
+
+    await audit_and_create_missing_figures(
+        concurrency=args.concurrency, csv_filepath=args.csv, checkpoint_path=args.checkpoint
+    )
 
 
 if __name__ == "__main__":
-    asyncio.run(audit_and_create_missing_figures())
+    # Example:
+    # python audit_figures.py --concurrency 8
+    asyncio.run(main())
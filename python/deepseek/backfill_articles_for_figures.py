@@ -3,7 +3,6 @@ import argparse
 
 # We will reuse your existing extractor and its powerful methods
 from predefined_public_figure_extractor import PredefinedPublicFigureExtractor
-from setup_firebase_deepseek import news_manager
 
 
 async def backfill_articles_for_figures(target_figure_names, article_id=None):
@@ -24,7 +23,7 @@ async def backfill_articles_for_figures(target_figure_names, article_id=None):
 
     try:
         extractor = PredefinedPublicFigureExtractor()
-        db = news_manager.db
+        db = extractor.news_manager.db
 
         # --- MODIFICATION: Conditionally fetch articles ---
         articles = []
@@ -0,0 +1,96 @@
+import argparse
+import sys
+from collections import Counter
+from setup_firebase_deepseek import NewsManager
+from batch_writer import BatchWriter
+from processing_ledger import LEDGER_STAGE_FIELD, LEGACY_PROCESSED_FIELD, STAGES, infer_stage, ledger_initial
+
+
+class LedgerBackfiller:
+    """
+    A utility class to perform a one-time update on 'article-summaries'
+    documents written before the processing ledger existed. It infers each
+    summary's stage from the legacy flags and writes 'ledger_stage', so the
+    pipeline steps pick up exactly the summaries they still owe work on.
+    """
+    def __init__(self, figure_id: str = None):
+        """
+        Initializes the backfiller.
+
+        Args:
+            figure_id (str, optional): Only backfill this figure. Defaults to all figures.
+        """
+        self.figure_id = figure_id
+        try:
+            self.news_manager = NewsManager()
+            self.db = self.news_manager.db
+            print("✓ Firestore connection successful")
+        except Exception as e:
+            print(f"Error: Failed to connect to Firestore. Please check your setup. Details: {e}")
+            sys.exit(1) # Exit the script if connection fails
+
+    def run_backfill(self, dry_run: bool = False):
+        """
+        Writes 'ledger_stage' (and the matching 'ledger' map) on every summary
+        that doesn't have one yet. Summaries that already have a stage are left alone,
+        so the backfill can be re-run safely.
+        """
+        if self.figure_id:
+            print(f"\n--- Starting ledger backfill for figure: {self.figure_id} ---")
+            summaries = self.db.collection('selected-figures').document(self.figure_id) \
+                .collection('article-summaries').stream()
+        else:
+            print("\n--- Starting ledger backfill for ALL figures ---")
+            summaries = self.db.collection_group('article-summaries').stream()
+
+        writer = BatchWriter(self.db)
+        stage_counts = Counter()
+        already_tracked = 0
+        fields = [LEDGER_STAGE_FIELD, LEGACY_PROCESSED_FIELD, "mainCategory", "summary"]
+
+        try:
+            for doc in summaries:
+                data = doc.to_dict() or {}
+                if data.get(LEDGER_STAGE_FIELD):
+                    already_tracked += 1
+                    continue
+                stage = infer_stage({field: data.get(field) for field in fields})
+                stage_counts[stage] += 1
+                if not dry_run:
+                    # Stages before the inferred one are recorded as completed too; their
+                    # original times are unknown, so the backfill time is used
+                    stages = STAGES[:STAGES.index(stage) + 1]
+                    writer.set(doc.reference, ledger_initial(*stages), merge=True)
+            writer.commit()
+        except Exception as e:
+            print(f"\nAn error occurred during the backfill process: {e}")
+            print("The process may be partially complete. Re-run it to continue.")
+            return
+
+        print("\n--- Backfill Complete ---")
+        print(f"  -> {already_tracked} summaries already had a ledger stage.")
+        for stage, count in stage_counts.most_common():
+            print(f"  -> {'Would set' if dry_run else 'Set'} '{stage}' on {count} summaries")
+
+
+def main():
+    """
+    Parses command-line arguments and runs the backfill process.
+    """
+    parser = argparse.ArgumentParser(
+        description="""
+        A utility to perform a one-time update on 'article-summaries' documents,
+        adding the 'ledger_stage' field inferred from the legacy processing flags.
+        """
+    )
+    parser.add_argument("--figure", type=str, help="Only backfill this figure (e.g., 'younha').")
+    parser.add_argument("--dry-run", action="store_true", help="Report the inferred stages without writing them.")
+    args = parser.parse_args()
+
+    LedgerBackfiller(figure_id=args.figure).run_backfill(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    # Example:
+    # python backfill_processing_ledger.py --dry-run
+    main()
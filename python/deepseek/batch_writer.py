@@ -0,0 +1,48 @@
+# batch_writer.py
+
+# Firestore batches have a limit of 500 operations.
+# Commit every 400 operations to be safe.
+DEFAULT_MAX_BATCH_OPS = 400
+
+
+class BatchWriter:
+    """
+    Accumulates Firestore writes and commits them in batches that stay below
+    the 500-operation limit. Exposes the same set/update/delete interface as a
+    WriteBatch, so it can be passed anywhere a `batch=` argument is accepted.
+    """
+    def __init__(self, db, max_ops: int = DEFAULT_MAX_BATCH_OPS):
+        self.db = db
+        self.max_ops = max_ops
+        self._batch = db.batch()
+        self._pending_ops = 0
+        self.total_ops = 0
+        self.commits = 0
+
+    def set(self, doc_ref, data, merge=False):
+        self._batch.set(doc_ref, data, merge=merge)
+        self._after_write()
+
+    def update(self, doc_ref, data):
+        self._batch.update(doc_ref, data)
+        self._after_write()
+
+    def delete(self, doc_ref):
+        self._batch.delete(doc_ref)
+        self._after_write()
+
+    def _after_write(self):
+        self._pending_ops += 1
+        self.total_ops += 1
+        if self._pending_ops >= self.max_ops:
+            self.commit()
+
+    def commit(self):
+        """Commits any pending writes and starts a fresh batch."""
+        if not self._pending_ops:
+            return
+        self._batch.commit()
+        self.commits += 1
+        print(f"    -> Committed batch of {self._pending_ops} writes.")
+        self._batch = self.db.batch()
+        self._pending_ops = 0
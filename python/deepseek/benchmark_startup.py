@@ -0,0 +1,61 @@
+# benchmark_startup.py
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# --- CONFIGURATION ---
+DEFAULT_RUNS = 5
+DEFAULT_SCRIPTS = [
+    "run_full_update.py",
+    "audit_figures.py",
+    "figure_enrichment.py",
+    "trending_figures.py",
+    "find_company_urls.py",
+    "compact_overview.py",
+]
+# Importing argparse alone is the floor a CLI can reach
+BASELINE = ["-c", "import argparse; argparse.ArgumentParser().parse_args([])"]
+
+
+def time_command(args: list, runs: int, cwd: str) -> list:
+    """Runs `python <args>` `runs` times and returns the wall-clock seconds of each run."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, *args], cwd=cwd, capture_output=True, text=True)
+        timings.append(time.perf_counter() - started)
+        if result.returncode != 0:
+            raise RuntimeError(f"'{' '.join(args)}' exited with {result.returncode}: {result.stderr.strip()[-300:]}")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures CLI startup time (`--help`) of the pipeline scripts.")
+    parser.add_argument("scripts", nargs="*", default=DEFAULT_SCRIPTS, help="Scripts to measure (default: the main pipeline scripts).")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help=f"Runs per script (default: {DEFAULT_RUNS}).")
+    args = parser.parse_args()
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    baseline = statistics.median(time_command(BASELINE, args.runs, cwd))
+    print(f"🚀 Startup benchmark ({args.runs} runs each, median wall clock)")
+    print(f"  {'argparse baseline':<32} {baseline * 1000:8.1f} ms")
+
+    for script in args.scripts:
+        try:
+            median = statistics.median(time_command([script, "--help"], args.runs, cwd))
+        except RuntimeError as e:
+            print(f"  ❌ {script:<30} {e}")
+            continue
+        print(f"  {script:<32} {median * 1000:8.1f} ms  (+{(median - baseline) * 1000:.1f} ms over baseline)")
+
+    print("\nFor a per-module breakdown: python -X importtime <script> --help 2> importtime.log")
+
+
+if __name__ == "__main__":
+    # Example:
+    # python benchmark_startup.py --runs 10
+    main()
@@ -1,20 +1,42 @@
 import asyncio
 import argparse
+import json
 from setup_firebase_deepseek import NewsManager
+from batch_writer import BatchWriter
+from heuristic_compactor import HeuristicCompactor, DEFAULT_CONFIDENCE_THRESHOLD
 
 # --- CONFIGURATION ---
 CURATED_TIMELINE_COLLECTION = "curated-timeline"
 COMPACTED_EVENT_MARKER_FIELD = "is_compacted_v2" # Marker for the entire event's summary
 COMPACTED_DESCRIPTION_MARKER_FIELD = "is_description_compacted_v2" # Marker for individual timeline points' descriptions
+EVENT_SUMMARY_MIN_WORDS = 20 # Don't shorten already-short summaries
+DESCRIPTION_MIN_WORDS = 15 # Don't shorten already-short descriptions
+ITEMS_PER_REQUEST = 25 # Number of texts packed into a single LLM request
+DEFAULT_CONCURRENCY = 8 # Maximum number of batched requests in flight at once
 
 class DataUpdater:
-    def __init__(self, figure_id: str):
+    def __init__(self, figure_id: str, news_manager: NewsManager = None, semaphore: asyncio.Semaphore = None,
+                 heuristic_threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+        """
+        Args:
+            figure_id (str): The ID of the figure whose timeline is compacted.
+            news_manager (NewsManager, optional): A shared manager to reuse.
+            semaphore (asyncio.Semaphore, optional): Shared limit on concurrent LLM requests.
+            heuristic_threshold (float): Confidence needed to accept a local compaction
+                instead of calling the LLM. Set above 1 to disable the local pass.
+        """
         self.figure_id = figure_id
-        self.news_manager = NewsManager()
+        self._owns_manager = news_manager is None
+        self.news_manager = news_manager or NewsManager()
         self.db = self.news_manager.db
         self.ai_client = self.news_manager.client
         self.ai_model = self.news_manager.model
+        self.semaphore = semaphore or asyncio.Semaphore(DEFAULT_CONCURRENCY)
+        self.heuristic_compactor = HeuristicCompactor(confidence_threshold=heuristic_threshold)
         self.timeline_ref = self.db.collection('selected-figures').document(figure_id).collection(CURATED_TIMELINE_COLLECTION)
+        self.all_events_data = {}
+        self.docs_to_update = set() # Main category doc IDs that changed during this run
+        self.stats = {"events_total": 0, "marked_without_ai": 0, "compacted_locally": 0, "sent_to_ai": 0, "compacted_by_ai": 0, "failed": 0}
         print(f"✓ DataUpdater initialized for figure: {self.figure_id}")
 
     def _fetch_timeline_events(self) -> dict:
@@ -29,7 +51,7 @@ class DataUpdater:
 
     async def _summarize_description(self, text_to_summarize: str) -> str:
         """Uses the AI to summarize a single piece of text into one sentence."""
-        if len(text_to_summarize.split()) < 15:
+        if len(text_to_summarize.split()) < DESCRIPTION_MIN_WORDS:
             return text_to_summarize
 
         system_prompt = "You are an expert editor. Your sole job is to take the provided text and summarize it into a single, clear, and concise sentence."
@@ -47,7 +69,7 @@ class DataUpdater:
 
     async def _summarize_event_summary(self, text_to_summarize: str) -> str:
         """Uses the AI to rewrite an event summary to be more compact (2-3 sentences)."""
-        if len(text_to_summarize.split()) < 20: # Don't shorten already-short summaries
+        if len(text_to_summarize.split()) < EVENT_SUMMARY_MIN_WORDS: # Don't shorten already-short summaries
             return text_to_summarize
 
         system_prompt = "You are an expert editor. Your job is to rewrite the provided event summary to be more compact and engaging. Aim for 2-3 concise sentences."
@@ -63,121 +85,251 @@ class DataUpdater:
             print(f"    ! AI event summary rewrite failed: {e}. Returning original text.")
             return text_to_summarize
 
-    async def run_update(self):
-        """Main function to fetch, process, and update the descriptions and summaries."""
-        all_events_data = self._fetch_timeline_events()
-
-        if not all_events_data:
-            print(f"! No timeline data found for figure '{self.figure_id}'. Exiting.")
-            return
-
-        print("\n-> Starting description and summary update process...")
-        total_events_in_db = sum(len(sub_cat_data.get(sub_cat_name, [])) for main_cat_id, sub_cat_data in all_events_data.items() for sub_cat_name in sub_cat_data)
-        
-        events_processed_count = 0 # Count of events where *any* AI call was made
-        events_skipped_full_event = 0 # Count of events completely skipped due to all parts being marked
-
-        docs_to_update = {} # Dictionary to hold main category documents that need updating in Firestore
-
-        for main_cat_id, main_cat_data in all_events_data.items():
-            updated_main_cat_data = main_cat_data.copy()
-            main_cat_doc_needs_update = False # Flag if any event in this main category was updated
+    def _try_local_compaction(self, text: str, kind: str, target: dict, text_field: str, marker_field: str, main_cat_id: str) -> bool:
+        """
+        Applies the heuristic compactor to a text in place. Returns True when the
+        text was actually shortened below the "already short" threshold with enough
+        confidence to skip the LLM.
+        """
+        # A local result must be as short as a text this updater would leave alone
+        min_words = EVENT_SUMMARY_MIN_WORDS if kind == "event_summary" else DESCRIPTION_MIN_WORDS
+        compacted_text, _ = self.heuristic_compactor.compact(text, kind, max_words=min_words - 1)
+        if not compacted_text:
+            return False
+        target[text_field] = compacted_text
+        target[marker_field] = True
+        self.docs_to_update.add(main_cat_id)
+        self.stats["compacted_locally"] += 1
+        return True
+
+    def collect_pending_items(self) -> list:
+        """
+        Fetches the timeline and returns every event summary and timeline point
+        description that still needs compaction. Texts that are already short are
+        marked as compacted directly, and texts the heuristic compactor handles
+        confidently are rewritten locally, both without an AI call.
+
+        Each item is a dict with a globally unique 'id', its 'kind'
+        ('event_summary' or 'description'), the 'text', and the location needed to
+        write the result back.
+        """
+        self.all_events_data = self._fetch_timeline_events()
+        items = []
 
+        for main_cat_id, main_cat_data in self.all_events_data.items():
             for sub_cat_name, events in main_cat_data.items():
                 if not isinstance(events, list): # Ensure we are processing a list of events
                     continue
 
-                updated_events_list = [] # A new list to build the updated events for this subcategory
-                sub_cat_needs_update = False # Flag if any event in this subcategory was updated
-
-                for event in events:
-                    event_needs_ai_processing = False
-                    current_event_tasks = []
-                    descriptions_to_update_indices = [] # Stores indices of timeline points needing processing
+                for event_idx, event in enumerate(events):
+                    self.stats["events_total"] += 1
 
                     # 1. Check if event_summary needs compaction
                     if not event.get(COMPACTED_EVENT_MARKER_FIELD, False):
-                        current_event_tasks.append(self._summarize_event_summary(event.get("event_summary", "")))
-                        event_needs_ai_processing = True
-                    else:
-                        current_event_tasks.append(None) # Placeholder for the event summary result if not processed
+                        summary = event.get("event_summary", "") or ""
+                        if len(summary.split()) < EVENT_SUMMARY_MIN_WORDS:
+                            event[COMPACTED_EVENT_MARKER_FIELD] = True
+                            self.docs_to_update.add(main_cat_id)
+                            self.stats["marked_without_ai"] += 1
+                        elif not self._try_local_compaction(summary, "event_summary", event, "event_summary",
+                                                            COMPACTED_EVENT_MARKER_FIELD, main_cat_id):
+                            items.append({
+                                "id": f"{self.figure_id}|{main_cat_id}|{sub_cat_name}|{event_idx}|summary",
+                                "kind": "event_summary",
+                                "text": summary,
+                                "location": (main_cat_id, sub_cat_name, event_idx, None),
+                            })
 
                     # 2. Check individual timeline point descriptions for compaction
-                    if 'timeline_points' in event:
-                        for idx, point in enumerate(event['timeline_points']):
-                            if not point.get(COMPACTED_DESCRIPTION_MARKER_FIELD, False):
-                                current_event_tasks.append(self._summarize_description(point.get("description", "")))
-                                descriptions_to_update_indices.append(idx)
-                                event_needs_ai_processing = True
-                            else:
-                                current_event_tasks.append(None) # Placeholder if description is already done
-
-                    # --- Refined skipping logic: If no part of the event needs AI processing, skip it entirely ---
-                    if not event_needs_ai_processing:
-                        events_skipped_full_event += 1
-                        updated_events_list.append(event) # Add the existing event (already compacted) to the new list
-                        continue # Move to the next event in the loop
-                    # --- End Refined skipping logic ---
-
-                    # If we reach here, 'event_needs_ai_processing' is True, meaning at least one AI task will be run.
-                    events_processed_count += 1
-                    print(f"  Processing event '{event.get('event_title', 'Untitled')}' (partially or fully)...")
-
-                    # Filter out None tasks before gathering (these were for already compacted parts)
-                    tasks_to_run = [task for task in current_event_tasks if task is not None]
-                    
-                    results = await asyncio.gather(*tasks_to_run)
-                    
-                    result_idx_counter = 0 # Counter to keep track of results from asyncio.gather
-
-                    # Update event summary if it was processed
-                    if not event.get(COMPACTED_EVENT_MARKER_FIELD, False):
-                        event['event_summary'] = results[result_idx_counter]
-                        event[COMPACTED_EVENT_MARKER_FIELD] = True # Mark as compacted
-                        sub_cat_needs_update = True
-                        result_idx_counter += 1
-                        print(f"    -> Event Summary compacted for '{event.get('event_title', 'Untitled')}'")
-                    
-                    # Update individual descriptions if they were processed
-                    for original_idx in descriptions_to_update_indices:
-                        event['timeline_points'][original_idx]['description'] = results[result_idx_counter]
-                        event['timeline_points'][original_idx][COMPACTED_DESCRIPTION_MARKER_FIELD] = True # Mark as compacted
-                        sub_cat_needs_update = True
-                        result_idx_counter += 1
-                        print(f"    -> Description {original_idx+1} compacted for '{event.get('event_title', 'Untitled')}'")
-                    
-                    # Add the (potentially modified) event to the new list for the subcategory
-                    updated_events_list.append(event) 
-
-                # If any event in this subcategory was updated (or marked), assign the new list back
-                if sub_cat_needs_update:
-                    updated_main_cat_data[sub_cat_name] = updated_events_list
-                    main_cat_doc_needs_update = True
-
-            # If any event in this main category document was updated, add it to the docs_to_update batch
-            if main_cat_doc_needs_update:
-                docs_to_update[main_cat_id] = updated_main_cat_data
+                    for point_idx, point in enumerate(event.get('timeline_points', []) or []):
+                        if point.get(COMPACTED_DESCRIPTION_MARKER_FIELD, False):
+                            continue
+                        description = point.get("description", "") or ""
+                        if len(description.split()) < DESCRIPTION_MIN_WORDS:
+                            point[COMPACTED_DESCRIPTION_MARKER_FIELD] = True
+                            self.docs_to_update.add(main_cat_id)
+                            self.stats["marked_without_ai"] += 1
+                        elif not self._try_local_compaction(description, "description", point, "description",
+                                                            COMPACTED_DESCRIPTION_MARKER_FIELD, main_cat_id):
+                            items.append({
+                                "id": f"{self.figure_id}|{main_cat_id}|{sub_cat_name}|{event_idx}|{point_idx}",
+                                "kind": "description",
+                                "text": description,
+                                "location": (main_cat_id, sub_cat_name, event_idx, point_idx),
+                            })
+
+        self.stats["sent_to_ai"] = len(items)
+        return items
+
+    def apply_results(self, items: list, results: dict):
+        """Writes compacted texts back into the in-memory timeline and sets the markers."""
+        for item in items:
+            compacted_text = results.get(item["id"])
+            if not compacted_text:
+                # Leave it unmarked so the next run retries it
+                self.stats["failed"] += 1
+                continue
+
+            main_cat_id, sub_cat_name, event_idx, point_idx = item["location"]
+            event = self.all_events_data[main_cat_id][sub_cat_name][event_idx]
+            if point_idx is None:
+                event['event_summary'] = compacted_text
+                event[COMPACTED_EVENT_MARKER_FIELD] = True
+            else:
+                event['timeline_points'][point_idx]['description'] = compacted_text
+                event['timeline_points'][point_idx][COMPACTED_DESCRIPTION_MARKER_FIELD] = True
+            self.docs_to_update.add(main_cat_id)
+            self.stats["compacted_by_ai"] += 1
+
+    def write_updates(self, writer: BatchWriter = None):
+        """Queues one full-document write per changed main category document."""
+        if not self.docs_to_update:
+            print(f"No documents needed updates for figure '{self.figure_id}'.")
+            return
 
+        own_writer = writer is None
+        writer = writer or BatchWriter(self.db)
+        for main_cat_id in sorted(self.docs_to_update):
+            writer.set(self.timeline_ref.document(main_cat_id), self.all_events_data[main_cat_id]) # Use set to overwrite the entire document
+        if own_writer:
+            writer.commit()
+        print(f"✓ Queued {len(self.docs_to_update)} main category documents for figure '{self.figure_id}'.")
 
+    def print_summary(self):
         print(f"\n--- Compaction Process Summary for Figure: {self.figure_id} ---")
-        print(f"Total events found in DB: {total_events_in_db}")
-        print(f"Events completely skipped (already fully compacted): {events_skipped_full_event}")
-        print(f"Events where AI calls were made (partial or full processing): {events_processed_count}")
-        print(f"Documents to update in Firestore: {len(docs_to_update)}")
+        print(f"Total events found in DB: {self.stats['events_total']}")
+        print(f"Texts marked without AI (already short): {self.stats['marked_without_ai']}")
+        print(f"Texts compacted locally (LLM calls saved): {self.stats['compacted_locally']}")
+        print(f"Texts sent to AI: {self.stats['sent_to_ai']}")
+        print(f"Texts compacted by AI: {self.stats['compacted_by_ai']}")
+        print(f"Texts left for the next run (AI failure): {self.stats['failed']}")
+        print(f"Documents to update in Firestore: {len(self.docs_to_update)}")
+
+    async def _compact_chunk(self, chunk: list) -> dict:
+        """
+        Sends one batched request for a chunk of items and returns {item_id: compacted_text}.
+        Items are numbered locally so the prompt stays short.
+        """
+        local_ids = {str(i + 1): item["id"] for i, item in enumerate(chunk)}
+        payload = [
+            {"id": str(i + 1), "type": item["kind"], "text": item["text"]}
+            for i, item in enumerate(chunk)
+        ]
+
+        system_prompt = "You are an expert editor. You compact timeline texts without losing key facts, names, or dates. Your response must be a single, valid JSON object."
+        user_prompt = f"""
+        Rewrite each of the following texts to be more compact and clear.
+        - For items of type "event_summary": rewrite into 2-3 concise sentences.
+        - For items of type "description": summarize into a single, clear, and concise sentence.
+
+        Items:
+        {json.dumps(payload, ensure_ascii=False, indent=2)}
+
+        Your response must be a JSON object mapping every item "id" to its compacted text, e.g.
+        {{"1": "Compacted text...", "2": "Compacted text..."}}
+        """
 
-        if not docs_to_update:
-            print("No documents needed updates based on compaction markers. Exiting without writing to Firestore.")
-            return
+        try:
+            async with self.semaphore:
+                response = await self.ai_client.chat.completions.create(
+                    model=self.ai_model,
+                    messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+                    response_format={"type": "json_object"}
+                )
+            result = json.loads(response.choices[0].message.content)
+        except Exception as e:
+            print(f"    ! Batched compaction request failed ({len(chunk)} items): {e}")
+            return {}
+
+        compacted = {}
+        for local_id, text in result.items():
+            if local_id in local_ids and isinstance(text, str) and text.strip():
+                compacted[local_ids[local_id]] = text.strip()
+        if len(compacted) < len(chunk):
+            print(f"    ! Batched response covered {len(compacted)}/{len(chunk)} items.")
+        return compacted
+
+    async def compact_items(self, items: list, batch_size: int = ITEMS_PER_REQUEST) -> dict:
+        """Packs items into batched requests, runs them concurrently and merges the results."""
+        if not items:
+            return {}
+        chunks = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        print(f"-> Compacting {len(items)} texts in {len(chunks)} batched requests...")
+        results = {}
+        for chunk_result in await asyncio.gather(*(self._compact_chunk(chunk) for chunk in chunks)):
+            results.update(chunk_result)
+
+        # Retry anything a batched response dropped with the single-text prompts
+        missing = [item for item in items if item["id"] not in results]
+        if missing:
+            print(f"-> Retrying {len(missing)} texts individually...")
+            retried = await asyncio.gather(*(self._compact_single(item) for item in missing))
+            for item, text in zip(missing, retried):
+                if text and text != item["text"]:
+                    results[item["id"]] = text
+        return results
+
+    async def _compact_single(self, item: dict) -> str:
+        async with self.semaphore:
+            if item["kind"] == "event_summary":
+                return await self._summarize_event_summary(item["text"])
+            return await self._summarize_description(item["text"])
+
+    async def run_update(self, batch_size: int = ITEMS_PER_REQUEST):
+        """Main function to fetch, process, and update the descriptions and summaries."""
+        try:
+            items = self.collect_pending_items()
+
+            if not self.all_events_data:
+                print(f"! No timeline data found for figure '{self.figure_id}'. Exiting.")
+                return
 
-        print("-> Uploading updated data to Firestore using a batch write...")
-        batch = self.db.batch()
-        for main_cat_id, main_cat_data_to_write in docs_to_update.items():
-            doc_ref = self.timeline_ref.document(main_cat_id)
-            batch.set(doc_ref, main_cat_data_to_write) # Use set to overwrite the entire document
-        
-        batch.commit()
-        
-        print(f"✓ Successfully committed updates to Firestore for figure '{self.figure_id}'.")
+            results = await self.compact_items(items, batch_size=batch_size)
+            self.apply_results(items, results)
+            self.print_summary()
+
+            print("-> Uploading updated data to Firestore using a batch write...")
+            self.write_updates()
+        finally:
+            if self._owns_manager:
+                await self.news_manager.close()
+
+
+async def run_update_for_figures(figure_ids: list, concurrency: int = DEFAULT_CONCURRENCY, batch_size: int = ITEMS_PER_REQUEST,
+                                 heuristic_threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+    """
+    Compacts the timelines of many figures at once. Pending texts from every figure
+    are pooled, packed into batched requests that run concurrently, and written
+    back with one write per main category document.
+    """
+    news_manager = NewsManager()
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        updaters = [
+            DataUpdater(figure_id, news_manager=news_manager, semaphore=semaphore, heuristic_threshold=heuristic_threshold)
+            for figure_id in figure_ids
+        ]
+
+        all_items = []
+        for updater in updaters:
+            all_items.extend(updater.collect_pending_items())
+        compacted_locally = sum(updater.stats["compacted_locally"] for updater in updaters)
+        print(f"\nCollected {len(all_items)} pending texts across {len(updaters)} figures "
+              f"({compacted_locally} more compacted locally, saving ~{-(-compacted_locally // batch_size)} requests).")
+
+        # Item IDs are prefixed with the figure ID, so one pooled call serves every figure
+        results = await updaters[0].compact_items(all_items, batch_size=batch_size) if updaters else {}
+
+        writer = BatchWriter(news_manager.db)
+        for updater in updaters:
+            figure_items = [item for item in all_items if item["id"].startswith(f"{updater.figure_id}|")]
+            updater.apply_results(figure_items, results)
+            updater.print_summary()
+            updater.write_updates(writer)
+        writer.commit()
+        print(f"\n✓ Committed timeline compaction for {len(updaters)} figures.")
+    finally:
+        await news_manager.close()
 
 
 async def main():
@@ -186,22 +338,58 @@ async def main():
     """
     parser = argparse.ArgumentParser(
         description="""
-        Fetches timeline data for a specific figure, uses an AI to compact
+        Fetches timeline data for a specific figure (or all figures), uses an AI to compact
         both the main event summaries and the descriptions of individual
-        timeline points, and then updates the data in Firestore.
+        timeline points in batched requests, and then updates the data in Firestore.
         """
     )
     parser.add_argument(
         "figure_id",
         type=str,
+        nargs="?",
         help="The ID of the figure whose timeline data you want to update (e.g., 'newjeans')."
     )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Compact the timelines of every figure in 'selected-figures'."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Maximum number of batched requests in flight at once (default: {DEFAULT_CONCURRENCY})."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=ITEMS_PER_REQUEST,
+        help=f"Number of texts packed into each request (default: {ITEMS_PER_REQUEST})."
+    )
+    parser.add_argument(
+        "--heuristic-threshold",
+        type=float,
+        default=DEFAULT_CONFIDENCE_THRESHOLD,
+        help=f"Confidence (0-1) needed to use the local compactor instead of the LLM (default: {DEFAULT_CONFIDENCE_THRESHOLD}). "
+             "Use a value above 1 to send everything to the LLM."
+    )
 
     args = parser.parse_args()
-
-    # Initialize the updater with the figure_id from the command-line arguments
-    updater = DataUpdater(figure_id=args.figure_id)
-    await updater.run_update()
+    if not args.all and not args.figure_id:
+        parser.error("Provide a figure_id or use --all.")
+
+    if args.all:
+        manager = NewsManager()
+        figure_ids = [doc.id for doc in manager.db.collection('selected-figures').select([]).stream()]
+        await manager.close()
+        print(f"Found {len(figure_ids)} figures to process.")
+        await run_update_for_figures(figure_ids, concurrency=args.concurrency, batch_size=args.batch_size,
+                                     heuristic_threshold=args.heuristic_threshold)
+    else:
+        # Initialize the updater with the figure_id from the command-line arguments
+        updater = DataUpdater(figure_id=args.figure_id, semaphore=asyncio.Semaphore(args.concurrency),
+                              heuristic_threshold=args.heuristic_threshold)
+        await updater.run_update(batch_size=args.batch_size)
 
 if __name__ == "__main__":
     # To run this script, execute it from your terminal with the
@@ -210,6 +398,6 @@ if __name__ == "__main__":
     # Example:
     # python compact_event_summaries_descriptions.py newjeans
     #
-    # or for another figure:
-    # python compact_event_summaries_descriptions.py another_figure_id
-    asyncio.run(main())
\ No newline at end of file
+    # or for every figure at once:
+    # python compact_event_summaries_descriptions.py --all
+    asyncio.run(main())
@@ -1,17 +1,113 @@
 import asyncio
 import argparse
 from setup_firebase_deepseek import NewsManager
+from wiki_history import archive_wiki_version
+from batch_writer import BatchWriter
+
+# --- CONFIGURATION ---
+WIKI_CONTENT_COLLECTION = "wiki-content"
+MIN_WORDS_TO_COMPACT = 50  # Only process content that is reasonably long
+DEFAULT_CONCURRENCY = 8  # Maximum number of compaction calls in flight at once
 
 class CompactOverview:
     """
     A class to fetch, compact, and update the overview for a specific figure in Firestore.
     """
-    def __init__(self):
+    def __init__(self, news_manager: NewsManager = None, concurrency: int = DEFAULT_CONCURRENCY):
         """
-        Initializes the CompactOverview class by creating an instance of NewsManager.
+        Initializes the CompactOverview class.
+
+        Args:
+            news_manager (NewsManager, optional): A shared manager to reuse. If omitted,
+                a new one is created and closed when the run finishes.
+            concurrency (int): Maximum number of concurrent compaction calls.
         """
-        self.manager = NewsManager()
+        self._owns_manager = news_manager is None
+        self.manager = news_manager or NewsManager()
         self.db = self.manager.db
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def _generate_compact_content(self, content: str) -> str:
+        """Calls the AI model to summarize a wiki text into a 2-3 sentence overview."""
+        # Create a prompt for the AI model
+        prompt = f"Summarize the following text into a concise overview of 2-3 sentences:\n\n{content}"
+
+        async with self.semaphore:
+            chat_completion = await self.manager.client.chat.completions.create(
+                model=self.manager.model,
+                messages=[{"role": "user", "content": prompt}],
+            )
+        return chat_completion.choices[0].message.content
+
+    def _is_eligible(self, content_doc) -> bool:
+        """Checks whether a 'wiki-content' document still needs compaction."""
+        doc_path = content_doc.reference.path
+        data = content_doc.to_dict()
+        content = data.get('content')
+
+        if data.get('is_compacted', False):
+            print(f"    - Document '{doc_path}' has already been compacted. Skipping.")
+            return False
+        if not content or not isinstance(content, str):
+            print(f"    - 'content' field is empty or missing in '{doc_path}'. Skipping.")
+            return False
+        if len(content.split()) <= MIN_WORDS_TO_COMPACT:
+            print(f"    - Content in '{doc_path}' is already short, skipping compaction.")
+            return False
+        return True
+
+    async def _compact_one(self, content_doc):
+        """Compacts a single document. Returns (snapshot, original, compacted) or None on failure."""
+        content = content_doc.to_dict().get('content')
+        try:
+            compacted_content = await self._generate_compact_content(content)
+            return content_doc, content, compacted_content
+        except Exception as e:
+            print(f"    - An error occurred while processing document '{content_doc.reference.path}': {e}")
+            return None
+
+    async def _compact_documents(self, content_docs) -> int:
+        """
+        Compacts all eligible documents concurrently (bounded by the semaphore) and
+        writes the results through batched commits as they complete.
+
+        Returns:
+            int: The number of documents that were compacted.
+        """
+        from firebase_admin import firestore
+
+        eligible_docs = [doc for doc in content_docs if self._is_eligible(doc)]
+        if not eligible_docs:
+            return 0
+
+        print(f"\n  -> Compacting {len(eligible_docs)} documents (up to {self.concurrency} at a time)...")
+        writer = BatchWriter(self.db)
+        compacted_count = 0
+
+        for next_result in asyncio.as_completed([self._compact_one(doc) for doc in eligible_docs]):
+            result = await next_result
+            if not result:
+                continue
+            content_doc, content, compacted_content = result
+            if not compacted_content:
+                print(f"    - Empty response for '{content_doc.reference.path}'. Skipping.")
+                continue
+
+            # Archive the original content in 'wiki-history' and keep only the
+            # rendered text in the hot document
+            full_content_hash = archive_wiki_version(content_doc.reference, content, reason="compaction", batch=writer)
+            writer.update(content_doc.reference, {
+                'content': compacted_content,
+                'full_content_hash': full_content_hash,  # Lets incremental updates edit the full text
+                'original_content': firestore.DELETE_FIELD,  # Legacy inline backup
+                'is_compacted': True  # Add a flag
+            })
+            compacted_count += 1
+            print(f"    - Compacted '{content_doc.reference.path}': {len(content)} -> {len(compacted_content)} characters.")
+
+        writer.commit()
+        return compacted_count
 
     async def compact_figure_overview(self, figure_id: str):
         """
@@ -26,97 +122,98 @@ class CompactOverview:
         try:
             # Get a reference to the specific figure document
             figure_doc_ref = self.db.collection('selected-figures').document(figure_id)
-            
+
             # Check if the figure exists
             if not figure_doc_ref.get().exists:
                 print(f"\n❌ Error: Figure with ID '{figure_id}' not found.")
                 return
 
-            # Get a stream for all documents in the 'wiki-content' subcollection
-            wiki_content_ref = figure_doc_ref.collection('wiki-content')
-            wiki_content_stream = wiki_content_ref.stream()
-
-            documents_processed = 0
-            for content_doc in wiki_content_stream:
-                doc_id = content_doc.id
-                documents_processed += 1
-                print(f"\n  -- Processing document: {doc_id} --")
-                
-                try:
-                    # Extract the content from the document
-                    data = content_doc.to_dict()
-                    content = data.get('content')
-                    is_compacted = data.get('is_compacted', False)
-
-                    if is_compacted:
-                        print(f"    - Document '{doc_id}' has already been compacted. Skipping.")
-                        continue
-
-                    # Only process content that is reasonably long
-                    if content and isinstance(content, str) and len(content.split()) > 50:
-                        print(f"    - Original content found. Length: {len(content)} characters.")
-
-                        # Create a prompt for the AI model
-                        prompt = f"Summarize the following text into a concise overview of 2-3 sentences:\n\n{content}"
-
-                        # Call the AI API to get the compacted overview
-                        chat_completion = await self.manager.client.chat.completions.create(
-                            model=self.manager.model,
-                            messages=[{"role": "user", "content": prompt}],
-                        )
-                        compacted_content = chat_completion.choices[0].message.content
-                        
-                        print(f"    - Compacted content generated. Length: {len(compacted_content)} characters.")
-
-                        # Update the document in Firestore with the compacted content
-                        content_doc.reference.update({
-                            'content': compacted_content,
-                            'original_content': content,  # Back up the original content
-                            'is_compacted': True  # Add a flag
-                        })
-                        print(f"    - Successfully updated document '{doc_id}'.")
-
-                    elif content:
-                        print(f"    - Content in '{doc_id}' is already short, skipping compaction.")
-                    else:
-                        print(f"    - 'content' field is empty or missing in '{doc_id}'. Skipping.")
-                
-                except Exception as e:
-                    print(f"    - An error occurred while processing document '{doc_id}': {e}")
-            
-            if documents_processed == 0:
-                 print(f"\n- No 'wiki-content' documents found for figure '{figure_id}'.")
-
-            print(f"\n✅ Process complete for figure: {figure_id}.")
+            # Get all documents in the 'wiki-content' subcollection
+            content_docs = list(figure_doc_ref.collection(WIKI_CONTENT_COLLECTION).stream())
+            if not content_docs:
+                print(f"\n- No 'wiki-content' documents found for figure '{figure_id}'.")
+                return
+
+            compacted_count = await self._compact_documents(content_docs)
+            print(f"\n✅ Process complete for figure: {figure_id}. Compacted {compacted_count}/{len(content_docs)} documents.")
 
         except Exception as e:
             print(f"\n❌ An unexpected error occurred: {e}")
         finally:
             # Close any open connections
-            await self.manager.close()
+            if self._owns_manager:
+                await self.manager.close()
+
+    async def compact_all_overviews(self):
+        """
+        Compacts every uncompacted 'wiki-content' document across all figures.
+        Uses a collection-group query on `is_compacted == False`, so only documents
+        that actually need work are read. Requires a collection-group index
+        exemption on 'wiki-content.is_compacted'.
+        """
+        from firebase_admin import firestore
+
+        print("--- Starting site-wide overview compaction ---")
+
+        try:
+            query = self.db.collection_group(WIKI_CONTENT_COLLECTION).where(
+                filter=firestore.FieldFilter('is_compacted', '==', False)
+            )
+            content_docs = list(query.stream())
+            figure_count = len({doc.reference.parent.parent.id for doc in content_docs})
+            print(f"Found {len(content_docs)} uncompacted documents across {figure_count} figures.")
+
+            if not content_docs:
+                print("Nothing to compact.")
+                return
+
+            compacted_count = await self._compact_documents(content_docs)
+            print(f"\n✅ Site-wide compaction complete. Compacted {compacted_count}/{len(content_docs)} documents.")
+
+        except Exception as e:
+            print(f"\n❌ An unexpected error occurred: {e}")
+        finally:
+            if self._owns_manager:
+                await self.manager.close()
 
 
 async def main():
     """
     Main function to parse arguments and run the compaction process.
     """
-    parser = argparse.ArgumentParser(description="Compacts the 'wiki-content' documents for a specific figure.")
-    
-    # Changed to a required positional argument to match the other scripts
+    parser = argparse.ArgumentParser(description="Compacts the 'wiki-content' documents for a specific figure or for all figures.")
+
+    parser.add_argument(
+        "figure_id",
+        type=str,
+        nargs="?",
+        help="The ID of the single figure to process."
+    )
     parser.add_argument(
-        "figure_id", 
-        type=str, 
-        help="The required ID of the single figure to process."
+        "--all",
+        action="store_true",
+        help="Compact every uncompacted 'wiki-content' document across all figures."
     )
-    
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Maximum number of concurrent compaction calls (default: {DEFAULT_CONCURRENCY})."
+    )
+
     args = parser.parse_args()
-    
-    compactor = CompactOverview()
-    # Call the method with the new argument name
-    await compactor.compact_figure_overview(figure_id=args.figure_id)
+    if not args.all and not args.figure_id:
+        parser.error("Provide a figure_id or use --all.")
+
+    compactor = CompactOverview(concurrency=args.concurrency)
+    if args.all:
+        await compactor.compact_all_overviews()
+    else:
+        await compactor.compact_figure_overview(figure_id=args.figure_id)
 
 if __name__ == "__main__":
     # To run this script, provide the figure_id as a command-line argument.
     # Example:
     # python compact_overview.py your_figure_id
-    asyncio.run(main())
\ No newline at end of file
+    # python compact_overview.py --all --concurrency 16
+    asyncio.run(main())
@@ -0,0 +1,349 @@
+# figure_enrichment.py
+
+import argparse
+import asyncio
+import json
+import re
+from datetime import datetime
+import pytz
+from setup_firebase_deepseek import NewsManager
+from batch_writer import BatchWriter
+
+# --- CONFIGURATION ---
+ENRICHMENT_STATUS_FIELD = "enrichment_status"  # "pending" until FigureEnricher fills the tier-2 fields, then "complete"
+CORE_PENDING = "core_pending"  # The inline tier-1 research failed; FigureEnricher retries it first
+FIGURES_PER_REQUEST = 5  # Figures enriched by a single LLM request
+DEFAULT_CONCURRENCY = 4  # Maximum number of enrichment requests in flight at once
+
+# Tier 1: researched inline when a new figure is first seen
+CORE_FIELDS = {
+    "gender": "",
+    "occupation": [],
+    "nationality": "",
+    "name_kr": "",
+    "is_group": False,
+}
+# Tier 2: filled later by FigureEnricher
+INDIVIDUAL_ENRICHMENT_FIELDS = {
+    "birthDate": "",
+    "chineseZodiac": "",
+    "company": "",
+    "debutDate": "",
+    "group": "",
+    "instagramUrl": "",
+    "profilePic": "",
+    "school": [],
+    "spotifyUrl": "",
+    "youtubeUrl": "",
+    "zodiacSign": "",
+}
+GROUP_ENRICHMENT_FIELDS = {
+    "company": "",
+    "debutDate": "",
+    "instagramUrl": "",
+    "profilePic": "",
+    "spotifyUrl": "",
+    "youtubeUrl": "",
+    "members": [],
+}
+MEMBER_FIELDS = {
+    "name": "",
+    "real_name": "",
+    "gender": "",
+    "name_kr": "",
+    "birthDate": "",
+    "chineseZodiac": "",
+    "nationality": "",
+    "profilePic": "",
+    "instagramUrl": "",
+    "spotifyUrl": "",
+    "youtubeUrl": "",
+    "school": [],
+    "zodiacSign": "",
+}
+
+
+def _is_korean(nationality) -> bool:
+    nationality = (nationality or "").lower()
+    return "korean" in nationality or "south korea" in nationality
+
+
+def _parse_json_response(result: str) -> dict:
+    """Parses a JSON object from an LLM response, tolerating code fences and surrounding text."""
+    json_match = re.search(r"\{.*\}", result, re.DOTALL)
+    return json.loads(json_match.group(0) if json_match else result)
+
+
+async def _research_core_fields(news_manager: NewsManager, name: str):
+    """Asks the LLM for the tier-1 fields. Returns them as a dict, or None if the request failed."""
+    prompt = f"""
+    Identify the public figure named "{name}" and return a JSON object with only:
+    - gender: "Male", "Female", "Group" (for groups), or "" if unclear
+    - occupation: Array of primary occupations (singer, actor, idol, K-pop Group, band, athlete, etc.)
+    - nationality: Primary nationality, if known
+    - name_kr: Korean name in Hangul (ONLY if Korean, otherwise "")
+    - is_group: true if this is a group (band, team, organization), otherwise false
+    """
+    try:
+        response = await news_manager.client.chat.completions.create(
+            model=news_manager.model,
+            messages=[
+                {"role": "system", "content": "You are a knowledgeable assistant that provides accurate information about public figures."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2,
+            response_format={"type": "json_object"}
+        )
+        data = _parse_json_response(response.choices[0].message.content.strip())
+    except Exception as e:
+        print(f"Error researching core profile for {name}: {e}")
+        return None
+    return {field: data.get(field, default) for field, default in CORE_FIELDS.items()}
+
+
+def _normalize_core_fields(profile: dict):
+    profile["is_group"] = bool(profile.get("is_group"))
+    if profile["is_group"]:
+        profile["gender"] = "Group"
+    if not _is_korean(profile.get("nationality")):
+        profile["name_kr"] = ""
+
+
+async def research_core_profile(news_manager: NewsManager, name: str, prefill: dict = None) -> dict:
+    """
+    Tier-1 research for a new figure: only the fields needed to create its
+    profile and write its first summary. Every other field is initialised empty
+    and the figure is marked for background enrichment. If the research fails,
+    the figure is marked CORE_PENDING so FigureEnricher retries the core fields too.
+
+    Args:
+        news_manager (NewsManager): Manager providing the DeepSeek client.
+        name (str): The figure's name.
+        prefill (dict, optional): Known values (e.g. from the CSV) that take precedence.
+
+    Returns:
+        dict: Profile fields including ENRICHMENT_STATUS_FIELD ("pending" or CORE_PENDING).
+    """
+    core_fields = await _research_core_fields(news_manager, name)
+
+    profile = dict(core_fields if core_fields is not None else CORE_FIELDS)
+    profile.update(prefill or {})
+    _normalize_core_fields(profile)
+
+    enrichment_fields = GROUP_ENRICHMENT_FIELDS if profile["is_group"] else INDIVIDUAL_ENRICHMENT_FIELDS
+    for field, default in enrichment_fields.items():
+        profile.setdefault(field, default)
+    profile["lastUpdated"] = datetime.now(pytz.timezone('Asia/Seoul')).strftime("%Y-%m-%d")
+    profile[ENRICHMENT_STATUS_FIELD] = "pending" if core_fields is not None else CORE_PENDING
+    return profile
+
+
+class FigureEnricher:
+    """
+    Tier-2 research: fills the remaining profile fields of figures marked
+    enrichment_status == "pending", several figures per request. Figures whose
+    inline core research failed (CORE_PENDING) get their core fields first.
+    """
+    def __init__(self, news_manager: NewsManager = None, figures_per_request: int = FIGURES_PER_REQUEST,
+                 concurrency: int = DEFAULT_CONCURRENCY):
+        """
+        Args:
+            news_manager (NewsManager, optional): A shared manager to reuse.
+            figures_per_request (int): Figures packed into each enrichment request.
+            concurrency (int): Maximum number of concurrent enrichment requests.
+        """
+        self._owns_manager = news_manager is None
+        self.news_manager = news_manager or NewsManager()
+        self.db = self.news_manager.db
+        self.figures_per_request = figures_per_request
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    def _fetch_pending(self, limit: int = None):
+        from firebase_admin import firestore
+
+        query = self.db.collection("selected-figures").where(
+            filter=firestore.FieldFilter(ENRICHMENT_STATUS_FIELD, "in", ["pending", CORE_PENDING])
+        )
+        if limit:
+            query = query.limit(limit)
+        return list(query.stream())
+
+    async def _research_core(self, doc):
+        """Retries the tier-1 research for a CORE_PENDING figure. Returns the fields to write, or None."""
+        existing = doc.to_dict()
+        core_fields = await _research_core_fields(self.news_manager, existing.get("name", doc.id))
+        if core_fields is None:
+            return None
+        # Values already set (e.g. pre-filled from the CSV) take precedence
+        profile = {field: existing.get(field) or value for field, value in core_fields.items()}
+        profile["is_group"] = bool(existing.get("is_group") or core_fields.get("is_group"))
+        _normalize_core_fields(profile)
+        enrichment_fields = GROUP_ENRICHMENT_FIELDS if profile["is_group"] else INDIVIDUAL_ENRICHMENT_FIELDS
+        for field, default in enrichment_fields.items():
+            if field not in existing:
+                profile[field] = default
+        profile[ENRICHMENT_STATUS_FIELD] = "pending"
+        return profile
+
+    async def _retry_core_research(self, pending_docs: list) -> list:
+        """
+        Fills the core fields of CORE_PENDING figures. Returns the documents that are
+        ready for tier-2 enrichment, re-read where their core fields changed.
+        """
+        core_docs = [doc for doc in pending_docs if doc.to_dict().get(ENRICHMENT_STATUS_FIELD) == CORE_PENDING]
+        if not core_docs:
+            return pending_docs
+
+        print(f"  -> Retrying core research for {len(core_docs)} figures...")
+
+        async def research(doc):
+            async with self.semaphore:
+                return await self._research_core(doc)
+
+        core_results = await asyncio.gather(*(research(doc) for doc in core_docs))
+        writer = BatchWriter(self.db)
+        researched = []
+        for doc, fields in zip(core_docs, core_results):
+            if fields is not None:
+                writer.update(doc.reference, fields)
+                researched.append(doc.reference)
+        writer.commit()
+        print(f"  ✓ Core fields filled for {len(researched)}/{len(core_docs)} figures; the rest stay {CORE_PENDING}.")
+
+        ready = [doc for doc in pending_docs if doc.to_dict().get(ENRICHMENT_STATUS_FIELD) != CORE_PENDING]
+        if researched:
+            ready.extend(self.db.get_all(researched))
+        return ready
+
+    async def _enrich_batch(self, figure_docs) -> dict:
+        """Requests the tier-2 fields for a batch of figures. Returns {doc_id: fields}."""
+        figures = []
+        for doc in figure_docs:
+            data = doc.to_dict()
+            figures.append({
+                "name": data.get("name", doc.id),
+                "is_group": bool(data.get("is_group")),
+                "nationality": data.get("nationality", ""),
+                "occupation": data.get("occupation", []),
+            })
+
+        prompt = f"""
+        Provide additional profile information for each of the following public figures.
+
+        Figures:
+        {json.dumps(figures, ensure_ascii=False, indent=2)}
+
+        For individuals (is_group false), return:
+        - birthDate ("YYYY-MM-DD" or ""), chineseZodiac (like "Ox (소띠)" or ""), company, debutDate
+          ("YYYY-MM-DD" with optional description after colon, or ""), group (or ""), instagramUrl,
+          profilePic, school (array), spotifyUrl, youtubeUrl, zodiacSign (like "Aries (양자리)" or "")
+
+        For groups (is_group true), return:
+        - company, debutDate, instagramUrl, profilePic, spotifyUrl, youtubeUrl
+        - members: Array of objects with name, real_name, gender, name_kr (ONLY if Korean), birthDate,
+          chineseZodiac, nationality, profilePic, instagramUrl, spotifyUrl, youtubeUrl, school, zodiacSign
+
+        CRITICAL INSTRUCTIONS:
+        1. For any field where information is uncertain or unknown, use "" or [].
+        2. For URLs, provide complete URLs (including https://) or empty strings.
+        3. Only include Korean names (name_kr) for Korean members.
+
+        Return a single JSON object keyed by each figure's "name".
+        """
+        try:
+            async with self.semaphore:
+                response = await self.news_manager.client.chat.completions.create(
+                    model=self.news_manager.model,
+                    messages=[
+                        {"role": "system", "content": "You are a knowledgeable assistant that provides accurate information about public figures."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.2,
+                    response_format={"type": "json_object"}
+                )
+            result = _parse_json_response(response.choices[0].message.content.strip())
+        except Exception as e:
+            print(f"  ✗ Enrichment request failed for {len(figure_docs)} figures: {e}")
+            return {}
+
+        enriched = {}
+        for doc, figure in zip(figure_docs, figures):
+            fields = result.get(figure["name"])
+            if isinstance(fields, dict):
+                enriched[doc.id] = self._clean_fields(doc.to_dict(), fields)
+        return enriched
+
+    def _clean_fields(self, existing: dict, fields: dict) -> dict:
+        """Keeps only tier-2 fields, never overwriting values that are already set."""
+        is_group = bool(existing.get("is_group"))
+        allowed = GROUP_ENRICHMENT_FIELDS if is_group else INDIVIDUAL_ENRICHMENT_FIELDS
+        update = {}
+        for field in allowed:
+            value = fields.get(field)
+            if value and not existing.get(field):
+                update[field] = value
+
+        if is_group and isinstance(update.get("members"), list):
+            members = []
+            for member in update["members"]:
+                if not isinstance(member, dict) or not member.get("name"):
+                    continue
+                member = {field: member.get(field, default) for field, default in MEMBER_FIELDS.items()}
+                if not _is_korean(member["nationality"] or existing.get("nationality")):
+                    member["name_kr"] = ""
+                members.append(member)
+            update["members"] = members
+        return update
+
+    async def enrich_pending(self, limit: int = None):
+        """Enriches every pending figure and writes the results with batched commits."""
+        try:
+            pending_docs = self._fetch_pending(limit)
+            if not pending_docs:
+                print("No figures pending enrichment.")
+                return
+            pending_docs = await self._retry_core_research(pending_docs)
+            if not pending_docs:
+                return
+
+            batches = [pending_docs[i:i + self.figures_per_request]
+                       for i in range(0, len(pending_docs), self.figures_per_request)]
+            print(f"🚀 Enriching {len(pending_docs)} figures in {len(batches)} requests...")
+            results = {}
+            for batch_result in await asyncio.gather(*(self._enrich_batch(batch) for batch in batches)):
+                results.update(batch_result)
+
+            writer = BatchWriter(self.db)
+            for doc in pending_docs:
+                if doc.id not in results:
+                    # Leave it pending so the next run retries it
+                    continue
+                writer.update(doc.reference, {
+                    **results[doc.id],
+                    ENRICHMENT_STATUS_FIELD: "complete",
+                    "lastUpdated": datetime.now(pytz.timezone('Asia/Seoul')).strftime("%Y-%m-%d")
+                })
+            writer.commit()
+            print(f"✓ Enriched {len(results)}/{len(pending_docs)} figures.")
+        finally:
+            if self._owns_manager:
+                await self.news_manager.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fills the remaining profile fields of newly created figures.")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of pending figures to enrich.")
+    parser.add_argument("--batch-size", type=int, default=FIGURES_PER_REQUEST,
+                        help=f"Figures per enrichment request (default: {FIGURES_PER_REQUEST}).")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum number of concurrent requests (default: {DEFAULT_CONCURRENCY}).")
+    args = parser.parse_args()
+
+    enricher = FigureEnricher(figures_per_request=args.batch_size, concurrency=args.concurrency)
+    await enricher.enrich_pending(limit=args.limit)
+
+
+if __name__ == "__main__":
+    # Example:
+    # python figure_enrichment.py --batch-size 5
+    asyncio.run(main())
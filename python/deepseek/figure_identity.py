@@ -0,0 +1,226 @@
+# figure_identity.py
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import unicodedata
+
+# --- CONFIGURATION ---
+DEFAULT_CACHE_PATH = "figure_identity_cache.json"
+CACHE_MAX_AGE_HOURS = 24  # Rebuild from Firestore when the cache is older than this
+CACHE_VERSION = 1
+
+# When two figures claim the same alias, the stronger source wins
+ALIAS_SOURCE_PRIORITY = {
+    "name": 0,
+    "doc_id": 1,
+    "name_kr": 2,
+    "stage_name": 3,
+    "real_name": 4,
+}
+
+
+def normalize_name_for_doc_id(name: str) -> str:
+    """Creates a Firestore document ID from a figure name (e.g. 'NCT 127' -> 'nct127')."""
+    return name.lower().replace(" ", "").replace("-", "").replace(".", "")
+
+
+def alias_key(surface_form: str) -> str:
+    """Case-folds and normalizes a surface form for alias lookups."""
+    return " ".join(unicodedata.normalize("NFKC", surface_form).casefold().split())
+
+
+class FigureIdentityResolver:
+    """
+    In-memory alias index from any known surface form of a figure (name,
+    Hangul name_kr, member stage and real names) to its canonical
+    'selected-figures' document ID. Lookups are dict hits; collisions between
+    figures are detected while the index is built.
+    """
+    def __init__(self):
+        self.alias_to_id = {}  # alias_key -> figure_id
+        self.id_to_name = {}  # figure_id -> canonical name
+        self.collisions = []
+        self._alias_priority = {}  # alias_key -> priority of the source that set it
+
+    def add_alias(self, surface_form: str, figure_id: str, source: str):
+        """
+        Registers a surface form for a figure.
+
+        Args:
+            surface_form (str): The name as it may appear in articles.
+            figure_id (str): The canonical document ID.
+            source (str): One of ALIAS_SOURCE_PRIORITY, used to settle collisions.
+        """
+        if not isinstance(surface_form, str) or not surface_form.strip():
+            return
+        key = alias_key(surface_form)
+        priority = ALIAS_SOURCE_PRIORITY[source]
+        existing_id = self.alias_to_id.get(key)
+
+        if existing_id is None:
+            self.alias_to_id[key] = figure_id
+            self._alias_priority[key] = priority
+            return
+        if existing_id == figure_id:
+            self._alias_priority[key] = min(priority, self._alias_priority[key])
+            return
+
+        existing_priority = self._alias_priority[key]
+        winner = figure_id if priority < existing_priority else existing_id
+        self.collisions.append({
+            "alias": surface_form,
+            "figure_ids": sorted([existing_id, figure_id]),
+            "resolved_to": winner,
+        })
+        if winner == figure_id:
+            self.alias_to_id[key] = figure_id
+            self._alias_priority[key] = priority
+
+    def add_figure(self, figure_id: str, figure_data: dict):
+        """Registers every alias of a 'selected-figures' document."""
+        name = figure_data.get("name")
+        if name:
+            self.id_to_name[figure_id] = name
+            self.add_alias(name, figure_id, "name")
+        self.add_alias(figure_id, figure_id, "doc_id")
+        self.add_alias(figure_data.get("name_kr"), figure_id, "name_kr")
+
+    def add_group_members(self, figure_data: dict):
+        """
+        Maps member stage and real names to the member's own document, when one
+        exists. Must be called after every figure has been added.
+        """
+        for member in figure_data.get("members") or []:
+            if not isinstance(member, dict) or not member.get("name"):
+                continue
+            member_id = self.resolve(member["name"])
+            if not member_id:
+                continue
+            self.add_alias(member["name"], member_id, "stage_name")
+            self.add_alias(member.get("real_name"), member_id, "real_name")
+            self.add_alias(member.get("name_kr"), member_id, "name_kr")
+
+    @classmethod
+    def from_documents(cls, figure_docs):
+        """Builds the index from 'selected-figures' snapshots."""
+        resolver = cls()
+        figures = [(doc.id, doc.to_dict() or {}) for doc in figure_docs]
+        for figure_id, figure_data in figures:
+            resolver.add_figure(figure_id, figure_data)
+        for _, figure_data in figures:
+            if figure_data.get("is_group"):
+                resolver.add_group_members(figure_data)
+        if resolver.collisions:
+            print(f"  ⚠️  {len(resolver.collisions)} alias collisions detected while building the identity index:")
+            for collision in resolver.collisions[:10]:
+                print(f"       '{collision['alias']}' -> {collision['figure_ids']} (using '{collision['resolved_to']}')")
+        return resolver
+
+    @classmethod
+    def from_firestore(cls, db):
+        """Builds the index from a single projected read of 'selected-figures'."""
+        print("  -> Building figure identity index from 'selected-figures'...")
+        docs = db.collection("selected-figures").select(["name", "name_kr", "is_group", "members"]).stream()
+        resolver = cls.from_documents(docs)
+        print(f"  ✓ Identity index ready: {len(resolver.id_to_name)} figures, {len(resolver.alias_to_id)} aliases.")
+        return resolver
+
+    @classmethod
+    def load_or_build(cls, db, cache_path: str = DEFAULT_CACHE_PATH, max_age_hours: float = CACHE_MAX_AGE_HOURS):
+        """Loads the index from the JSON cache if it is fresh, otherwise rebuilds and saves it."""
+        if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < max_age_hours * 3600:
+            try:
+                return cls.load(cache_path)
+            except (ValueError, KeyError) as e:
+                print(f"  ! Ignoring unreadable identity cache '{cache_path}': {e}")
+        resolver = cls.from_firestore(db)
+        resolver.save(cache_path)
+        return resolver
+
+    def resolve(self, surface_form: str):
+        """
+        Returns the canonical figure ID for a surface form, or None. Falls back
+        to the document-ID normalization for spelling variants like 'New Jeans'.
+        """
+        if not isinstance(surface_form, str) or not surface_form.strip():
+            return None
+        figure_id = self.alias_to_id.get(alias_key(surface_form))
+        if figure_id:
+            return figure_id
+        doc_id = normalize_name_for_doc_id(surface_form.strip())
+        return doc_id if doc_id in self.id_to_name else None
+
+    def resolve_many(self, surface_forms) -> set:
+        """Resolves a list of names (e.g. an article's 'public_figures') to a set of figure IDs."""
+        figure_ids = set()
+        for surface_form in surface_forms or []:
+            figure_id = self.resolve(surface_form)
+            if figure_id:
+                figure_ids.add(figure_id)
+        return figure_ids
+
+    def doc_id_for(self, name: str) -> str:
+        """Canonical ID of a known figure, or the normalized document ID for a new one."""
+        return self.resolve(name) or normalize_name_for_doc_id(name)
+
+    def save(self, cache_path: str = DEFAULT_CACHE_PATH):
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": CACHE_VERSION,
+                "aliases": self.alias_to_id,
+                "alias_priority": self._alias_priority,
+                "names": self.id_to_name,
+                "collisions": self.collisions,
+            }, f, ensure_ascii=False)
+        print(f"  ✓ Saved identity index to '{cache_path}'.")
+
+    @classmethod
+    def load(cls, cache_path: str = DEFAULT_CACHE_PATH):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CACHE_VERSION:
+            raise ValueError(f"cache version {data.get('version')} != {CACHE_VERSION}")
+        resolver = cls()
+        resolver.alias_to_id = data["aliases"]
+        resolver._alias_priority = data["alias_priority"]
+        resolver.id_to_name = data["names"]
+        resolver.collisions = data.get("collisions", [])
+        print(f"  ✓ Loaded identity index from '{cache_path}' ({len(resolver.id_to_name)} figures).")
+        return resolver
+
+
+async def main():
+    from setup_firebase_deepseek import NewsManager
+
+    parser = argparse.ArgumentParser(description="Builds and queries the figure identity (alias) index.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index from Firestore and save the cache.")
+    parser.add_argument("--cache", type=str, default=DEFAULT_CACHE_PATH, help=f"Cache file (default: {DEFAULT_CACHE_PATH}).")
+    parser.add_argument("--resolve", type=str, nargs="*", help="Names to resolve to figure IDs.")
+    parser.add_argument("--collisions", action="store_true", help="List alias collisions.")
+    args = parser.parse_args()
+
+    manager = NewsManager()
+    try:
+        if args.rebuild:
+            resolver = FigureIdentityResolver.from_firestore(manager.db)
+            resolver.save(args.cache)
+        else:
+            resolver = FigureIdentityResolver.load_or_build(manager.db, args.cache)
+
+        for name in args.resolve or []:
+            print(f"  '{name}' -> {resolver.resolve(name)}")
+        if args.collisions:
+            for collision in resolver.collisions:
+                print(f"  '{collision['alias']}': {collision['figure_ids']} -> {collision['resolved_to']}")
+    finally:
+        await manager.close()
+
+
+if __name__ == "__main__":
+    # Examples:
+    # python figure_identity.py --rebuild --collisions
+    # python figure_identity.py --resolve "New Jeans" "뉴진스" "Kim Min-ji"
+    asyncio.run(main())
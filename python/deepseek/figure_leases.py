@@ -0,0 +1,250 @@
+# figure_leases.py
+
+# Lease-based claiming of figures, so several run_full_update.py processes
+# (or machines) can share one work list without two of them updating the
+# same figure's curated-timeline and wiki documents at the same time.
+#
+# A process runs a figure only while it holds that figure's lease. Leases
+# expire unless renewed, so a crashed process's figures are handed over to
+# the others after at most one TTL. Processes that share a run ID also skip
+# figures another process already completed in that run.
+
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+# --- CONFIGURATION ---
+LEASE_COLLECTION = "figure-leases"  # Firestore collection, one document per figure
+DEFAULT_LEASE_SECONDS = 10 * 60
+RENEW_FRACTION = 1 / 3  # Renew after this fraction of the TTL has passed
+
+
+class LeaseLost(Exception):
+    """Raised in a figure's run when its lease could not be renewed."""
+
+
+class FirestoreLeaseStore:
+    """Leases stored in Firestore, shared by every process using the project."""
+    def __init__(self, db, collection: str = LEASE_COLLECTION):
+        self.db = db
+        self.collection = db.collection(collection)
+
+    def acquire(self, figure_id: str, owner: str, ttl: float, run_id: str = None) -> bool:
+        """Takes the lease if it is free, expired or already ours. Returns True on success."""
+        from firebase_admin import firestore
+
+        ref = self.collection.document(figure_id)
+
+        @firestore.transactional
+        def take(transaction):
+            lease = ref.get(transaction=transaction).to_dict() or {}
+            if not _can_take(lease, owner, run_id, time.time()):
+                return False
+            transaction.set(ref, _lease_fields(owner, ttl, lease), merge=True)
+            return True
+
+        return take(self.db.transaction())
+
+    def renew(self, figure_id: str, owner: str, ttl: float) -> bool:
+        """Extends a lease we hold. Returns False if it was lost to another owner."""
+        from firebase_admin import firestore
+
+        ref = self.collection.document(figure_id)
+
+        @firestore.transactional
+        def extend(transaction):
+            snapshot = ref.get(transaction=transaction)
+            if (snapshot.to_dict() or {}).get("owner") != owner:
+                return False
+            transaction.update(ref, {"expires_at": time.time() + ttl})
+            return True
+
+        return extend(self.db.transaction())
+
+    def release(self, figure_id: str, owner: str, completed_run: str = None):
+        """Frees a lease we hold, recording the run it was completed in, if any."""
+        from firebase_admin import firestore
+
+        ref = self.collection.document(figure_id)
+
+        @firestore.transactional
+        def free(transaction):
+            snapshot = ref.get(transaction=transaction)
+            if (snapshot.to_dict() or {}).get("owner") == owner:
+                transaction.update(ref, _released_fields(completed_run))
+
+        free(self.db.transaction())
+
+
+class SQLiteLeaseStore:
+    """
+    Local stand-in for FirestoreLeaseStore: the same semantics in a SQLite
+    file, for several processes on one machine and for trying sharding out
+    without touching Firestore.
+    """
+    def __init__(self, path: str = "figure_leases.sqlite3"):
+        self.path = path
+        # The lease manager calls the store from worker threads; the lock serializes them
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (figure_id TEXT PRIMARY KEY, owner TEXT, "
+            "expires_at REAL, acquired_at REAL, completed_run TEXT)"
+        )
+
+    def _get(self, figure_id):
+        row = self._conn.execute(
+            "SELECT owner, expires_at, completed_run FROM leases WHERE figure_id = ?", (figure_id,)
+        ).fetchone()
+        return dict(zip(("owner", "expires_at", "completed_run"), row)) if row else {}
+
+    def acquire(self, figure_id: str, owner: str, ttl: float, run_id: str = None) -> bool:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                lease = self._get(figure_id)
+                if not _can_take(lease, owner, run_id, time.time()):
+                    return False
+                fields = _lease_fields(owner, ttl, lease)
+                self._conn.execute(
+                    "INSERT INTO leases (figure_id, owner, expires_at, acquired_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(figure_id) DO UPDATE SET owner = excluded.owner, "
+                    "expires_at = excluded.expires_at, acquired_at = excluded.acquired_at",
+                    (figure_id, fields["owner"], fields["expires_at"], fields["acquired_at"])
+                )
+                return True
+            finally:
+                self._conn.execute("COMMIT")
+
+    def renew(self, figure_id: str, owner: str, ttl: float) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE figure_id = ? AND owner = ?",
+                (time.time() + ttl, figure_id, owner)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, figure_id: str, owner: str, completed_run: str = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE leases SET owner = NULL, expires_at = 0, "
+                "completed_run = COALESCE(?, completed_run) WHERE figure_id = ? AND owner = ?",
+                (_released_fields(completed_run).get("completed_run"), figure_id, owner)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _can_take(lease: dict, owner: str, run_id: str, now: float) -> bool:
+    if run_id and lease.get("completed_run") == run_id:
+        return False  # Another process already finished this figure in this run
+    return not lease.get("owner") or lease.get("owner") == owner or (lease.get("expires_at") or 0) < now
+
+
+def _lease_fields(owner: str, ttl: float, previous: dict) -> dict:
+    now = time.time()
+    # Keep the original acquisition time when re-acquiring our own lease
+    acquired_at = previous.get("acquired_at") if previous.get("owner") == owner else None
+    return {"owner": owner, "expires_at": now + ttl, "acquired_at": acquired_at or now}
+
+
+def _released_fields(completed_run: str) -> dict:
+    fields = {"owner": None, "expires_at": 0}
+    if completed_run:
+        fields["completed_run"] = completed_run
+    return fields
+
+
+class FigureLeaseManager:
+    """
+    Claims figures for this process and keeps their leases alive while their
+    pipeline runs. If a lease is lost (e.g. the process stalled past the TTL
+    and another process took over), the figure's run is cancelled so the two
+    processes don't both write its documents.
+    """
+    def __init__(self, store, owner: str = None, ttl: float = DEFAULT_LEASE_SECONDS, run_id: str = None):
+        """
+        Args:
+            store (FirestoreLeaseStore | SQLiteLeaseStore): Where leases live.
+            owner (str, optional): This process's identity. Defaults to host, pid and a random suffix.
+            ttl (float): Lease duration in seconds.
+            run_id (str, optional): Shared by the processes of one run; completed figures
+                are then not picked up again by the other processes.
+        """
+        self.store = store
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.ttl = ttl
+        self.run_id = run_id
+        self.skipped = []  # Figures held or completed by other processes
+        self.lost = []  # Figures whose lease was lost mid-run, for the report only
+
+    async def run_leased(self, figure_id: str, run):
+        """
+        Runs `await run()` while holding the figure's lease.
+
+        Returns:
+            bool: False if another process holds (or completed) the figure and it was skipped.
+        """
+        acquired = await asyncio.to_thread(self.store.acquire, figure_id, self.owner, self.ttl, self.run_id)
+        if not acquired:
+            print(f"  -> Skipping '{figure_id}': leased or completed by another process")
+            self.skipped.append(figure_id)
+            return False
+
+        task = asyncio.create_task(run())
+        lost = asyncio.Event()  # Set by the renewer if this run's lease is taken over
+        renewer = asyncio.create_task(self._renew_until_done(figure_id, task, lost))
+        completed = False
+        try:
+            await task
+            completed = True
+        except asyncio.CancelledError:
+            if lost.is_set():
+                raise LeaseLost(f"lease on '{figure_id}' was lost to another process")
+            raise
+        finally:
+            renewer.cancel()
+            if not lost.is_set():
+                await asyncio.to_thread(
+                    self.store.release, figure_id, self.owner, self.run_id if completed else None
+                )
+        return True
+
+    async def _renew_until_done(self, figure_id: str, task: asyncio.Task, lost: asyncio.Event):
+        while not task.done():
+            await asyncio.sleep(self.ttl * RENEW_FRACTION)
+            try:
+                renewed = await asyncio.to_thread(self.store.renew, figure_id, self.owner, self.ttl)
+            except Exception as e:
+                # Transient store errors are retried at the next interval; the TTL leaves room for two
+                print(f"  ⚠️ Could not renew the lease on '{figure_id}': {e}")
+                continue
+            if not renewed:
+                print(f"  ❌ Lost the lease on '{figure_id}'; cancelling its run")
+                self.lost.append(figure_id)
+                lost.set()
+                task.cancel()
+                return
+
+
+def create_lease_manager(backend: str, db=None, ttl: float = DEFAULT_LEASE_SECONDS, run_id: str = None):
+    """
+    Builds a FigureLeaseManager for the `--lease-backend` command-line option.
+
+    Args:
+        backend (str): "firestore" or a path to a SQLite file.
+        db (firestore.Client, optional): Required for the Firestore backend.
+        ttl (float): Lease duration in seconds.
+        run_id (str, optional): See FigureLeaseManager.
+    """
+    store = FirestoreLeaseStore(db) if backend == "firestore" else SQLiteLeaseStore(backend)
+    manager = FigureLeaseManager(store, ttl=ttl, run_id=run_id)
+    print(f"✓ Claiming figures with leases ({backend}, owner {manager.owner}, run {run_id or '-'})")
+    return manager
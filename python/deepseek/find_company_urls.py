@@ -2,24 +2,90 @@ import asyncio
 import argparse
 import re # Import the regular expressions module
 from setup_firebase_deepseek import NewsManager
+from batch_writer import BatchWriter
+
+# --- CONFIGURATION ---
+PIPELINE_STATE_COLLECTION = "pipeline-state"
+COMPANY_URL_CACHE_DOC = "company-urls"  # {"urls": {normalized company: url}}, shared across runs
+DEFAULT_CONCURRENCY = 8  # Maximum number of company lookups in flight at once
+
+# Suffixes that don't distinguish agencies ("SM Entertainment" and "SM Ent." are the same company)
+COMPANY_SUFFIXES = re.compile(
+    r"\b(?:entertainment|ent|co|ltd|inc|corp|corporation|company|labels?|agency)\b|엔터테인먼트",
+    re.IGNORECASE
+)
+
+
+def normalize_company_name(company_name: str) -> str:
+    """
+    Normalizes a company name for deduplication and cache lookups,
+    e.g. 'SM Entertainment', 'SM Ent.' and 'S.M. Entertainment' -> 'sm'.
+    Parentheticals such as a parent company ('ADOR (HYBE)') are ignored.
+    """
+    name = re.sub(r"\([^)]*\)", " ", company_name or "")
+    name = name.replace(".", "")
+    name = COMPANY_SUFFIXES.sub(" ", name)
+    return re.sub(r"[^\w]", "", name.casefold())
+
 
 class CompanyUrlFinder:
     """
     A class to find company URLs based on the company name in Firestore
     and update the document with the URL.
     """
-    def __init__(self):
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY):
         """
         Initializes the CompanyUrlFinder class by creating an instance of NewsManager.
+
+        Args:
+            concurrency (int): Maximum number of concurrent company lookups.
         """
         self.manager = NewsManager()
         self.db = self.manager.db
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.cache_ref = self.db.collection(PIPELINE_STATE_COLLECTION).document(COMPANY_URL_CACHE_DOC)
+
+    def _load_cache(self) -> dict:
+        cache_doc = self.cache_ref.get()
+        return (cache_doc.to_dict() or {}).get("urls", {}) if cache_doc.exists else {}
+
+    async def _lookup_company_url(self, company_name: str):
+        """Asks the AI model for a company's official website. Returns the URL or None."""
+        # Create a prompt for the AI model to get only the URL
+        prompt = f"What is the official website for the company '{company_name}'? Please provide only the URL and nothing else."
+
+        try:
+            async with self.semaphore:
+                # Call the DeepSeek API
+                chat_completion = await self.manager.client.chat.completions.create(
+                    model=self.manager.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=100 # Increased max_tokens slightly to not cut off conversational text
+                )
+            raw_output = chat_completion.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"  - An error occurred while looking up '{company_name}': {e}")
+            return None
+
+        # Use a regular expression to find the first URL in the model's output
+        url_match = re.search(r'https?://[^\s]+', raw_output)
+        if not url_match:
+            print(f"  - Could not extract a valid URL for '{company_name}'. Received: '{raw_output}'")
+            return None
+
+        found_url = url_match.group(0).strip(".,") # Get the matched URL and remove trailing punctuation
+        print(f"  - Extracted URL for '{company_name}': {found_url}")
+        return found_url
 
     async def find_and_update_urls(self, figure_id_to_test: str = None):
         """
         Fetches documents, finds company URLs using an AI model,
         and updates the Firestore documents with a 'companyUrl' field.
 
+        Each distinct (normalized) company is looked up once, concurrently, and
+        the results are cached in 'pipeline-state/company-urls'
+        so later runs only pay for companies they haven't seen.
+
         Args:
             figure_id_to_test (str, optional): If provided, only this figure will be processed.
                                               Defaults to None.
@@ -38,55 +104,58 @@ class CompanyUrlFinder:
                 figures_stream = [figure_doc_to_test]
             else:
                 print("--- RUNNING IN FULL MIGRATION MODE ---")
-                figures_stream = figures_ref.stream()
+                figures_stream = figures_ref.select(['company', 'companyUrl']).stream()
+
+            url_cache = self._load_cache()
+            new_cache_entries = {}
+            figures_by_company = {}  # normalized company -> [figure snapshots missing 'companyUrl']
+            company_names = {}  # normalized company -> a name as written on a figure, for the prompt
 
             for figure_doc in figures_stream:
-                figure_id = figure_doc.id
-                print(f"\n--- Processing Figure: {figure_id} ---")
-
-                try:
-                    data = figure_doc.to_dict()
-                    company_name = data.get('company')
-                    company_url = data.get('companyUrl')
-
-                    if company_url:
-                        print(f"  - 'companyUrl' already exists for {figure_id}. Skipping.")
-                        continue
-
-                    if not company_name:
-                        print(f"  - 'company' field not found for {figure_id}. Skipping.")
-                        continue
-                    
-                    print(f"  - Found company: '{company_name}'. Searching for website.")
-
-                    # Create a prompt for the AI model to get only the URL
-                    prompt = f"What is the official website for the company '{company_name}'? Please provide only the URL and nothing else."
-
-                    # Call the DeepSeek API
-                    chat_completion = await self.manager.client.chat.completions.create(
-                        model=self.manager.model,
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=100 # Increased max_tokens slightly to not cut off conversational text
-                    )
-                    raw_output = chat_completion.choices[0].message.content.strip()
-
-                    # Use a regular expression to find the first URL in the model's output
-                    url_match = re.search(r'https?://[^\s]+', raw_output)
-
-                    if url_match:
-                        found_url = url_match.group(0).strip(".,") # Get the matched URL and remove trailing punctuation
-                        print(f"  - Extracted URL: {found_url}")
-                        
-                        # Update the document in Firestore
-                        figure_doc.reference.update({'companyUrl': found_url})
-                        print(f"  - Successfully updated {figure_id} with company URL.")
-                    else:
-                        print(f"  - Could not extract a valid URL for '{company_name}'. Received: '{raw_output}'")
-
-                except Exception as e:
-                    print(f"  - An error occurred while processing {figure_id}: {e}")
-
-            print("\n✅ All figures have been processed.")
+                data = figure_doc.to_dict() or {}
+                company_key = normalize_company_name(data.get('company', ''))
+                if not company_key:
+                    print(f"  - 'company' field not found for {figure_doc.id}. Skipping.")
+                    continue
+
+                if data.get('companyUrl'):
+                    # Figures that already have a URL seed the cache for their company for free
+                    if company_key not in url_cache:
+                        new_cache_entries[company_key] = data['companyUrl']
+                        url_cache[company_key] = data['companyUrl']
+                    continue
+
+                figures_by_company.setdefault(company_key, []).append(figure_doc)
+                company_names.setdefault(company_key, data['company'])
+
+            to_lookup = [company_key for company_key in figures_by_company if company_key not in url_cache]
+            pending_figures = sum(len(docs) for docs in figures_by_company.values())
+            print(f"  -> {pending_figures} figures need a URL across {len(figures_by_company)} companies; "
+                  f"{len(figures_by_company) - len(to_lookup)} cached, {len(to_lookup)} to look up.")
+
+            found_urls = await asyncio.gather(*(self._lookup_company_url(company_names[key]) for key in to_lookup))
+            for company_key, found_url in zip(to_lookup, found_urls):
+                if found_url:
+                    url_cache[company_key] = found_url
+                    new_cache_entries[company_key] = found_url
+
+            if new_cache_entries:
+                self.cache_ref.set({"urls": new_cache_entries}, merge=True)
+                print(f"  ✓ Cached {len(new_cache_entries)} new company URLs.")
+
+            writer = BatchWriter(self.db)
+            updated = 0
+            for company_key, figure_docs in figures_by_company.items():
+                company_url = url_cache.get(company_key)
+                if not company_url:
+                    continue
+                for figure_doc in figure_docs:
+                    writer.update(figure_doc.reference, {'companyUrl': company_url})
+                    updated += 1
+            writer.commit()
+
+            print(f"\n✅ All figures have been processed. Updated {updated} figures "
+                  f"with {len(to_lookup)} lookups.")
 
         except Exception as e:
             print(f"\n❌ An error occurred during the process: {e}")
@@ -100,11 +169,13 @@ async def main():
     """
     parser = argparse.ArgumentParser(description="Find and update company URLs for figures in Firestore.")
     parser.add_argument("--figure", type=str, help="The ID of a single figure to process for testing.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum number of concurrent company lookups (default: {DEFAULT_CONCURRENCY}).")
     args = parser.parse_args()
 
-    finder = CompanyUrlFinder()
+    finder = CompanyUrlFinder(concurrency=args.concurrency)
     await finder.find_and_update_urls(figure_id_to_test=args.figure)
 
 if __name__ == "__main__":
     # Run the asynchronous main function
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -1,17 +1,35 @@
 import asyncio
+import json
 import os
+import re
 from datetime import datetime
 import pytz
 from public_figure_extractor import PublicFigureExtractor
+from figure_identity import normalize_name_for_doc_id
 from setup_firebase_deepseek import NewsManager
+from batch_writer import BatchWriter
+
+# --- CONFIGURATION ---
+DEFAULT_CONCURRENCY = 8  # Maximum number of member research calls in flight at once
+ENRICHMENT_BATCH_SIZE = 20  # Seeded members per enrichment request
+# Fields a member document needs that the group's 'members' payload does not carry
+SEED_ENRICHMENT_FIELDS = ["occupation", "debutDate"]
 
 
 class GroupMemberProcessor:
-    def __init__(self):
-        """Initialize the processor with Firebase and DeepSeek connections"""
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Initialize the processor with Firebase and DeepSeek connections
+
+        Args:
+            concurrency (int): Maximum number of concurrent member research calls
+        """
         self.news_manager = NewsManager()
         # We'll use the research functionality from PublicFigureExtractor
         self.extractor = PublicFigureExtractor()
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.member_payloads = {}  # member name -> {"member", "group_name", "group_data"} from the group documents
         
     async def process_group_members(self, dry_run=False):
         """
@@ -57,16 +75,16 @@ class GroupMemberProcessor:
                     print("=== DRY RUN MODE - No changes will be made ===")
                     print(f"Would create {len(missing_members)} new member documents:")
                     
-                    # Enhanced dry-run: Check for potential overwrites
+                    # Enhanced dry-run: Check for potential overwrites with one batched read
                     potential_overwrites = []
+                    existing_names = self._prefetch_existing_names(
+                        [normalize_name_for_doc_id(member_name) for member_name in missing_members]
+                    )
                     for member_name in missing_members:
-                        doc_id = member_name.lower().replace(" ", "").replace("-", "").replace(".", "")
-                        member_doc_ref = self.news_manager.db.collection("selected-figures").document(doc_id)
-                        existing_doc = member_doc_ref.get()
+                        doc_id = normalize_name_for_doc_id(member_name)
                         
-                        if existing_doc.exists:
-                            existing_data = existing_doc.to_dict()
-                            existing_name = existing_data.get("name", "")
+                        if doc_id in existing_names:
+                            existing_name = existing_names[doc_id]
                             potential_overwrites.append({
                                 "member_name": member_name,
                                 "doc_id": doc_id,
@@ -158,6 +176,12 @@ class GroupMemberProcessor:
                         member_name = member["name"].strip()
                         if member_name:
                             all_member_names.add(member_name)
+                            # Keep the group's payload so the member can be seeded without a new research call
+                            self.member_payloads.setdefault(member_name, {
+                                "member": member,
+                                "group_name": group_name,
+                                "group_data": group_data
+                            })
                             print(f"    - {member_name}")
                     else:
                         print(f"    Warning: Invalid member format in {group_name}: {member}")
@@ -179,7 +203,7 @@ class GroupMemberProcessor:
             missing_members = []
             
             # Get all document IDs and names in selected-figures collection
-            existing_docs = self.news_manager.db.collection("selected-figures").stream()
+            existing_docs = self.news_manager.db.collection("selected-figures").select(["name"]).stream()
             existing_doc_names = set()
             existing_doc_ids = set()
             doc_id_to_name = {}  # Map document IDs to actual names for safety checking
@@ -205,15 +229,15 @@ class GroupMemberProcessor:
                     print(f"  ✓ Found existing document for '{member_name}' (exact name match)")
                 else:
                     # Check by document ID to catch potential ID collisions
-                    expected_doc_id = member_name.lower().replace(" ", "").replace("-", "").replace(".", "")
+                    expected_doc_id = normalize_name_for_doc_id(member_name)
                     
                     if expected_doc_id in existing_doc_ids:
                         existing_name = doc_id_to_name.get(expected_doc_id, "Unknown")
                         print(f"  ⚠️  Document ID '{expected_doc_id}' exists for '{existing_name}' but member name is '{member_name}'")
                         
                         # Check if names are similar (case-insensitive, ignoring spaces/punctuation)
-                        normalized_existing = existing_name.lower().replace(" ", "").replace("-", "").replace(".", "")
-                        normalized_member = member_name.lower().replace(" ", "").replace("-", "").replace(".", "")
+                        normalized_existing = normalize_name_for_doc_id(existing_name)
+                        normalized_member = normalize_name_for_doc_id(member_name)
                         
                         if normalized_existing == normalized_member:
                             print(f"  ✓ Names are equivalent variants - treating as existing member")
@@ -234,91 +258,228 @@ class GroupMemberProcessor:
             print(f"Error checking existing members: {e}")
             raise
     
+    def _prefetch_existing_names(self, doc_ids):
+        """
+        Checks which of the given document IDs already exist with one batched read.
+
+        Returns:
+            dict: {doc_id: existing name} for every ID that exists
+        """
+        if not doc_ids:
+            return {}
+        collection_ref = self.news_manager.db.collection("selected-figures")
+        refs = [collection_ref.document(doc_id) for doc_id in dict.fromkeys(doc_ids)]
+        return {
+            doc.id: (doc.to_dict() or {}).get("name", "")
+            for doc in self.news_manager.db.get_all(refs, field_paths=["name"])
+            if doc.exists
+        }
+
+    def _seed_member_from_group(self, member_name):
+        """
+        Builds a member document from the group's 'members' payload. The group
+        name and company come from the group itself; fields the payload doesn't
+        carry (SEED_ENRICHMENT_FIELDS) are left empty for _enrich_seeded_members.
+
+        Returns:
+            dict or None: The seeded research data, or None if the payload is too thin to use.
+        """
+        payload = self.member_payloads.get(member_name)
+        if not payload:
+            return None
+        member = payload["member"]
+        group_data = payload["group_data"]
+
+        seeded = {
+            "gender": member.get("gender", ""),
+            "occupation": [],
+            "nationality": member.get("nationality", "") or group_data.get("nationality", ""),
+            "name_kr": member.get("name_kr", ""),
+            "real_name": member.get("real_name", ""),
+            "is_group": False,
+            "birthDate": member.get("birthDate", ""),
+            "chineseZodiac": member.get("chineseZodiac", ""),
+            "company": group_data.get("company", ""),
+            "debutDate": "",
+            "group": payload["group_name"],
+            "instagramUrl": member.get("instagramUrl", ""),
+            "profilePic": member.get("profilePic", ""),
+            "school": member.get("school", []),
+            "spotifyUrl": member.get("spotifyUrl", ""),
+            "youtubeUrl": member.get("youtubeUrl", ""),
+            "zodiacSign": member.get("zodiacSign", ""),
+            "lastUpdated": datetime.now(pytz.timezone('Asia/Seoul')).strftime("%Y-%m-%d")
+        }
+        # Require at least one personal field so we don't create an empty shell
+        if not (seeded["gender"] or seeded["birthDate"] or member.get("nationality")):
+            return None
+        return seeded
+
+    async def _enrich_seeded_batch(self, batch):
+        """
+        Fills SEED_ENRICHMENT_FIELDS for a batch of seeded members with one request.
+
+        Args:
+            batch (list): (member_name, seeded_data) tuples. seeded_data is updated in place.
+        """
+        members = [{"name": name, "group": data["group"]} for name, data in batch]
+        prompt = f"""
+        For each of the following group members, provide only these fields:
+        - occupation: Array of primary occupations (singer, rapper, dancer, actor, idol, etc.)
+        - debutDate: Debut date in format "YYYY-MM-DD" with optional description after colon, or "" if unknown
+
+        Members:
+        {json.dumps(members, ensure_ascii=False)}
+
+        Return a JSON object keyed by each member's "name", e.g.
+        {{"Member Name": {{"occupation": ["Singer"], "debutDate": "2022-07-22"}}}}
+        """
+        try:
+            async with self.semaphore:
+                response = await self.news_manager.client.chat.completions.create(
+                    model=self.news_manager.model,
+                    messages=[
+                        {"role": "system", "content": "You are a knowledgeable assistant that provides accurate information about public figures."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.2,
+                    response_format={"type": "json_object"}
+                )
+            result = response.choices[0].message.content.strip()
+            json_match = re.search(r"\{.*\}", result, re.DOTALL)
+            enriched = json.loads(json_match.group(0) if json_match else result)
+        except Exception as e:
+            print(f"  ✗ Enrichment request failed for {len(batch)} members: {e}")
+            return
+
+        for member_name, seeded in batch:
+            member_fields = enriched.get(member_name) or {}
+            for field in SEED_ENRICHMENT_FIELDS:
+                if member_fields.get(field):
+                    seeded[field] = member_fields[field]
+
+    async def _enrich_seeded_members(self, seeded_members):
+        """Runs the batched enrichment requests for all seeded members concurrently."""
+        batch = list(seeded_members.items())
+        batches = [batch[i:i + ENRICHMENT_BATCH_SIZE] for i in range(0, len(batch), ENRICHMENT_BATCH_SIZE)]
+        if batches:
+            print(f"Enriching {len(batch)} seeded members in {len(batches)} batched requests...")
+            await asyncio.gather(*(self._enrich_seeded_batch(b) for b in batches))
+
+    async def _research_member(self, member_name):
+        """Researches one member under the concurrency limit. Returns (member_name, info or None)."""
+        async with self.semaphore:
+            print(f"  Researching information for {member_name}...")
+            try:
+                member_info = await self._research_public_figure_async(member_name)
+            except Exception as research_error:
+                print(f"  ✗ Error during research for {member_name}: {research_error}")
+                return member_name, None
+
+        # Check if research returned meaningful data
+        if not member_info or not self._is_valid_research_result(member_info):
+            print(f"  ✗ Research failed or returned insufficient data for {member_name}. Skipping document creation.")
+            return member_name, None
+        return member_name, member_info
+
+    def _queue_member_document(self, writer, member_name, member_info, seeded_from_group=False):
+        """Queues the creation of a member document on the batch writer."""
+        # Create document ID (same logic as in the original script)
+        doc_id = normalize_name_for_doc_id(member_name)
+        member_doc_ref = self.news_manager.db.collection("selected-figures").document(doc_id)
+        
+        # Prepare document data
+        member_data = {
+            "name": member_name,
+            "sources": [],  # Start with empty sources
+            "lastUpdated": datetime.now(pytz.timezone('Asia/Seoul')).strftime("%Y-%m-%d"),
+            "created_from_group_processing": True,  # Flag to indicate how this was created
+            "seeded_from_group": seeded_from_group,
+            **member_info  # Unpack all researched info
+        }
+        
+        # Additional safety: Log what we're about to create
+        print(f"  📝 About to create document for '{member_name}' with ID '{doc_id}'")
+        print(f"      Data summary: gender='{member_data.get('gender', '')}', occupation={member_data.get('occupation', [])}, nationality='{member_data.get('nationality', '')}'")
+        
+        # Create the document (using set since we've verified it doesn't exist)
+        writer.set(member_doc_ref, member_data)
+
     async def _create_missing_member_documents(self, missing_members):
-        """Create documents for missing members using research_public_figure"""
+        """
+        Create documents for missing members. Members listed in a group's 'members'
+        payload are seeded from it and enriched in batched requests; only the rest
+        go through research_public_figure. Existence is checked for all members with
+        one batched read, research runs concurrently (bounded by the semaphore) and
+        documents are written in batches.
+        """
         try:
             print(f"Creating {len(missing_members)} missing member documents...")
             
             created_count = 0
             failed_count = 0
             
-            for i, member_name in enumerate(missing_members, 1):
-                print(f"\nProcessing member {i}/{len(missing_members)}: {member_name}")
-                
-                try:
-                    # Research the public figure using the extractor's method
-                    print(f"  Researching information for {member_name}...")
-                    
-                    # The research_public_figure method in PublicFigureExtractor is not async
-                    # but it uses an async client, so we need to handle this properly
-                    try:
-                        member_info = await self._research_public_figure_async(member_name)
-                        
-                        # Check if research returned meaningful data
-                        if not member_info or not self._is_valid_research_result(member_info):
-                            print(f"  ✗ Research failed or returned insufficient data for {member_name}. Skipping document creation.")
-                            failed_count += 1
-                            continue
-                            
-                    except Exception as research_error:
-                        print(f"  ✗ Error during research for {member_name}: {research_error}")
-                        print(f"  Skipping document creation for {member_name} due to research failure.")
-                        failed_count += 1
-                        continue
-                    
-                    # Create document ID (same logic as in the original script)
-                    doc_id = member_name.lower().replace(" ", "").replace("-", "").replace(".", "")
-                    
-                    # SAFETY CHECK: Verify the document doesn't already exist
-                    member_doc_ref = self.news_manager.db.collection("selected-figures").document(doc_id)
-                    existing_doc = member_doc_ref.get()
-                    
-                    if existing_doc.exists:
-                        existing_data = existing_doc.to_dict()
-                        existing_name = existing_data.get("name", "")
-                        print(f"  ⚠️  SAFETY ALERT: Document with ID '{doc_id}' already exists!")
-                        print(f"      Existing document name: '{existing_name}'")
-                        print(f"      Trying to create for: '{member_name}'")
-                        
-                        # Additional safety check: verify names match
-                        if existing_name.lower().strip() == member_name.lower().strip():
-                            print(f"  ℹ️  Names match. Document for {member_name} already exists. Skipping creation.")
-                        else:
-                            print(f"  🚨 CRITICAL: Name mismatch! Existing='{existing_name}' vs New='{member_name}'")
-                            print(f"  🚨 This could be a different person with the same document ID!")
-                            print(f"  🚨 SKIPPING to prevent data overwrite!")
-                        
-                        # Always skip if document exists, regardless of name match
-                        print(f"  → Skipping document creation to prevent overwriting existing data")
-                        continue
-                    
-                    # Prepare document data
-                    member_data = {
-                        "name": member_name,
-                        "sources": [],  # Start with empty sources
-                        "lastUpdated": datetime.now(pytz.timezone('Asia/Seoul')).strftime("%Y-%m-%d"),
-                        "created_from_group_processing": True,  # Flag to indicate how this was created
-                        **member_info  # Unpack all researched info
-                    }
-                    
-                    # Additional safety: Log what we're about to create
-                    print(f"  📝 About to create document for '{member_name}' with ID '{doc_id}'")
-                    print(f"      Data summary: gender='{member_data.get('gender', '')}', occupation={member_data.get('occupation', [])}, nationality='{member_data.get('nationality', '')}'")
-                    
-                    # Create the document (using set since we've verified it doesn't exist)
-                    member_doc_ref.set(member_data)
+            # SAFETY CHECK: Verify none of the documents already exist, with one batched read
+            member_doc_ids = {member_name: normalize_name_for_doc_id(member_name) for member_name in missing_members}
+            existing_names = self._prefetch_existing_names(list(member_doc_ids.values()))
+            
+            members_to_create = []
+            claimed_doc_ids = set()
+            for member_name in missing_members:
+                doc_id = member_doc_ids[member_name]
+                if doc_id in existing_names:
+                    existing_name = existing_names[doc_id]
+                    print(f"  ⚠️  SAFETY ALERT: Document with ID '{doc_id}' already exists!")
+                    print(f"      Existing document name: '{existing_name}'")
+                    print(f"      Trying to create for: '{member_name}'")
                     
-                    print(f"  ✓ Successfully created document for {member_name} (ID: {doc_id})")
-                    created_count += 1
+                    # Additional safety check: verify names match
+                    if existing_name.lower().strip() == member_name.lower().strip():
+                        print(f"  ℹ️  Names match. Document for {member_name} already exists. Skipping creation.")
+                    else:
+                        print(f"  🚨 CRITICAL: Name mismatch! Existing='{existing_name}' vs New='{member_name}'")
+                        print(f"  🚨 This could be a different person with the same document ID!")
+                        print(f"  🚨 SKIPPING to prevent data overwrite!")
                     
-                except Exception as e:
-                    print(f"  ✗ Failed to create document for {member_name}: {e}")
+                    # Always skip if document exists, regardless of name match
+                    print(f"  → Skipping document creation to prevent overwriting existing data")
+                    continue
+                if doc_id in claimed_doc_ids:
+                    print(f"  🚨 '{member_name}' maps to ID '{doc_id}', already claimed by another member in this run. Skipping.")
+                    continue
+                claimed_doc_ids.add(doc_id)
+                members_to_create.append(member_name)
+            
+            # Seed members straight from their group's payload; only the rest need a full research call
+            seeded_members = {}
+            for member_name in members_to_create:
+                seeded = self._seed_member_from_group(member_name)
+                if seeded:
+                    seeded_members[member_name] = seeded
+            members_needing_research = [name for name in members_to_create if name not in seeded_members]
+            
+            writer = BatchWriter(self.news_manager.db)
+            
+            await self._enrich_seeded_members(seeded_members)
+            for member_name, member_info in seeded_members.items():
+                self._queue_member_document(writer, member_name, member_info, seeded_from_group=True)
+                created_count += 1
+            
+            print(f"Researching {len(members_needing_research)} members without group data (up to {self.concurrency} at a time)...")
+            for next_result in asyncio.as_completed([self._research_member(name) for name in members_needing_research]):
+                member_name, member_info = await next_result
+                if not member_info:
                     failed_count += 1
                     continue
+                self._queue_member_document(writer, member_name, member_info)
+                created_count += 1
+            
+            writer.commit()
             
             print(f"\n=== Creation Summary ===")
-            print(f"Successfully created: {created_count}")
+            print(f"Successfully created: {created_count} ({len(seeded_members)} seeded from group data)")
             print(f"Failed to create: {failed_count}")
+            print(f"Skipped (already exist): {len(missing_members) - len(members_to_create)}")
             print(f"Total processed: {len(missing_members)}")
             
         except Exception as e:
@@ -578,11 +739,13 @@ async def main():
     parser = argparse.ArgumentParser(description='Process group members and create missing documents')
     parser.add_argument('--dry-run', action='store_true', 
                         help='Run in dry-run mode (show what would be done without making changes)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Maximum number of concurrent member research calls (default: {DEFAULT_CONCURRENCY})')
     
     args = parser.parse_args()
     
     # Create and run the processor
-    processor = GroupMemberProcessor()
+    processor = GroupMemberProcessor(concurrency=args.concurrency)
     await processor.process_group_members(dry_run=args.dry_run)
 
 
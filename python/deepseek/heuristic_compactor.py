@@ -0,0 +1,163 @@
+# heuristic_compactor.py
+
+import re
+from collections import Counter
+
+# --- CONFIGURATION ---
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8  # Below this, the text is left for the LLM
+DESCRIPTION_MAX_SENTENCES = 1
+DESCRIPTION_MAX_WORDS = 30
+EVENT_SUMMARY_MAX_SENTENCES = 3
+EVENT_SUMMARY_MAX_WORDS = 60
+
+# Boilerplate produced by our own pipeline or common in news copy. Only the
+# matched prefix is removed; the rest of the text is kept verbatim.
+TEMPLATE_PATTERNS = [
+    re.compile(r"^On [^,]{1,40}, an event occurred:\s*", re.IGNORECASE),  # CurationEngine._create_mini_event
+    re.compile(r"^(?:It (?:was|has been) (?:reported|announced|revealed) that)\s+", re.IGNORECASE),
+    re.compile(r"^(?:According to (?:reports|sources|an? (?:industry )?(?:official|insider|source))),\s*", re.IGNORECASE),
+    re.compile(r"^(?:In (?:a|another) recent (?:development|update|report)),\s*", re.IGNORECASE),
+]
+
+# Trailing clauses that carry attribution or commentary rather than the fact itself
+TRAILING_CLAUSE_PATTERNS = [
+    re.compile(r"\s*\([^()]*\)"),  # Parentheticals
+    re.compile(r",\s*(?:according to|as reported by|reported by|as per)\b[^,.;]*", re.IGNORECASE),
+    re.compile(r",\s*(?:adding|noting|stating|saying|explaining) that\b[^.;]*", re.IGNORECASE),
+    re.compile(r",\s*which (?:has|have) (?:drawn|attracted|garnered|received)\b[^.;]*", re.IGNORECASE),
+]
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "of", "to", "in", "on", "at", "for", "with", "by",
+    "from", "as", "is", "was", "were", "are", "be", "been", "has", "have", "had", "that",
+    "this", "these", "those", "it", "its", "their", "his", "her", "they", "he", "she", "also",
+    "which", "who", "will", "would", "after", "before", "during", "into", "about", "than",
+}
+
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])[\"'”’]?\s+(?=[\"'“‘(]?[A-Z0-9가-힣])")
+WORD_RE = re.compile(r"[\w'’-]+", re.UNICODE)
+# Tokens that carry facts we don't want to silently drop: numbers and proper nouns
+FACT_TOKEN_RE = re.compile(r"\b(?:\d[\d,.:/-]*|[A-Z][\w'’-]*)\b")
+
+
+class HeuristicCompactor:
+    """
+    Local, extractive compaction for timeline texts. Handles the cases where
+    template stripping, sentence selection and clause trimming produce a text
+    that fits the target length without dropping facts, and reports a
+    confidence so callers can send everything else to the LLM.
+    """
+    def __init__(self, confidence_threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+        """
+        Args:
+            confidence_threshold (float): Minimum confidence (0-1) for a result to be used.
+        """
+        self.confidence_threshold = confidence_threshold
+
+    def compact(self, text: str, kind: str, max_words: int = None):
+        """
+        Compacts a text locally.
+
+        Args:
+            text (str): The event summary or timeline point description.
+            kind (str): 'event_summary' or 'description'.
+            max_words (int, optional): Word limit for the result. Defaults to the kind's limit.
+
+        Returns:
+            tuple: (compacted_text, confidence). compacted_text is None when the
+            confidence is below the threshold, or when the text could not be
+            shortened locally (it is already within the limits or nothing matched).
+        """
+        if kind == "event_summary":
+            max_sentences, default_max_words = EVENT_SUMMARY_MAX_SENTENCES, EVENT_SUMMARY_MAX_WORDS
+        else:
+            max_sentences, default_max_words = DESCRIPTION_MAX_SENTENCES, DESCRIPTION_MAX_WORDS
+        max_words = max_words or default_max_words
+
+        normalized = " ".join((text or "").split())
+        if not normalized:
+            return None, 0.0
+
+        stripped = self._strip_templates(normalized)
+        sentences = self._split_sentences(stripped)
+
+        # Within the target once boilerplate is gone; only counts if something was actually removed
+        if len(sentences) <= max_sentences and self._word_count(stripped) <= max_words:
+            return (None, 0.0) if stripped == normalized else self._accept(stripped, 1.0)
+
+        selected = self._select_sentences(sentences, max_sentences)
+        if self._word_count(" ".join(selected)) > max_words:
+            selected = [self._trim_clauses(sentence) for sentence in selected]
+
+        compacted = " ".join(selected).strip()
+        if not compacted or compacted == normalized or self._word_count(compacted) > max_words:
+            return None, 0.0
+
+        return self._accept(compacted, self._fact_retention(stripped, compacted))
+
+    def _accept(self, compacted: str, confidence: float):
+        if confidence < self.confidence_threshold:
+            return None, confidence
+        return compacted, confidence
+
+    def _strip_templates(self, text: str) -> str:
+        for pattern in TEMPLATE_PATTERNS:
+            text = pattern.sub("", text, count=1)
+        text = text.strip()
+        return text[:1].upper() + text[1:] if text else text
+
+    def _split_sentences(self, text: str) -> list:
+        return [sentence.strip() for sentence in SENTENCE_SPLIT_RE.split(text) if sentence.strip()]
+
+    def _word_count(self, text: str) -> int:
+        return len(text.split())
+
+    def _content_words(self, text: str) -> list:
+        return [word.lower() for word in WORD_RE.findall(text) if word.lower() not in STOPWORDS]
+
+    def _select_sentences(self, sentences: list, max_sentences: int) -> list:
+        """Scores sentences by position and content-word frequency and keeps the best ones in order."""
+        if len(sentences) <= max_sentences:
+            return sentences
+
+        frequencies = Counter(word for sentence in sentences for word in self._content_words(sentence))
+        scored = []
+        for index, sentence in enumerate(sentences):
+            words = self._content_words(sentence)
+            if not words:
+                continue
+            score = sum(frequencies[word] for word in words) / len(words)
+            score += len(self._fact_tokens(sentence)) * 0.5
+            if index == 0:
+                score *= 1.5  # News copy leads with the fact
+            scored.append((score, index, sentence))
+
+        best = sorted(scored, key=lambda entry: entry[0], reverse=True)[:max_sentences]
+        return [sentence for _, _, sentence in sorted(best, key=lambda entry: entry[1])]
+
+    def _trim_clauses(self, sentence: str) -> str:
+        for pattern in TRAILING_CLAUSE_PATTERNS:
+            sentence = pattern.sub("", sentence)
+        sentence = sentence.strip()
+        if sentence and sentence[-1] not in ".!?":
+            sentence += "."
+        return sentence
+
+    def _fact_tokens(self, text: str) -> set:
+        return {token for token in FACT_TOKEN_RE.findall(text) if token.lower() not in STOPWORDS}
+
+    def _fact_retention(self, source: str, compacted: str) -> float:
+        """
+        Fraction of distinct numbers and proper nouns in the source that survive
+        in the compacted text. Texts without such tokens fall back to the share
+        of content words kept.
+        """
+        source_facts = self._fact_tokens(source)
+        if source_facts:
+            kept_facts = self._fact_tokens(compacted)
+            return len(source_facts & kept_facts) / len(source_facts)
+
+        source_words = set(self._content_words(source))
+        if not source_words:
+            return 0.0
+        return len(source_words & set(self._content_words(compacted))) / len(source_words)
@@ -0,0 +1,99 @@
+# llm_governor.py
+
+import asyncio
+import time
+
+# --- CONFIGURATION ---
+DEFAULT_MAX_CONCURRENT_REQUESTS = 16  # In-flight DeepSeek requests across the whole process
+
+
+class LLMGovernor:
+    """
+    Process-wide limit on in-flight LLM requests. Every NewsManager client
+    routes its chat completions through the installed governor, so running many
+    figure pipelines at once never multiplies the load on the API. Also counts
+    requests and tokens for the end-of-run summary.
+    """
+    _installed = None
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT_REQUESTS):
+        """
+        Args:
+            max_concurrent (int): Maximum number of concurrent requests.
+        """
+        self.max_concurrent = max_concurrent
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.requests = 0
+        self.failed_requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.wait_seconds = 0.0  # Time spent queued behind the limit
+
+    @classmethod
+    def install(cls, max_concurrent: int = DEFAULT_MAX_CONCURRENT_REQUESTS):
+        """Installs a governor for every client in this process and returns it."""
+        cls._installed = cls(max_concurrent)
+        print(f"✓ LLM governor installed (max {max_concurrent} concurrent requests)")
+        return cls._installed
+
+    @classmethod
+    def current(cls):
+        """The installed governor, or None when requests are not governed."""
+        return cls._installed
+
+    async def create(self, completions, **kwargs):
+        queued_at = time.monotonic()
+        async with self.semaphore:
+            self.wait_seconds += time.monotonic() - queued_at
+            self.requests += 1
+            try:
+                response = await completions.create(**kwargs)
+            except Exception:
+                self.failed_requests += 1
+                raise
+        usage = getattr(response, "usage", None)
+        if usage:
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+        return response
+
+    def summary(self) -> str:
+        return (f"{self.requests} LLM requests ({self.failed_requests} failed), "
+                f"{self.prompt_tokens} prompt + {self.completion_tokens} completion tokens, "
+                f"{self.wait_seconds:.1f}s queued behind the limit of {self.max_concurrent}")
+
+
+class _GovernedCompletions:
+    def __init__(self, completions):
+        self._completions = completions
+
+    async def create(self, **kwargs):
+        governor = LLMGovernor.current()
+        if governor is None:
+            return await self._completions.create(**kwargs)
+        return await governor.create(self._completions, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+class _GovernedChat:
+    def __init__(self, chat):
+        self._chat = chat
+        self.completions = _GovernedCompletions(chat.completions)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class GovernedClient:
+    """
+    Wraps an AsyncOpenAI client so `client.chat.completions.create(...)` goes
+    through the installed LLMGovernor. Everything else is passed through.
+    """
+    def __init__(self, client):
+        self._client = client
+        self.chat = _GovernedChat(client.chat)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
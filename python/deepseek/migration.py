@@ -3,6 +3,7 @@ import json
 import argparse
 from collections import defaultdict
 from setup_firebase_deepseek import NewsManager
+from processing_ledger import LEDGER_STAGE_FIELD, LEGACY_PROCESSED_FIELD, ledger_update
 from typing import Union, Optional, Dict, Any, List
 
 # --- CONFIGURATION ---
@@ -217,7 +218,8 @@ class CurationEngine:
         from google.cloud.firestore_v1.base_query import FieldFilter
         
         articles_ref = self.db.collection('selected-figures').document(self.figure_id).collection('article-summaries')
-        query = articles_ref.where(filter=FieldFilter('is_processed_for_timeline', '!=', True))
+        # Every summary that hasn't reached the timeline yet
+        query = articles_ref.where(filter=FieldFilter(LEDGER_STAGE_FIELD, 'in', ["summarized", "categorized", "wiki_applied"]))
         
         docs = query.stream()
         articles = []
@@ -359,7 +361,7 @@ class CurationEngine:
             batch = self.db.batch()
             for source_id in processed_source_ids:
                 article_ref = articles_ref.document(source_id)
-                batch.update(article_ref, {"is_processed_for_timeline": True})
+                batch.update(article_ref, {LEGACY_PROCESSED_FIELD: True, **ledger_update("timeline_applied")})
             batch.commit()
             print(f"--- Phase 5 Complete. Marked {len(processed_source_ids)} articles as processed. ---")
         
@@ -0,0 +1,102 @@
+# optimistic_writes.py
+
+# Read-modify-write of a Firestore document without a lock. The write is
+# guarded by the document's update time as read (or by "must not exist" for
+# a new document); if another writer got there first, the commit fails, the
+# document is read again and the change is rebuilt on top of the new
+# contents. Used for the documents several writers can touch at once:
+# 'curated-timeline' and 'wiki-content'.
+
+import inspect
+
+# --- CONFIGURATION ---
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+class WriteConflictError(Exception):
+    """Raised when a document kept changing underneath us for every attempt."""
+
+
+class ContentionStats:
+    """Process-wide counts of guarded writes and the conflicts they ran into, per document kind."""
+    def __init__(self):
+        self.writes = {}  # label -> committed writes
+        self.conflicts = {}  # label -> commits rejected because the document changed
+        self.exhausted = {}  # label -> writes given up after DEFAULT_MAX_ATTEMPTS
+
+    def record(self, counter: dict, label: str):
+        counter[label] = counter.get(label, 0) + 1
+
+    def summary(self) -> str:
+        if not (self.writes or self.conflicts or self.exhausted):
+            return ""
+        parts = []
+        for label in sorted(set(self.writes) | set(self.conflicts) | set(self.exhausted)):
+            writes, conflicts = self.writes.get(label, 0), self.conflicts.get(label, 0)
+            rate = conflicts / (writes + conflicts) if writes + conflicts else 0.0
+            part = f"{label}: {writes} writes, {conflicts} conflicts ({rate:.0%})"
+            if self.exhausted.get(label):
+                part += f", {self.exhausted[label]} gave up"
+            parts.append(part)
+        return "; ".join(parts)
+
+
+contention_stats = ContentionStats()
+
+
+async def optimistic_write(db, doc_ref, build, label: str, snapshot=None, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+    """
+    Writes `doc_ref` only if it hasn't changed since it was read, rebuilding
+    the change from a fresh read on conflict.
+
+    Args:
+        db (firestore.Client): The client, for the batch and the precondition.
+        doc_ref (DocumentReference): The guarded document.
+        build (callable): `build(snapshot, batch)`, sync or async. Returns the fields to write
+            (an update of an existing document, or the full data of a new one), or None
+            to write nothing. May stage related writes in `batch`, which commit atomically
+            with the guarded write and are discarded on conflict.
+        label (str): Document kind for the contention metric (e.g. "curated-timeline").
+        snapshot (DocumentSnapshot, optional): An existing read to use for the first attempt.
+        max_attempts (int): Attempts before giving up with WriteConflictError.
+
+    Returns:
+        dict: The fields written, or None if `build` chose not to write.
+    """
+    from google.api_core.exceptions import Conflict, FailedPrecondition
+
+    for attempt in range(1, max_attempts + 1):
+        if snapshot is None:
+            snapshot = doc_ref.get()
+        batch = db.batch()
+        fields = build(snapshot, batch)
+        if inspect.isawaitable(fields):
+            fields = await fields
+        if fields is None:
+            return None
+
+        _stage_guarded_write(db, batch, doc_ref, snapshot, fields)
+        try:
+            batch.commit()
+        except (FailedPrecondition, Conflict):
+            # Someone else wrote the document since our read; rebuild on top of their version
+            contention_stats.record(contention_stats.conflicts, label)
+            print(f"    -> Write conflict on {label} '{doc_ref.id}' (attempt {attempt}/{max_attempts}); re-merging")
+            snapshot = None
+            continue
+        contention_stats.record(contention_stats.writes, label)
+        return fields
+
+    contention_stats.record(contention_stats.exhausted, label)
+    raise WriteConflictError(f"{label} '{doc_ref.id}' changed on each of {max_attempts} attempts")
+
+
+def _stage_guarded_write(db, batch, doc_ref, snapshot, fields: dict):
+    from firebase_admin import firestore
+
+    if not snapshot.exists:
+        batch.create(doc_ref, fields)  # Fails if another writer created it first
+        return
+    # Top-level keys are escaped so names with dots or spaces aren't read as field paths
+    escaped = {firestore.FieldPath(key).to_api_repr(): value for key, value in fields.items()}
+    batch.update(doc_ref, escaped, option=db.write_option(last_update_time=snapshot.update_time))
@@ -0,0 +1,132 @@
+# pipeline_dag.py
+
+import asyncio
+import inspect
+import time
+
+
+class PipelineStep:
+    """
+    One node of a pipeline: an async (or plain) callable plus the steps it
+    must wait for.
+    """
+    def __init__(self, name: str, run, depends_on=(), skip_if=None):
+        """
+        Args:
+            name (str): Unique step name.
+            run (callable): Called with no arguments. May be a coroutine function.
+            depends_on (iterable): Names of the steps that must finish first.
+            skip_if (callable, optional): Called with the results so far when the
+                step becomes ready. Returns (or, if async, resolves to) a reason
+                string to skip the step, or None to run it. An exception fails the step.
+        """
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.skip_if = skip_if
+
+
+class DagScheduler:
+    """
+    Runs PipelineSteps as soon as their dependencies have finished, so
+    independent steps overlap and total latency follows the critical path.
+    A failed step blocks everything downstream of it but not its siblings.
+    """
+    def __init__(self, steps, label: str = "pipeline"):
+        """
+        Args:
+            steps (list): The PipelineSteps to run.
+            label (str): Name used in the timing report.
+        """
+        self.steps = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError(f"Duplicate pipeline step '{step.name}'")
+            self.steps[step.name] = step
+        self.label = label
+        self._validate()
+
+    def _validate(self):
+        for step in self.steps.values():
+            for dependency in step.depends_on:
+                if dependency not in self.steps:
+                    raise ValueError(f"Step '{step.name}' depends on unknown step '{dependency}'")
+
+        # Depth-first search for cycles
+        visiting, visited = set(), set()
+
+        def visit(name, path):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dependency in self.steps[name].depends_on:
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.steps:
+            visit(name, [])
+
+    async def run(self) -> dict:
+        """
+        Runs every step.
+
+        Returns:
+            dict: {step_name: {"status": "ok"|"skipped"|"failed"|"blocked",
+                               "seconds": float, "result": ..., "reason": str, "error": str}}
+        """
+        results = {}
+        finished = {name: asyncio.Event() for name in self.steps}
+        started = time.monotonic()
+
+        async def run_step(step):
+            try:
+                for dependency in step.depends_on:
+                    await finished[dependency].wait()
+
+                blocked_by = [d for d in step.depends_on if results[d]["status"] in ("failed", "blocked")]
+                if blocked_by:
+                    results[step.name] = {"status": "blocked", "seconds": 0.0,
+                                          "reason": f"upstream failure in {', '.join(blocked_by)}"}
+                    return
+
+                step_started = time.monotonic()
+                try:
+                    reason = step.skip_if(results) if step.skip_if else None
+                    if inspect.isawaitable(reason):
+                        reason = await reason
+                    if reason:
+                        print(f"  -> Skipping '{step.name}': {reason}")
+                        results[step.name] = {"status": "skipped", "seconds": 0.0, "reason": reason}
+                        return
+
+                    result = step.run()
+                    if inspect.isawaitable(result):
+                        result = await result
+                    results[step.name] = {"status": "ok", "seconds": time.monotonic() - step_started, "result": result}
+                except Exception as e:
+                    print(f"  ❌ Step '{step.name}' failed: {e}")
+                    results[step.name] = {"status": "failed", "seconds": time.monotonic() - step_started,
+                                          "error": f"{type(e).__name__}: {e}"}
+            finally:
+                finished[step.name].set()
+
+        tasks = [asyncio.create_task(run_step(step)) for step in self.steps.values()]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # If the run is cancelled, don't leave steps running behind the caller's back
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.print_timings(results, time.monotonic() - started)
+        return results
+
+    def print_timings(self, results: dict, elapsed: float):
+        print(f"\n  ⏱  {self.label} step timings (wall clock {elapsed:.1f}s):")
+        for name in self.steps:
+            result = results[name]
+            detail = result.get("reason") or result.get("error") or ""
+            print(f"     {name:<20} {result['status']:<8} {result['seconds']:7.2f}s  {detail}")
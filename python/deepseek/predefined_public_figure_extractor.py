@@ -1,4 +1,7 @@
 from public_figure_extractor import PublicFigureExtractor, NewsManager
+from figure_identity import FigureIdentityResolver
+from figure_enrichment import research_core_profile
+from processing_ledger import ledger_initial, LEGACY_PROCESSED_FIELD
 import asyncio
 import json
 import re
@@ -11,7 +14,7 @@ import os
 
 
 class PredefinedPublicFigureExtractor(PublicFigureExtractor):
-    def __init__(self, predefined_names=None, csv_filepath="k_celebrities_master.csv"):
+    def __init__(self, predefined_names=None, csv_filepath="k_celebrities_master.csv", news_manager=None):
         """
         Initialize the predefined public figure extractor.
         
@@ -20,10 +23,13 @@ class PredefinedPublicFigureExtractor(PublicFigureExtractor):
                                             If None, loads names from CSV file.
             csv_filepath (str, optional): Path to the CSV file containing predefined figures.
                                         Only used if predefined_names is None.
+            news_manager (NewsManager, optional): A shared manager to reuse.
         """
-        super().__init__()
+        super().__init__(news_manager=news_manager)
         self.predefined_names = predefined_names or []
         self.celebrity_data = {}  # Dictionary mapping names to their attributes
+        self.co_mention_deltas = []  # Per-article 'public_figures' changes from the last process_new_articles run
+        self._identity_resolver = None  # Built lazily, see _get_identity_resolver
 
         # Define group hierarchies - parent group -> list of sub-groups
         self.group_hierarchies = {
@@ -161,7 +167,35 @@ class PredefinedPublicFigureExtractor(PublicFigureExtractor):
             dict: Dictionary with public figure information
         """
         print(f"Researching details for predefined public figure: {name}")
+        initial_data = self._csv_prefill(name)
+
+        # Call the original research method from the parent class
+        # We use super() to access the parent class method
+        research_results = await super().research_public_figure(name)
+        
+        # Combine our pre-filled data with research results
+        # Pre-filled data takes precedence in case of conflicts
+        combined_data = {**research_results, **initial_data}
         
+        return combined_data
+
+    async def research_core_profile(self, name):
+        """
+        Fast tier-1 research for a newly seen figure (gender, is_group,
+        occupation, nationality, name_kr), pre-filled from our CSV data. The
+        profile is marked for FigureEnricher to fill in the remaining fields.
+
+        Args:
+            name (str): Name of the public figure to research
+
+        Returns:
+            dict: Dictionary with the core public figure information
+        """
+        print(f"Researching core profile for predefined public figure: {name}")
+        return await research_core_profile(self.news_manager, name, prefill=self._csv_prefill(name))
+
+    def _csv_prefill(self, name):
+        """Converts our CSV data for a figure into database fields. Returns {} for unknown figures."""
         # Initialize with data we might already have from the CSV
         initial_data = {}
         
@@ -191,16 +225,8 @@ class PredefinedPublicFigureExtractor(PublicFigureExtractor):
                 initial_data['nationality'] = nationality
             
             print(f"Pre-filled data for {name}: {json.dumps(initial_data, indent=2)}")
-        
-        # Call the original research method from the parent class
-        # We use super() to access the parent class method
-        research_results = await super().research_public_figure(name)
-        
-        # Combine our pre-filled data with research results
-        # Pre-filled data takes precedence in case of conflicts
-        combined_data = {**research_results, **initial_data}
-        
-        return combined_data
+
+        return initial_data
             
             
     def _normalize_date_format(self, date_str):
@@ -581,18 +607,34 @@ class PredefinedPublicFigureExtractor(PublicFigureExtractor):
             print(f"An error occurred in extract_for_predefined_figures: {e}")
             raise
         finally:
-            await self.news_manager.close()
+            if self._owns_manager:
+                await self.news_manager.close()
     
            
+    def _get_identity_resolver(self) -> FigureIdentityResolver:
+        """Loads (or builds and caches) the alias index used to map names to document IDs."""
+        if self._identity_resolver is None:
+            self._identity_resolver = FigureIdentityResolver.load_or_build(self.news_manager.db)
+        return self._identity_resolver
+
+    def figure_ids_for_names(self, names):
+        """Maps figure names to their canonical document IDs, without duplicates and in order."""
+        resolver = self._get_identity_resolver()
+        return list(dict.fromkeys(resolver.doc_id_for(name) for name in names))
+
     async def process_single_figure_mention(self, public_figure_name, article_id, article_data):
         """
         NEW REUSABLE METHOD: Processes a single mention of a public figure in an article.
         This contains the core logic for creating/updating figure profiles and summaries.
+
+        Returns:
+            str: The figure's document ID if a new summary was saved, otherwise None.
         """
         print(f"\n-- Processing mention of '{public_figure_name}' in article '{article_id}' --")
+        detected_at = datetime.now(pytz.utc)
 
-        # Create a document ID from the figure's name
-        doc_id = public_figure_name.lower().replace(" ", "").replace("-", "").replace(".", "")
+        # Resolve the name (or any known alias) to its canonical document ID
+        doc_id = self._get_identity_resolver().doc_id_for(public_figure_name)
         public_figure_doc_ref = self.news_manager.db.collection("selected-figures").document(doc_id)
         
         # Check if the public figure's main document already exists
@@ -604,9 +646,9 @@ class PredefinedPublicFigureExtractor(PublicFigureExtractor):
                 "lastUpdated": datetime.now(pytz.timezone('Asia/Seoul')).strftime("%Y-%m-%d")
             })
         else:
-            print(f"'{public_figure_name}' is a new figure. Researching and creating profile.")
-            # Research comprehensive information for the new figure
-            public_figure_info = await self.research_public_figure(public_figure_name)
+            print(f"'{public_figure_name}' is a new figure. Researching core profile and creating it.")
+            # Only the core fields are researched inline; the rest is filled in by FigureEnricher
+            public_figure_info = await self.research_core_profile(public_figure_name)
             
             # Create a clean data object for the new figure
             public_figure_data = {
@@ -617,6 +659,10 @@ class PredefinedPublicFigureExtractor(PublicFigureExtractor):
             }
             public_figure_doc_ref.set(public_figure_data)
             print(f"Created new profile for '{public_figure_name}'.")
+            # Later mentions (and other jobs reading the cache) resolve to the new document right away
+            resolver = self._get_identity_resolver()
+            resolver.add_figure(doc_id, public_figure_data)
+            resolver.save()
 
         # --- Generate and Save the Article Summary ---
         summary_doc_ref = public_figure_doc_ref.collection("article-summaries").document(article_id)
@@ -660,7 +706,8 @@ class PredefinedPublicFigureExtractor(PublicFigureExtractor):
             "body": body,
             "source": "Yonhap News Agency",
             "imageUrl": first_image_url,
-            "is_processed_for_timeline": False
+            LEGACY_PROCESSED_FIELD: False,
+            **ledger_initial("detected", "summarized", timestamps={"detected": detected_at})
         }
         
         event_dates_for_primary = summary_data.get('event_dates')
@@ -684,13 +731,85 @@ class PredefinedPublicFigureExtractor(PublicFigureExtractor):
         
         summary_doc_ref.set(summary_data)
         print(f"Saved new summary for '{public_figure_name}' in article '{article_id}'.")
+        return doc_id
+        
+        
+    async def process_article(self, article_id, article_data, work_queue=None):
+        """
+        Ingests one new article: finds the predefined figures it mentions, saves a
+        summary for each figure, then marks it processed and records its co-mention delta.
+
+        Args:
+            article_id (str): The 'newsArticles' document ID.
+            article_data (dict): The article document's data.
+            work_queue (WorkQueue, optional): Receives each figure's document ID as soon
+                as a new summary is saved for it (anything with a `push(figure_id)` method).
+
+        Returns:
+            list: The names of the figures mentioned in the article.
+        """
+        body = article_data.get("body", "")
+
+        if not body:
+            self.news_manager.db.collection("newsArticles").document(article_id).update({
+                "public_figures": [],
+                "public_figures_processed": True
+            })
+            if len(article_data.get("public_figures") or []) > 1:
+                self.co_mention_deltas.append({
+                    "article_id": article_id,
+                    "previous": article_data["public_figures"],
+                    "current": []
+                })
+            return []
+
+        mentioned_figures = await self._find_mentioned_figures(body)
         
+        # NEW: Apply hierarchy expansion here too
+        mentioned_figures = self._expand_mentioned_figures_with_hierarchy(mentioned_figures)
+
+        if mentioned_figures:
+            print(f"Found {len(mentioned_figures)} figures: {', '.join(mentioned_figures)}")
         
-    async def process_new_articles(self, limit=None):
+        # Summaries are saved before the article is marked processed, so an article that fails
+        # partway stays unprocessed and is retried; summaries that already exist are skipped
+        for public_figure_name in mentioned_figures:
+            figure_id = await self.process_single_figure_mention(public_figure_name, article_id, article_data)
+            if figure_id and work_queue is not None:
+                work_queue.push(figure_id)
+
+        self.news_manager.db.collection("newsArticles").document(article_id).update({
+            "public_figures": mentioned_figures,
+            "public_figures_processed": True
+        })
+
+        previous_figures = article_data.get("public_figures") or []
+        if len(mentioned_figures) > 1 or len(previous_figures) > 1:
+            self.co_mention_deltas.append({
+                "article_id": article_id,
+                "previous": previous_figures,
+                "current": mentioned_figures
+            })
+
+        if not mentioned_figures:
+            print(f"No predefined figures found in article {article_id}. Marked as processed.")
+        return mentioned_figures
+
+    async def process_new_articles(self, limit=None, work_queue=None):
         """
         MODIFIED VERSION: Now includes hierarchy expansion for new articles too.
+
+        Also records one co-mention delta per processed article in
+        `self.co_mention_deltas` (the article's previous and new 'public_figures'),
+        so related figures can be updated incrementally instead of rescanning the corpus.
+
+        Args:
+            limit (int, optional): Maximum number of articles to process.
+            work_queue (WorkQueue, optional): Each figure is pushed as soon as a new
+                summary is saved for it, so processing can start before ingestion ends.
         """
         updated_figures_in_run = set() 
+        self.co_mention_deltas = []
         try:
             print("Searching for new articles to process...")
             
@@ -711,44 +830,15 @@ class PredefinedPublicFigureExtractor(PublicFigureExtractor):
             print(f"Found {len(articles)} new articles to process.")
             
             for i, article in enumerate(articles):
-                article_id = article["id"]
-                article_data = article.get("data", {})
-                body = article_data.get("body", "")
-
-                print(f"\nProcessing new article {i+1}/{len(articles)} (ID: {article_id})")
-
-                if not body:
-                    self.news_manager.db.collection("newsArticles").document(article_id).update({
-                        "public_figures": [],
-                        "public_figures_processed": True
-                    })
-                    continue
-
-                mentioned_figures = await self._find_mentioned_figures(body)
-                
-                # NEW: Apply hierarchy expansion here too
-                mentioned_figures = self._expand_mentioned_figures_with_hierarchy(mentioned_figures)
-                
-                self.news_manager.db.collection("newsArticles").document(article_id).update({
-                    "public_figures": mentioned_figures,
-                    "public_figures_processed": True
-                })
-
-                if not mentioned_figures:
-                    print(f"No predefined figures found in article {article_id}. Marked as processed.")
-                    continue
-
-                print(f"Found {len(mentioned_figures)} figures: {', '.join(mentioned_figures)}")
-                
+                print(f"\nProcessing new article {i+1}/{len(articles)} (ID: {article['id']})")
+                mentioned_figures = await self.process_article(article["id"], article.get("data", {}), work_queue=work_queue)
                 updated_figures_in_run.update(mentioned_figures)
-                
-                for public_figure_name in mentioned_figures:
-                    await self.process_single_figure_mention(public_figure_name, article_id, article_data)
         
         except Exception as e:
             print(f"An error occurred during new article processing: {e}")
         finally:
-            await self.news_manager.close()
+            if self._owns_manager:
+                await self.news_manager.close()
         
         return list(updated_figures_in_run)
                     
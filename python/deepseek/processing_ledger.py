@@ -0,0 +1,103 @@
+# processing_ledger.py
+
+# Per-summary processing ledger for 'selected-figures/{id}/article-summaries'.
+#
+# Every summary carries the last stage it completed in 'ledger_stage' and the
+# time each stage completed in the 'ledger' map. A step's backlog is exactly
+# the summaries whose 'ledger_stage' is the stage before its own, which is an
+# equality filter served by Firestore's automatic single-field index.
+# Because each step advances a summary in the same write that stores its
+# result, repeat runs find nothing to do and a crashed run resumes at the
+# first summary that wasn't advanced.
+
+# --- CONFIGURATION ---
+LEDGER_STAGE_FIELD = "ledger_stage"
+LEDGER_TIMESTAMPS_FIELD = "ledger"  # {stage: completion time}
+LEGACY_PROCESSED_FIELD = "is_processed_for_timeline"  # Still written for older tools; no longer read by the pipeline
+
+STAGES = [
+    "detected",          # The figure was found in the article
+    "summarized",        # The figure-focused summary was written
+    "categorized",       # mainCategory/subcategory set by the categorizer
+    "wiki_applied",      # Folded into the figure's wiki-content documents
+    "timeline_applied",  # Merged into the curated timeline
+    "compacted",         # Timeline events stored in compact form
+]
+# Stages that still have work downstream
+PENDING_STAGES = STAGES[:-1]
+
+
+def previous_stage(stage: str) -> str:
+    """The stage a summary must be at to be in `stage`'s backlog."""
+    index = STAGES.index(stage)
+    if index == 0:
+        raise ValueError(f"'{stage}' is the first stage and has no backlog")
+    return STAGES[index - 1]
+
+
+def ledger_update(*stages: str) -> dict:
+    """
+    Fields for a `.update()` (or batch update) that records the given stages as
+    completed now and moves 'ledger_stage' to the last of them.
+    """
+    from firebase_admin import firestore
+
+    fields = {LEDGER_STAGE_FIELD: stages[-1]}
+    for stage in stages:
+        STAGES.index(stage)  # Validates the stage name
+        fields[f"{LEDGER_TIMESTAMPS_FIELD}.{stage}"] = firestore.SERVER_TIMESTAMP
+    return fields
+
+
+def ledger_initial(*stages: str, timestamps: dict = None) -> dict:
+    """
+    Fields for a `.set()` of a new summary document that has completed `stages`.
+
+    Args:
+        stages (str): Completed stages, in order.
+        timestamps (dict, optional): Known completion times; other stages use the server time.
+    """
+    from firebase_admin import firestore
+
+    timestamps = timestamps or {}
+    return {
+        LEDGER_STAGE_FIELD: stages[-1],
+        LEDGER_TIMESTAMPS_FIELD: {stage: timestamps.get(stage, firestore.SERVER_TIMESTAMP) for stage in stages},
+    }
+
+
+def backlog_query(summaries_ref, stage: str):
+    """Query for the summaries waiting on `stage` in an 'article-summaries' collection."""
+    from firebase_admin import firestore
+
+    return summaries_ref.where(filter=firestore.FieldFilter(LEDGER_STAGE_FIELD, "==", previous_stage(stage)))
+
+
+def has_backlog(summaries_ref, stage: str) -> bool:
+    """Single-document read that tells whether `stage` has any work for this collection."""
+    return any(True for _ in backlog_query(summaries_ref, stage).select([]).limit(1).stream())
+
+
+def pending_count(summaries_ref) -> int:
+    """Number of summaries with work left in any stage, as a server-side count (one read per 1000)."""
+    from firebase_admin import firestore
+
+    query = summaries_ref.where(filter=firestore.FieldFilter(LEDGER_STAGE_FIELD, "in", PENDING_STAGES))
+    return int(query.count().get()[0][0].value)
+
+
+def infer_stage(summary_data: dict) -> str:
+    """
+    Best guess of the stage a pre-ledger summary reached, from the legacy flags.
+    Used by backfill_processing_ledger.py.
+    """
+    if summary_data.get(LEGACY_PROCESSED_FIELD):
+        # Curation only ever wrote compacted events once compaction moved into generation;
+        # older events are handled by the event-level compaction backfill
+        return "compacted"
+    if summary_data.get("mainCategory"):
+        # The wiki step never recorded its progress, so it is replayed from here
+        return "categorized"
+    if summary_data.get("summary"):
+        return "summarized"
+    return "detected"
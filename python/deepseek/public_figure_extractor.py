@@ -1,4 +1,5 @@
 from setup_firebase_deepseek import NewsManager
+from figure_identity import normalize_name_for_doc_id
 import asyncio
 import json
 import re
@@ -9,8 +10,14 @@ import pytz
 
 
 class PublicFigureExtractor:
-    def __init__(self):
-        self.news_manager = NewsManager()
+    def __init__(self, news_manager=None):
+        """
+        Args:
+            news_manager (NewsManager, optional): A shared manager to reuse. If omitted,
+                a new one is created and closed when a run finishes.
+        """
+        self._owns_manager = news_manager is None
+        self.news_manager = news_manager or NewsManager()
 
     async def extract_and_save_public_figures(self, limit=None, reverse_order=True):
         """
@@ -134,7 +141,7 @@ class PublicFigureExtractor:
                     print(f"\nProcessing public figure: {name}")
                         
                     # Create document ID (lowercase, no spaces)
-                    doc_id = name.lower().replace(" ", "").replace("-", "").replace(".", "")
+                    doc_id = normalize_name_for_doc_id(name)
                     
                     # Check if the public figure document already exists
                     public_figure_doc_ref = self.news_manager.db.collection("public-figure-info").document(doc_id)
@@ -402,7 +409,7 @@ class PublicFigureExtractor:
                 if public_figure_names:
                     for public_figure_name in public_figure_names:
                         # Create document ID for the public figure (lowercase, no spaces)
-                        public_figure_doc_id = public_figure_name.lower().replace(" ", "").replace("-", "").replace(".", "")
+                        public_figure_doc_id = normalize_name_for_doc_id(public_figure_name)
                         
                         # Check if this public figure-article summary already exists
                         summary_doc_ref = self.news_manager.db.collection("public-figure-info").document(public_figure_doc_id).collection("article-summaries").document(article_id)
@@ -466,7 +473,8 @@ class PublicFigureExtractor:
             raise
         finally:
             # Close the connection
-            await self.news_manager.close()
+            if self._owns_manager:
+                await self.news_manager.close()
 
     async def extract_public_figures_from_text(self, text):
         """Extract public figures with additional information from text with comprehensive filtering"""
@@ -1296,7 +1304,8 @@ class PublicFigureExtractor:
             raise
         finally:
             # Close the connection
-            await self.news_manager.close()
+            if self._owns_manager:
+                await self.news_manager.close()
 
     async def update_specific_article_summaries(self, document_ids=None, public_figure_id=None):
         """
@@ -1455,7 +1464,8 @@ class PublicFigureExtractor:
             raise
         finally:
             # Close the connection
-            await self.news_manager.close()
+            if self._owns_manager:
+                await self.news_manager.close()
 
 
 # Main function to run the extractor
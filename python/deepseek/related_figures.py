@@ -6,17 +6,30 @@ from firebase_admin.firestore import FieldFilter
 from collections import defaultdict
 import operator
 import argparse
+import json
+from datetime import datetime, timedelta, timezone
 from setup_firebase_deepseek import NewsManager
+from batch_writer import BatchWriter
+from figure_identity import FigureIdentityResolver
 import asyncio
 
+# --- CONFIGURATION ---
+MAX_ARRAY_CONTAINS_ANY = 10  # Firestore limit on values in an 'array_contains_any' filter
+PIPELINE_STATE_COLLECTION = "pipeline-state"
+RELATED_FIGURES_STATE_DOC = "related-figures"
+RECONCILE_INTERVAL_DAYS = 7  # Full rebuild cadence that corrects drift from incremental updates
+
 class RelatedFiguresUpdater:
-    def __init__(self):
+    def __init__(self, news_manager: NewsManager = None):
         """
         Initializes the updater, connects to Firebase, and creates the
         essential name-to-ID lookup maps.
+
+        Args:
+            news_manager (NewsManager, optional): A shared manager whose Firestore client is reused.
         """
         print("Initializing RelatedFiguresUpdater...")
-        self.db = NewsManager().db
+        self.db = (news_manager or NewsManager()).db
         
         # Create the lookup maps upon initialization
         self.name_to_id_map, self.id_to_name_map = self._create_figure_lookup_maps()
@@ -24,19 +37,14 @@ class RelatedFiguresUpdater:
 
     def _create_figure_lookup_maps(self):
         """
-        Creates translation maps between figure names and their document IDs.
+        Creates translation maps between figure names and their document IDs,
+        along with the alias index used to resolve article names (any case,
+        Hangul names, member stage and real names) in O(1).
         """
         print("  -> Creating figure name-to-ID lookup maps...")
-        name_to_id = {}
-        id_to_name = {}
-        
-        figures_ref = self.db.collection('selected-figures')
-        for figure in figures_ref.stream():
-            figure_id = figure.id
-            figure_name = figure.to_dict().get('name')
-            if figure_name:
-                name_to_id[figure_name] = figure_id
-                id_to_name[figure_id] = figure_name
+        self.identity = FigureIdentityResolver.from_firestore(self.db)
+        id_to_name = dict(self.identity.id_to_name)
+        name_to_id = {figure_name: figure_id for figure_id, figure_name in id_to_name.items()}
 
         if not name_to_id:
             raise Exception("Could not create lookup maps. 'selected-figures' might be empty.")
@@ -75,13 +83,161 @@ class RelatedFiguresUpdater:
         if article_figure_name in self.name_to_id_map:
             return self.name_to_id_map[article_figure_name], article_figure_name
         
-        # Try case-insensitive matching
-        for selected_name, figure_id in self.name_to_id_map.items():
-            if selected_name.lower() == article_figure_name.lower():
-                return figure_id, selected_name
+        # Try the alias index (case-insensitive names and known aliases)
+        figure_id = self.identity.resolve(article_figure_name)
+        if figure_id:
+            return figure_id, self.id_to_name_map[figure_id]
         
         return None, None
 
+    def _resolve_article_figures(self, names_in_article) -> set:
+        """Resolves the raw 'public_figures' names of an article to a set of selected figure IDs."""
+        return self.identity.resolve_many(names_in_article)
+
+    def build_co_mention_matrix(self):
+        """
+        Streams 'newsArticles' once (projected to 'public_figures') and counts, for
+        every pair of selected figures, the number of articles mentioning both.
+
+        Returns:
+            dict: Sparse matrix as {figure_id: {related_id: count}}.
+        """
+        print("  -> Building co-mention matrix with a single scan of 'newsArticles'...")
+        matrix = defaultdict(lambda: defaultdict(int))
+        articles_scanned = 0
+        articles_with_pairs = 0
+
+        for article in self.db.collection('newsArticles').select(['public_figures']).stream():
+            articles_scanned += 1
+            figure_ids = self._resolve_article_figures(article.to_dict().get('public_figures', []))
+            if len(figure_ids) < 2:
+                continue
+            articles_with_pairs += 1
+            for figure_id in figure_ids:
+                for other_id in figure_ids:
+                    if other_id != figure_id:
+                        matrix[figure_id][other_id] += 1
+
+        print(f"  ✓ Scanned {articles_scanned} articles ({articles_with_pairs} with co-mentions); "
+              f"{len(matrix)} figures have related figures.")
+        return matrix
+
+    def rebuild_all(self):
+        """
+        Recomputes the 'related_figures' map of every selected figure from one
+        corpus scan and writes them with batched commits. Figures with no
+        co-mentions get an empty map, so stale relations are cleared.
+        """
+        print("🚀 Rebuilding related figures for all figures...")
+        matrix = self.build_co_mention_matrix()
+
+        writer = BatchWriter(self.db)
+        for figure_id in self.id_to_name_map:
+            related_counts = matrix.get(figure_id, {})
+            sorted_related = sorted(related_counts.items(), key=operator.itemgetter(1), reverse=True)
+            writer.update(
+                self.db.collection('selected-figures').document(figure_id),
+                {'related_figures': {related_id: count for related_id, count in sorted_related}}
+            )
+        writer.commit()
+        self._state_ref().set({'last_full_rebuild': firestore.SERVER_TIMESTAMP}, merge=True)
+        print(f"✓ Updated related figures for {len(self.id_to_name_map)} figures in {writer.commits} batch commits.")
+        return matrix
+
+    def _state_ref(self):
+        return self.db.collection(PIPELINE_STATE_COLLECTION).document(RELATED_FIGURES_STATE_DOC)
+
+    def _co_mention_pairs(self, names_in_article) -> set:
+        """Returns the ordered (figure_id, related_id) pairs co-mentioned in an article."""
+        figure_ids = self._resolve_article_figures(names_in_article)
+        return {(figure_id, other_id) for figure_id in figure_ids for other_id in figure_ids if other_id != figure_id}
+
+    def apply_co_mention_deltas(self, deltas: list) -> int:
+        """
+        Applies per-article co-mention deltas emitted during ingestion to the
+        'related_figures' maps with Firestore increments, in batched writes.
+
+        Args:
+            deltas (list): Dicts with 'article_id', 'previous' and 'current'
+                'public_figures' lists, as recorded by process_new_articles.
+
+        Returns:
+            int: The number of figure documents updated.
+        """
+        increments = defaultdict(lambda: defaultdict(int))
+        for delta in deltas:
+            previous_pairs = self._co_mention_pairs(delta.get('previous', []))
+            current_pairs = self._co_mention_pairs(delta.get('current', []))
+            for figure_id, other_id in current_pairs - previous_pairs:
+                increments[figure_id][other_id] += 1
+            for figure_id, other_id in previous_pairs - current_pairs:
+                increments[figure_id][other_id] -= 1
+
+        print(f"  -> Applying co-mention deltas from {len(deltas)} articles to {len(increments)} figures...")
+        writer = BatchWriter(self.db)
+        for figure_id, related_increments in increments.items():
+            update_data = {
+                # Escape the map key in case a figure ID contains field-path characters
+                firestore.FieldPath('related_figures', related_id).to_api_repr(): firestore.Increment(count)
+                for related_id, count in related_increments.items() if count
+            }
+            if update_data:
+                writer.update(self.db.collection('selected-figures').document(figure_id), update_data)
+        writer.commit()
+        self._prune_exhausted_counts([
+            figure_id for figure_id, related_increments in increments.items()
+            if any(count < 0 for count in related_increments.values())
+        ])
+
+        self._state_ref().set({
+            'last_incremental_update': firestore.SERVER_TIMESTAMP,
+            'incremental_articles_applied': firestore.Increment(len(deltas))
+        }, merge=True)
+        print(f"  ✓ Incrementally updated related figures for {len(increments)} figures.")
+        return len(increments)
+
+    def _prune_exhausted_counts(self, figure_ids: list):
+        """Removes 'related_figures' entries that decrements brought to zero or below."""
+        if not figure_ids:
+            return
+        refs = [self.db.collection('selected-figures').document(figure_id) for figure_id in figure_ids]
+        writer = BatchWriter(self.db)
+        pruned = 0
+        for doc in self.db.get_all(refs, field_paths=['related_figures']):
+            related = (doc.to_dict() or {}).get('related_figures') or {}
+            exhausted = [related_id for related_id, count in related.items() if count <= 0]
+            if exhausted:
+                writer.update(doc.reference, {
+                    firestore.FieldPath('related_figures', related_id).to_api_repr(): firestore.DELETE_FIELD
+                    for related_id in exhausted
+                })
+                pruned += len(exhausted)
+        writer.commit()
+        if pruned:
+            print(f"  -> Removed {pruned} related-figure entries whose co-mention count dropped to zero.")
+
+    def reconcile_if_due(self, interval_days: int = RECONCILE_INTERVAL_DAYS) -> bool:
+        """
+        Runs a full rebuild if the last one is older than `interval_days`, to
+        correct any drift accumulated by incremental updates.
+
+        Returns:
+            bool: True if a rebuild was run.
+        """
+        last_rebuild = (self._state_ref().get().to_dict() or {}).get('last_full_rebuild')
+        if last_rebuild and datetime.now(timezone.utc) - last_rebuild < timedelta(days=interval_days):
+            print(f"  -> Related figures were fully rebuilt on {last_rebuild:%Y-%m-%d}; reconciliation not due.")
+            return False
+
+        print("  -> Related figures reconciliation is due.")
+        self.rebuild_all()
+        return True
+
+    def rebuilt_since(self, since: datetime) -> bool:
+        """Returns True if a full rebuild completed at or after `since` (a UTC datetime)."""
+        last_rebuild = (self._state_ref().get().to_dict() or {}).get('last_full_rebuild')
+        return bool(last_rebuild and last_rebuild >= since)
+
     def update_for_figure(self, figure_id: str):
         """
         Calculates and updates co-mention frequency for a single figure.
@@ -103,38 +259,23 @@ class RelatedFiguresUpdater:
         related_counts = defaultdict(int)
         total_articles_found = 0
         
-        # Check each variation
-        for variation in name_variations:
-            print(f"  -> Searching for articles containing: '{variation}'")
+        # One query covering every variation; an article matching several is only read once
+        try:
+            query = self.db.collection('newsArticles').select(['public_figures']).where(
+                filter=FieldFilter('public_figures', 'array_contains_any', name_variations[:MAX_ARRAY_CONTAINS_ANY])
+            )
             
-            try:
-                query = self.db.collection('newsArticles').where(
-                    filter=FieldFilter('public_figures', 'array_contains', variation)
-                )
-                
-                articles_for_this_variation = 0
-                for article in query.stream():
-                    articles_for_this_variation += 1
-                    total_articles_found += 1
-                    
-                    names_in_article = article.to_dict().get('public_figures', [])
-                    
-                    for other_name in names_in_article:
-                        # Skip if it's the same as our target (any variation)
-                        if other_name.lower() == variation.lower():
-                            continue
-                        
-                        # Find which selected figure this corresponds to
-                        other_figure_id, other_exact_name = self._find_exact_figure_match(other_name)
-                        
-                        if other_figure_id and other_figure_id != figure_id:
-                            related_counts[other_figure_id] += 1
+            for article in query.stream():
+                total_articles_found += 1
+                names_in_article = article.to_dict().get('public_figures', [])
                 
-                print(f"    -> Found {articles_for_this_variation} articles with '{variation}'")
-                
-            except Exception as e:
-                print(f"    -> No articles found with '{variation}' (this is normal)")
-                continue
+                for other_figure_id in self._resolve_article_figures(names_in_article):
+                    if other_figure_id != figure_id:
+                        related_counts[other_figure_id] += 1
+            
+        except Exception as e:
+            print(f"    -> Error querying articles for '{target_figure_name}': {e}")
+            return
 
         print(f"  -> Total articles found across all variations: {total_articles_found}")
 
@@ -162,11 +303,26 @@ class RelatedFiguresUpdater:
 # This main block allows the script to still be run standalone if needed
 async def main():
     parser = argparse.ArgumentParser(description="Standalone runner for updating related figures.")
-    parser.add_argument("-f", "--figure", required=True, type=str, help="The ID of the public figure to process.")
+    parser.add_argument("-f", "--figure", type=str, help="The ID of the public figure to process.")
+    parser.add_argument("--all", action="store_true", help="Rebuild related figures for every figure with a single corpus scan.")
+    parser.add_argument("--apply-deltas", type=str, metavar="JSON_FILE",
+                        help="Apply co-mention deltas saved during ingestion (e.g. 'co_mention_deltas.json').")
+    parser.add_argument("--reconcile", action="store_true",
+                        help=f"Run a full rebuild if the last one is older than {RECONCILE_INTERVAL_DAYS} days.")
     args = parser.parse_args()
+    if not any([args.all, args.figure, args.apply_deltas, args.reconcile]):
+        parser.error("Provide --figure, --all, --apply-deltas or --reconcile.")
     
     updater = RelatedFiguresUpdater()
-    updater.update_for_figure(args.figure)
+    if args.all:
+        updater.rebuild_all()
+    elif args.apply_deltas:
+        with open(args.apply_deltas, "r") as f:
+            updater.apply_co_mention_deltas(json.load(f))
+    elif args.reconcile:
+        updater.reconcile_if_due()
+    else:
+        updater.update_for_figure(args.figure)
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
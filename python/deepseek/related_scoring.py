@@ -0,0 +1,194 @@
+# related_scoring.py
+
+import argparse
+import asyncio
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from scipy import sparse
+
+from batch_writer import BatchWriter
+from related_figures import RelatedFiguresUpdater
+
+# --- CONFIGURATION ---
+SCORED_FIELD = "related_figures_scored"  # {related_id: score}, top-K only; read by the [publicFigure] page
+HALF_LIFE_DAYS = 180  # An article's weight halves every HALF_LIFE_DAYS
+TOP_K = 10  # Neighbours stored per figure
+MIN_CO_MENTIONS = 2  # Raw co-mention support required before a pair is scored
+SCORING_METHODS = ("pmi", "jaccard")
+SCORE_REFRESH_HOURS = 24  # Incremental runs rescore once this old, so the page's scores lag by at most a day
+
+
+class RelatedScoringEngine:
+    """
+    Scores figure relatedness from the co-mention data in 'newsArticles'.
+
+    Builds a sparse figure x article incidence matrix, weights each article with
+    exponential time decay on its 'sendDate', and normalizes the weighted
+    co-mention counts with PMI or Jaccard, so figures that are mentioned
+    everywhere (e.g. BTS) no longer dominate every neighbour list.
+    """
+    def __init__(self, related_updater: RelatedFiguresUpdater = None, half_life_days: float = HALF_LIFE_DAYS,
+                 top_k: int = TOP_K, method: str = "pmi"):
+        """
+        Args:
+            related_updater (RelatedFiguresUpdater, optional): Reused for its name-to-ID resolution.
+            half_life_days (float): Half-life of the time decay applied to each article.
+            top_k (int): Number of neighbours stored per figure.
+            method (str): 'pmi' (positive PMI) or 'jaccard'.
+        """
+        if method not in SCORING_METHODS:
+            raise ValueError(f"Unknown scoring method '{method}'. Use one of {SCORING_METHODS}.")
+        self.resolver = related_updater or RelatedFiguresUpdater()
+        self.db = self.resolver.db
+        self.half_life_days = half_life_days
+        self.top_k = top_k
+        self.method = method
+        self.figure_ids = sorted(self.resolver.id_to_name_map)
+        self.figure_index = {figure_id: i for i, figure_id in enumerate(self.figure_ids)}
+
+    def _article_weight(self, send_date, now: datetime) -> float:
+        """Exponential decay weight for an article's 'sendDate' (YYYYMMDD). Undated articles get full weight."""
+        try:
+            sent = datetime.strptime(str(send_date)[:8], "%Y%m%d").replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError):
+            return 1.0
+        age_days = max((now - sent).days, 0)
+        return math.pow(0.5, age_days / self.half_life_days)
+
+    def load_incidence(self):
+        """
+        Streams 'newsArticles' once and returns the binary figure x article
+        incidence matrix and the per-article decay weights.
+
+        Returns:
+            tuple: (scipy.sparse.csr_matrix of shape (figures, articles), np.ndarray of weights)
+        """
+        print("  -> Streaming 'newsArticles' to build the incidence matrix...")
+        now = datetime.now(timezone.utc)
+        rows, cols, weights = [], [], []
+
+        for article in self.db.collection('newsArticles').select(['public_figures', 'sendDate']).stream():
+            article_data = article.to_dict()
+            figure_ids = self.resolver._resolve_article_figures(article_data.get('public_figures', []))
+            if not figure_ids:
+                continue
+            article_col = len(weights)
+            weights.append(self._article_weight(article_data.get('sendDate'), now))
+            for figure_id in figure_ids:
+                rows.append(self.figure_index[figure_id])
+                cols.append(article_col)
+
+        incidence = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (np.array(rows, dtype=np.int32), np.array(cols, dtype=np.int32))),
+            shape=(len(self.figure_ids), len(weights))
+        )
+        print(f"  ✓ Incidence matrix: {incidence.shape[0]} figures x {incidence.shape[1]} articles, {incidence.nnz} mentions.")
+        return incidence, np.asarray(weights, dtype=np.float64)
+
+    def compute_scores(self, incidence, weights):
+        """
+        Computes the normalized relatedness matrix.
+
+        Returns:
+            scipy.sparse.csr_matrix: Symmetric (figures x figures) scores with an empty diagonal.
+        """
+        weighted = incidence.multiply(weights[np.newaxis, :]).tocsr()
+        co_weighted = (weighted @ incidence.T).tocoo()  # Decayed co-mention mass per pair
+        if co_weighted.nnz == 0:
+            # No article mentions a known figure; nothing to score (indexing co_raw would fail)
+            return sparse.csr_matrix(co_weighted.shape)
+        co_raw = (incidence @ incidence.T).tocsr()  # Raw article counts per pair, for the support filter
+        mentions = np.asarray(weighted.sum(axis=1)).ravel()  # Decayed mention mass per figure
+        total = weights.sum()
+
+        i, j, c = co_weighted.row, co_weighted.col, co_weighted.data
+        support = np.asarray(co_raw[i, j]).ravel()
+        keep = (i != j) & (support >= MIN_CO_MENTIONS) & (c > 0)
+        i, j, c = i[keep], j[keep], c[keep]
+
+        if self.method == "pmi":
+            scores = np.log(c * total / (mentions[i] * mentions[j]))
+            positive = scores > 0
+            i, j, scores = i[positive], j[positive], scores[positive]
+        else:
+            scores = c / (mentions[i] + mentions[j] - c)
+
+        return sparse.csr_matrix((scores, (i, j)), shape=co_weighted.shape)
+
+    def top_neighbours(self, scores) -> dict:
+        """Returns {figure_id: {related_id: score}} with the top-K neighbours of every figure."""
+        neighbours = {}
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            if start == end:
+                neighbours[self.figure_ids[row]] = {}
+                continue
+            row_scores = scores.data[start:end]
+            row_cols = scores.indices[start:end]
+            k = min(self.top_k, len(row_scores))
+            best = np.argpartition(-row_scores, k - 1)[:k]
+            best = best[np.argsort(-row_scores[best])]
+            neighbours[self.figure_ids[row]] = {
+                self.figure_ids[row_cols[b]]: round(float(row_scores[b]), 4) for b in best
+            }
+        return neighbours
+
+    def run(self, dry_run: bool = False) -> dict:
+        """
+        Full recompute: one corpus scan, in-memory scoring, and batched writes of
+        the top-K map to each figure's '{SCORED_FIELD}' field.
+        """
+        print(f"🚀 Scoring related figures ({self.method}, half-life {self.half_life_days} days, top {self.top_k})...")
+        incidence, weights = self.load_incidence()
+
+        started = datetime.now()
+        neighbours = self.top_neighbours(self.compute_scores(incidence, weights))
+        print(f"  ✓ Scored {len(neighbours)} figures in {(datetime.now() - started).total_seconds():.2f}s.")
+
+        if dry_run:
+            for figure_id, related in list(neighbours.items())[:10]:
+                print(f"    {figure_id}: {related}")
+            return neighbours
+
+        writer = BatchWriter(self.db)
+        for figure_id, related in neighbours.items():
+            writer.update(self.db.collection('selected-figures').document(figure_id), {SCORED_FIELD: related})
+        writer.commit()
+        self.resolver._state_ref().set({"last_scored": datetime.now(timezone.utc)}, merge=True)
+        print(f"✓ Wrote '{SCORED_FIELD}' for {len(neighbours)} figures.")
+        return neighbours
+
+    def run_if_due(self, interval_hours: float = SCORE_REFRESH_HOURS) -> bool:
+        """
+        Runs a full recompute if the last one is older than `interval_hours`.
+
+        Returns:
+            bool: True if the scores were recomputed.
+        """
+        last_scored = (self.resolver._state_ref().get().to_dict() or {}).get("last_scored")
+        if last_scored and datetime.now(timezone.utc) - last_scored < timedelta(hours=interval_hours):
+            print(f"  -> Related figure scores were computed at {last_scored:%Y-%m-%d %H:%M} UTC; refresh not due.")
+            return False
+        self.run()
+        return True
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Computes time-decayed, normalized related-figure scores.")
+    parser.add_argument("--method", choices=SCORING_METHODS, default="pmi", help="Normalization method (default: pmi).")
+    parser.add_argument("--half-life-days", type=float, default=HALF_LIFE_DAYS,
+                        help=f"Half-life of the article time decay (default: {HALF_LIFE_DAYS}).")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help=f"Neighbours stored per figure (default: {TOP_K}).")
+    parser.add_argument("--dry-run", action="store_true", help="Compute and print scores without writing them.")
+    args = parser.parse_args()
+
+    engine = RelatedScoringEngine(half_life_days=args.half_life_days, top_k=args.top_k, method=args.method)
+    engine.run(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    # Example:
+    # python related_scoring.py --method jaccard --top-k 12 --dry-run
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+# run_budget.py
+
+# Token- and time-budgeted runs. Pending figures are ordered by priority
+# (new summaries waiting, trending score, time since the last update) and
+# started in that order until the budget is spent. The budget is checked
+# before each figure starts, so figures that are running finish and every
+# figure is either fully processed or untouched; the untouched ones are left
+# in the work queue for the next run.
+
+import asyncio
+import math
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from llm_governor import LLMGovernor
+from processing_ledger import pending_count
+
+# --- CONFIGURATION ---
+BACKLOG_WEIGHT = 1.0  # Per summary waiting in the figure's ledger backlog
+POPULARITY_WEIGHT = 3.0  # Per unit of log(1 + trending score)
+STALENESS_WEIGHT = 0.2  # Per day since the figure's lastUpdated...
+MAX_STALENESS_DAYS = 30  # ...up to this many days
+PRIORITY_READ_CONCURRENCY = 16  # Backlog counts requested at once
+
+
+class RunBudget:
+    """
+    Limits a run by LLM tokens (counted by the installed LLMGovernor) and/or
+    wall-clock seconds. A new figure is only started if the average cost of
+    the figures finished so far still fits in what is left.
+    """
+    def __init__(self, token_budget: Optional[int] = None, time_budget: Optional[float] = None):
+        """
+        Args:
+            token_budget (int, optional): Prompt + completion tokens the run may use.
+            time_budget (float, optional): Seconds the run may take, from creation.
+        """
+        self.token_budget = token_budget
+        self.time_budget = time_budget
+        self.started = time.monotonic()
+        self.figures_finished = 0
+        self.stop_reason = None
+
+    def tokens_used(self) -> int:
+        governor = LLMGovernor.current()
+        return governor.prompt_tokens + governor.completion_tokens if governor else 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def figure_finished(self):
+        self.figures_finished += 1
+
+    def exhausted(self) -> Optional[str]:
+        """Returns why no further figure should start, or None if one fits the budget."""
+        if self.stop_reason:
+            return self.stop_reason
+        # Until a figure has finished there is no estimate, so only an overrun stops the run
+        finished = self.figures_finished
+        if self.token_budget is not None:
+            used = self.tokens_used()
+            if used + (used / finished if finished else 0) >= self.token_budget:
+                self.stop_reason = f"token budget spent ({used}/{self.token_budget} tokens)"
+        if self.time_budget is not None and not self.stop_reason:
+            elapsed = self.elapsed()
+            if elapsed + (elapsed / finished if finished else 0) >= self.time_budget:
+                self.stop_reason = f"time budget spent ({elapsed:.0f}/{self.time_budget:.0f}s)"
+        return self.stop_reason
+
+    def report(self, remaining: List[str]):
+        print(f"\n{'='*25}\n💰 BUDGET REPORT\n{'='*25}")
+        tokens = f"{self.tokens_used()}" + (f"/{self.token_budget}" if self.token_budget is not None else "")
+        seconds = f"{self.elapsed():.0f}" + (f"/{self.time_budget:.0f}" if self.time_budget is not None else "")
+        print(f"  -> Used {tokens} tokens and {seconds}s for {self.figures_finished} figures")
+        if not remaining:
+            print("  ✓ All pending figures were processed within the budget.")
+            return
+        print(f"  ⚠️ Stopped early: {self.stop_reason}")
+        preview = ", ".join(remaining[:10]) + (", ..." if len(remaining) > 10 else "")
+        print(f"  -> {len(remaining)} figures left for the next run: {preview}")
+
+
+async def prioritize_figures(db, figure_ids: List[str]) -> Tuple[List[str], Dict[str, float]]:
+    """
+    Orders figures by priority, highest first:
+    new summaries waiting + popularity (trending score) + staleness.
+
+    Returns:
+        tuple: (figure IDs in priority order, {figure_id: priority})
+    """
+    from trending_figures import PIPELINE_STATE_COLLECTION, TRENDING_STATE_DOC
+
+    if len(figure_ids) < 2:
+        return list(figure_ids), {figure_id: 0.0 for figure_id in figure_ids}
+    print(f"Ranking {len(figure_ids)} figures by priority...")
+
+    trending_scores = (db.collection(PIPELINE_STATE_COLLECTION).document(TRENDING_STATE_DOC).get().to_dict() or {}).get("scores", {})
+    figure_refs = [db.collection("selected-figures").document(figure_id) for figure_id in figure_ids]
+    last_updated = {doc.id: (doc.to_dict() or {}).get("lastUpdated") for doc in db.get_all(figure_refs, field_paths=["lastUpdated"])}
+
+    semaphore = asyncio.Semaphore(PRIORITY_READ_CONCURRENCY)
+
+    async def backlog(figure_ref):
+        async with semaphore:
+            return await asyncio.to_thread(pending_count, figure_ref.collection("article-summaries"))
+
+    backlogs = await asyncio.gather(*(backlog(ref) for ref in figure_refs))
+
+    today = datetime.now(timezone.utc).date()
+    priorities = {}
+    for figure_id, pending in zip(figure_ids, backlogs):
+        staleness = MAX_STALENESS_DAYS
+        if last_updated.get(figure_id):
+            try:
+                staleness = (today - datetime.strptime(last_updated[figure_id], "%Y-%m-%d").date()).days
+            except (TypeError, ValueError):
+                pass
+        priorities[figure_id] = (
+            BACKLOG_WEIGHT * pending
+            + POPULARITY_WEIGHT * math.log1p(trending_scores.get(figure_id, 0.0))
+            + STALENESS_WEIGHT * min(max(staleness, 0), MAX_STALENESS_DAYS)
+        )
+
+    ordered = sorted(figure_ids, key=lambda figure_id: priorities[figure_id], reverse=True)
+    print(f"  -> Top priorities: {', '.join(f'{figure_id} ({priorities[figure_id]:.1f})' for figure_id in ordered[:5])}")
+    return ordered, priorities
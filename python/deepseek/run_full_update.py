@@ -2,31 +2,46 @@
 
 import asyncio
 import argparse
-from typing import List
+from typing import List, Optional, TYPE_CHECKING
 import json
+import os
+import time
+from datetime import datetime, timezone
 
 # --- Core Dependencies ---
-from setup_firebase_deepseek import NewsManager
-from predefined_public_figure_extractor import PredefinedPublicFigureExtractor
+# The updater classes (and through them firebase_admin, openai, numpy and scipy)
+# are imported where they are used, so argument parsing and `--help` stay fast.
+from setup_firebase_deepseek import NewsManager, create_http_client
+from llm_governor import LLMGovernor, DEFAULT_MAX_CONCURRENT_REQUESTS
+from processing_ledger import has_backlog
+from pipeline_dag import PipelineStep, DagScheduler
+from work_queue import WorkQueue, import_legacy_file, DEFAULT_QUEUE_PATH
+from figure_leases import FigureLeaseManager, create_lease_manager, DEFAULT_LEASE_SECONDS
+from optimistic_writes import contention_stats
+from run_budget import RunBudget, prioritize_figures
+from article_listener import ArticleListener, FigureDebouncer, DEFAULT_DEBOUNCE_SECONDS
 
-# --- Import Updater Classes from Their Respective Files ---
-# Note: You might need to adjust filenames if they differ slightly
-from UPDATE_article_categorizer import (
-    PublicFigureSummaryCategorizer as ArticleCategorizer,
-)
-from UPDATE_wiki_content import PublicFigureWikiUpdater as WikiContentUpdater
-from UPDATE_timeline import CurationEngine
-from compact_overview import CompactOverview
-from compact_event_summaries_descriptions import DataUpdater as TimelineCompactor
+if TYPE_CHECKING:
+    from related_figures import RelatedFiguresUpdater
 
-from related_figures import RelatedFiguresUpdater
+CO_MENTION_DELTAS_FILE = "co_mention_deltas.json"  # Written by --run-ingestion, consumed by --process-updated
+RELATED_REBUILD_LEASE = "_related-figures-rebuild"  # Lease key for the --all-figures corpus rebuild
+MAINTENANCE_SECONDS = 15 * 60  # --listen: how often related figures, trending and enrichment catch up
+QUEUE_POLL_SECONDS = 2  # How often idle workers check the queue while ingestion is still running
 
 
 # The orchestrator class remains the same, but it's now much clearer
 # what it's coordinating because the implementations are hidden in other files.
 class MasterUpdater:
     def __init__(self):
-        self.db = NewsManager().db
+        # One runtime for the whole process: a single Firestore client and a single
+        # pooled DeepSeek client, shared by every step and closed once in close()
+        self.news_manager = NewsManager(http_client=create_http_client())
+        self.db = self.news_manager.db
+        # Set by main when several processes share the work (see figure_leases)
+        self.lease_manager: Optional[FigureLeaseManager] = None
+        # Set by main for --token-budget/--time-budget runs (see run_budget)
+        self.budget: Optional[RunBudget] = None
 
     async def get_all_figure_ids(self) -> List[str]:
         """Fetches all document IDs from the 'selected-figures' collection."""
@@ -37,52 +52,336 @@ class MasterUpdater:
         return ids
 
     async def run_full_update_for_figure(
-        self, figure_id: str, related_updater: RelatedFiguresUpdater
+        self, figure_id: str, related_updater: Optional["RelatedFiguresUpdater"], backfill_compaction: bool = False
     ):
         """
-        Runs the complete, ordered update and compaction pipeline for a single figure.
+        Runs the update and compaction pipeline for a single figure as a dependency
+        graph, so independent steps overlap. Raises if any step failed.
+
+        Args:
+            figure_id (str): The ID of the figure to process.
+            related_updater (RelatedFiguresUpdater, optional): Shared related-figures updater.
+                Pass None when related figures are updated for all figures in one pass
+                (full rebuild or incremental co-mention deltas).
+            backfill_compaction (bool): Also run the standalone compaction passes (STEP 4/5).
+                Wiki and timeline content is compacted at generation time, so these are
+                only needed to backfill documents written before that change.
         """
+        from UPDATE_article_categorizer import PublicFigureSummaryCategorizer as ArticleCategorizer
+        from UPDATE_wiki_content import PublicFigureWikiUpdater as WikiContentUpdater
+        from UPDATE_timeline import CurationEngine
+        from compact_overview import CompactOverview
+        from compact_event_summaries_descriptions import DataUpdater as TimelineCompactor
+
         print(f"\n{'='*25}\n🚀 STARTING FULL UPDATE FOR: {figure_id.upper()}\n{'='*25}")
 
-        # STEP 1: Categorize new article summaries
-        print("\n--- STEP 1 of 5: Categorizing new articles ---")
-        categorizer = ArticleCategorizer()
-        await categorizer.process_summaries(
-            figure_id=figure_id
-        )  # Call the correct method
-
-        # STEP 2: Update Wiki Content with new summaries
-        print("\n--- STEP 2 of 5: Updating wiki content ---")
-        wiki_updater = WikiContentUpdater()
-        await wiki_updater.update_all_wiki_content(
-            specific_figure_id=figure_id
-        )  # Call the correct method
-
-        # STEP 3: Update Curated Timeline and mark articles as processed
-        print("\n--- STEP 3 of 5: Updating curated timeline ---")
-        curation_engine = CurationEngine(figure_id=figure_id)
-        await curation_engine.run_incremental_update()
-
-        # STEP 4: Compact Wiki/Overview documents
-        print("\n--- STEP 4 of 5: Compacting wiki overviews ---")
-        overview_compactor = CompactOverview()
-        await overview_compactor.compact_figure_overview(figure_id=figure_id)
-
-        # STEP 5: Compact Timeline event summaries and descriptions
-        print("\n--- STEP 5 of 5: Compacting timeline events ---")
-        timeline_compactor = TimelineCompactor(figure_id=figure_id)
-        await timeline_compactor.run_update()
-
-        # --- 3. ADD THE NEW STEP 6 ---
-        print("\n--- STEP 6 of 6: Updating related figures count ---")
-        # The 'related_updater' was created outside and passed in for efficiency
-        related_updater.update_for_figure(figure_id)
+        # Steps run as soon as their inputs are ready:
+        #   categorize -> wiki -> curation -> compact-timeline
+        #                  wiki -> compact-overview
+        #   related-figures (independent)
+        # Each summary-driven step works on its own ledger backlog (see processing_ledger),
+        # checked when the step becomes ready so upstream progress is taken into account.
+        summaries_ref = self.db.collection("selected-figures").document(figure_id).collection("article-summaries")
+
+        def skip_without_backlog(stage):
+            async def skip_if(results):
+                if await asyncio.to_thread(has_backlog, summaries_ref, stage):
+                    return None
+                return f"no summaries waiting for '{stage}'"
+            return skip_if
+
+        async def categorize():
+            # STEP 1: Categorize new article summaries
+            print(f"\n--- [{figure_id}] STEP 1 of 6: Categorizing new articles ---")
+            await ArticleCategorizer(news_manager=self.news_manager).process_summaries(figure_id=figure_id)
+
+        async def update_wiki():
+            # STEP 2: Update Wiki Content with new summaries
+            print(f"\n--- [{figure_id}] STEP 2 of 6: Updating wiki content ---")
+            await WikiContentUpdater(news_manager=self.news_manager).update_all_wiki_content(specific_figure_id=figure_id)
+
+        async def curate_timeline():
+            # STEP 3: Update Curated Timeline and mark articles as processed
+            print(f"\n--- [{figure_id}] STEP 3 of 6: Updating curated timeline ---")
+            await CurationEngine(figure_id=figure_id, news_manager=self.news_manager).run_incremental_update()
+
+        async def compact_overview():
+            # STEP 4: Compact Wiki/Overview documents
+            print(f"\n--- [{figure_id}] STEP 4 of 6: Compacting wiki overviews ---")
+            await CompactOverview(news_manager=self.news_manager).compact_figure_overview(figure_id=figure_id)
+
+        async def compact_timeline():
+            # STEP 5: Compact Timeline event summaries and descriptions
+            print(f"\n--- [{figure_id}] STEP 5 of 6: Compacting timeline events ---")
+            await TimelineCompactor(figure_id=figure_id, news_manager=self.news_manager).run_update()
+
+        async def update_related():
+            # STEP 6: The 'related_updater' was created outside and passed in for efficiency
+            print(f"\n--- [{figure_id}] STEP 6 of 6: Updating related figures count ---")
+            await asyncio.to_thread(related_updater.update_for_figure, figure_id)
+
+        def skip_compaction(results):
+            if not backfill_compaction:
+                return "content is compacted at generation time; use --backfill-compaction"
+            return None
+
+        steps = [
+            PipelineStep("categorize", categorize, skip_if=skip_without_backlog("categorized")),
+            PipelineStep("wiki", update_wiki, depends_on=["categorize"], skip_if=skip_without_backlog("wiki_applied")),
+            PipelineStep("curation", curate_timeline, depends_on=["categorize", "wiki"], skip_if=skip_without_backlog("timeline_applied")),
+            PipelineStep("compact-overview", compact_overview, depends_on=["wiki"], skip_if=skip_compaction),
+            PipelineStep("compact-timeline", compact_timeline, depends_on=["curation"], skip_if=skip_compaction),
+            PipelineStep(
+                "related-figures", update_related,
+                skip_if=lambda results: None if related_updater else "updated for all figures after this run"
+            ),
+        ]
+        results = await DagScheduler(steps, label=figure_id).run()
+
+        failed = [name for name, result in results.items() if result["status"] == "failed"]
+        if failed:
+            raise RuntimeError(f"steps failed for {figure_id}: {', '.join(failed)}")
 
         print(f"\n{'='*25}\n✅ FULL UPDATE COMPLETE FOR: {figure_id.upper()}\n{'='*25}")
 
-    async def close_db_manager(self):
-        # A helper to close the underlying manager if needed, though each class handles its own.
-        await self.db._client.close()
+    async def run_figure(
+        self, figure_id: str, related_updater: Optional["RelatedFiguresUpdater"], backfill_compaction: bool = False
+    ) -> bool:
+        """
+        Runs run_full_update_for_figure, under the figure's lease when leases are enabled.
+
+        Returns:
+            bool: False if the figure was skipped because another process holds or completed it.
+        """
+        if self.lease_manager is None:
+            await self.run_full_update_for_figure(figure_id, related_updater, backfill_compaction)
+            return True
+        return await self.lease_manager.run_leased(
+            figure_id, lambda: self.run_full_update_for_figure(figure_id, related_updater, backfill_compaction)
+        )
+
+    async def run_figures(self, figure_ids: List[str], backfill_compaction: bool = False, concurrency: int = 1) -> dict:
+        """
+        Runs the per-figure pipeline for many figures, up to `concurrency` at a
+        time. Figures share no documents, so they can run side by side; LLM load
+        is bounded separately by the installed LLMGovernor. A failing figure is
+        recorded and does not stop the others. With a budget, figures run in
+        priority order and the ones that didn't fit are returned as "remaining".
+
+        Args:
+            figure_ids (List[str]): The IDs of the figures to process.
+            backfill_compaction (bool): Passed through to run_full_update_for_figure.
+            concurrency (int): Maximum number of figure pipelines running at once.
+
+        Returns:
+            dict: {"succeeded": [figure_id], "failed": {figure_id: error}, "skipped": [figure_id],
+                   "remaining": [figure_id], "seconds": {figure_id: duration}}
+        """
+        if self.budget:
+            figure_ids, _ = await prioritize_figures(self.db, figure_ids)
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        results = {"succeeded": [], "failed": {}, "skipped": [], "remaining": [], "seconds": {}}
+        started = time.monotonic()
+
+        async def run_one(i, figure_id):
+            async with semaphore:
+                if self.budget and self.budget.exhausted():
+                    results["remaining"].append(figure_id)
+                    return
+                print(f"\n\n--- Processing Figure {i+1}/{len(figure_ids)} ---")
+                figure_started = time.monotonic()
+                try:
+                    if await self.run_figure(figure_id, None, backfill_compaction):
+                        results["succeeded"].append(figure_id)
+                    else:
+                        results["skipped"].append(figure_id)
+                except Exception as e:
+                    results["failed"][figure_id] = f"{type(e).__name__}: {e}"
+                    print(f"\n❌ FULL UPDATE FAILED FOR: {figure_id.upper()}: {e}")
+                finally:
+                    results["seconds"][figure_id] = time.monotonic() - figure_started
+                    if self.budget:
+                        self.budget.figure_finished()
+
+        await asyncio.gather(*(run_one(i, figure_id) for i, figure_id in enumerate(figure_ids)))
+        # Semaphore waiters resume in order, but keep the report in priority order regardless
+        position = {figure_id: i for i, figure_id in enumerate(figure_ids)}
+        results["remaining"].sort(key=position.get)
+        self._print_run_summary(results, time.monotonic() - started, concurrency)
+        if self.budget:
+            self.budget.report(results["remaining"])
+        return results
+
+    async def run_queue(self, queue: WorkQueue, ingestion: Optional[asyncio.Task] = None,
+                        backfill_compaction: bool = False, concurrency: int = 1) -> dict:
+        """
+        Runs the per-figure pipeline for figures claimed from the work queue, with
+        `concurrency` workers. While `ingestion` is still running, idle workers wait
+        for it to push more figures; once it has finished they drain the queue and stop.
+        Failed figures go back to the queue (see WorkQueue.fail). With a budget,
+        queued figures are claimed in priority order and workers stop claiming once
+        it is spent; the rest stay queued and are returned as "remaining".
+
+        Args:
+            queue (WorkQueue): The queue ingestion pushes into.
+            ingestion (asyncio.Task, optional): The running ingestion, if any.
+            backfill_compaction (bool): Passed through to run_full_update_for_figure.
+            concurrency (int): Number of workers.
+
+        Returns:
+            dict: Same shape as run_figures.
+        """
+        results = {"succeeded": [], "failed": {}, "skipped": [], "remaining": [], "seconds": {}}
+        started = time.monotonic()
+        if self.budget:
+            # Figures pushed by ingestion during this run keep the default priority
+            _, priorities = await prioritize_figures(self.db, queue.pending_ids())
+            queue.set_priorities(priorities)
+
+        async def worker():
+            while True:
+                if self.budget and self.budget.exhausted():
+                    return
+                figure_id = queue.claim()
+                if figure_id is None:
+                    if ingestion is None or ingestion.done():
+                        return
+                    await asyncio.sleep(QUEUE_POLL_SECONDS)
+                    continue
+
+                print(f"\n\n--- Processing Figure {figure_id} from the work queue ({queue.counts()['pending']} pending) ---")
+                figure_started = time.monotonic()
+                try:
+                    # A figure leased by another process is acked too: its new summaries stay
+                    # in the figure's ledger backlog for that process or the next run
+                    if await self.run_figure(figure_id, None, backfill_compaction):
+                        results["succeeded"].append(figure_id)
+                    else:
+                        results["skipped"].append(figure_id)
+                    queue.ack(figure_id)
+                    results["failed"].pop(figure_id, None)
+                except Exception as e:
+                    queue.fail(figure_id, f"{type(e).__name__}: {e}")
+                    results["failed"][figure_id] = f"{type(e).__name__}: {e}"
+                    print(f"\n❌ FULL UPDATE FAILED FOR: {figure_id.upper()}: {e}")
+                finally:
+                    results["seconds"][figure_id] = results["seconds"].get(figure_id, 0.0) + time.monotonic() - figure_started
+                    if self.budget:
+                        self.budget.figure_finished()
+
+        await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+        results["remaining"] = queue.pending_ids()
+        self._print_run_summary(results, time.monotonic() - started, concurrency)
+        if self.budget:
+            self.budget.report(results["remaining"])
+        counts = queue.counts()
+        print(f"  -> Work queue: {counts['pending']} pending, {counts['failed']} parked after repeated failures")
+        queue.purge_done()
+        return results
+
+    def _print_run_summary(self, results: dict, elapsed: float, concurrency: int):
+        print(f"\n{'='*25}\n📊 RUN SUMMARY (concurrency {concurrency})\n{'='*25}")
+        print(f"  ✓ Succeeded: {len(results['succeeded'])}")
+        print(f"  ❌ Failed: {len(results['failed'])}")
+        if results["skipped"]:
+            print(f"  -> Skipped (leased by another process): {len(results['skipped'])}")
+        for figure_id, error in results["failed"].items():
+            print(f"      - {figure_id}: {error}")
+        if results["seconds"]:
+            slowest = sorted(results["seconds"].items(), key=lambda item: item[1], reverse=True)[:5]
+            print(f"  -> Wall clock: {elapsed:.1f}s; sum of figure times: {sum(results['seconds'].values()):.1f}s")
+            print(f"  -> Slowest: {', '.join(f'{figure_id} ({seconds:.1f}s)' for figure_id, seconds in slowest)}")
+        governor = LLMGovernor.current()
+        if governor:
+            print(f"  -> {governor.summary()}")
+        if contention_stats.summary():
+            print(f"  -> Write contention: {contention_stats.summary()}")
+
+    def update_related_figures_incrementally(self, co_mention_deltas: list):
+        """
+        Applies the co-mention deltas from ingestion to 'related_figures' (O(new articles))
+        and runs the periodic full reconciliation when it is due. The normalized scores the
+        figure page prefers are recomputed with the reconciliation, or daily otherwise.
+        The list is emptied once the deltas are written, so after a failure it holds only
+        what is still unapplied.
+        """
+        from related_figures import RelatedFiguresUpdater
+        from related_scoring import RelatedScoringEngine
+
+        print(f"\n--- Updating related figures from {len(co_mention_deltas)} new articles ---")
+        related_figures_updater = RelatedFiguresUpdater(news_manager=self.news_manager)
+        if co_mention_deltas:
+            related_figures_updater.apply_co_mention_deltas(co_mention_deltas)
+            co_mention_deltas.clear()
+        if related_figures_updater.reconcile_if_due():
+            # Refresh the normalized scores alongside the full rebuild
+            RelatedScoringEngine(related_figures_updater).run()
+        else:
+            RelatedScoringEngine(related_figures_updater).run_if_due()
+
+    async def update_trending_figures(self):
+        """Refreshes the homepage's trending list from the articles since the last run."""
+        from trending_figures import TrendingFiguresJob
+
+        print("\n--- Updating trending figures ---")
+        await TrendingFiguresJob(news_manager=self.news_manager).run()
+
+    async def enrich_new_figures(self):
+        """Fills the remaining profile fields of figures created with only their core fields during ingestion."""
+        from figure_enrichment import FigureEnricher
+
+        if self.budget and self.budget.exhausted():
+            print(f"\n--- Skipping figure enrichment: {self.budget.exhausted()} ---")
+            return
+
+        print("\n--- Enriching new figure profiles ---")
+        await FigureEnricher(news_manager=self.news_manager).enrich_pending()
+
+    async def run_periodic_maintenance(self, extractor, interval: float = MAINTENANCE_SECONDS):
+        """
+        For --listen: every `interval` seconds, applies the co-mention deltas the
+        extractor collected since the last pass and refreshes trending and enrichment.
+        Runs until cancelled.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            # Articles ingested while the deltas are applied go to a fresh list
+            deltas, extractor.co_mention_deltas = extractor.co_mention_deltas, []
+            try:
+                await asyncio.to_thread(self.update_related_figures_incrementally, deltas)
+                await self.update_trending_figures()
+                await self.enrich_new_figures()
+            except Exception as e:
+                print(f"❌ Periodic maintenance failed: {e}")
+            finally:
+                # Whatever wasn't applied is retried at the next pass (or saved on shutdown)
+                extractor.co_mention_deltas[:0] = deltas
+
+    async def close(self):
+        """Closes the shared runtime. Steps never close a manager they were given."""
+        await self.news_manager.close()
+
+
+def load_co_mention_deltas() -> list:
+    """Reads and removes CO_MENTION_DELTAS_FILE. Returns the deltas saved by earlier runs."""
+    if not os.path.exists(CO_MENTION_DELTAS_FILE):
+        return []
+    with open(CO_MENTION_DELTAS_FILE, "r") as f:
+        co_mention_deltas = json.load(f)
+    os.remove(CO_MENTION_DELTAS_FILE)  # Deltas must only be applied once
+    print(f"Loaded {len(co_mention_deltas)} co-mention deltas from '{CO_MENTION_DELTAS_FILE}'.")
+    return co_mention_deltas
+
+
+def save_co_mention_deltas(co_mention_deltas: list):
+    """Appends deltas to CO_MENTION_DELTAS_FILE, keeping any not yet applied by an earlier run."""
+    pending_deltas = []
+    if os.path.exists(CO_MENTION_DELTAS_FILE):
+        with open(CO_MENTION_DELTAS_FILE, "r") as f:
+            pending_deltas = json.load(f)
+    with open(CO_MENTION_DELTAS_FILE, "w") as f:
+        json.dump(pending_deltas + co_mention_deltas, f)
+    print(f"Saved {len(co_mention_deltas)} co-mention deltas to '{CO_MENTION_DELTAS_FILE}'.")
 
 
 async def main():
@@ -116,11 +415,32 @@ async def main():
         action='store_true',
         help="ONLY run the initial article ingestion process to find new figure mentions."
     )
+    parser.add_argument(
+        '--listen',
+        action='store_true',
+        help="Run continuously: ingest new articles as they arrive and update each\naffected figure once its articles stop arriving (see --debounce)."
+    )
+    parser.add_argument(
+        '--debounce',
+        type=int,
+        default=DEFAULT_DEBOUNCE_SECONDS,
+        help=f"--listen: seconds a figure must be quiet before its update starts (default: {DEFAULT_DEBOUNCE_SECONDS})."
+    )
+    parser.add_argument(
+        '--poll',
+        action='store_true',
+        help="--listen: poll for new articles instead of using a snapshot listener\n(for emulators and other stand-ins without listen support)."
+    )
     parser.add_argument(
         '--ingestion-limit',
         type=int,
         help="Limit the number of new articles to process during ingestion."
     )
+    parser.add_argument(
+        '--backfill-compaction',
+        action='store_true',
+        help="Also run the standalone wiki/timeline compaction passes to backfill\nolder, uncompacted documents."
+    )
     parser.add_argument(
         '--csv',
         type=str,
@@ -128,15 +448,82 @@ async def main():
         help="Path to the CSV file for the article ingestion process."
     )
 
+    parser.add_argument(
+        '--queue',
+        type=str,
+        default=DEFAULT_QUEUE_PATH,
+        help=f"SQLite work queue connecting ingestion and processing (default: {DEFAULT_QUEUE_PATH})."
+    )
+    parser.add_argument(
+        '--lease-backend',
+        type=str,
+        help="Claim figures with leases so several processes can share the work:\n"
+             "'firestore' across machines, or a SQLite file path for processes on one machine."
+    )
+    parser.add_argument(
+        '--lease-ttl',
+        type=int,
+        default=DEFAULT_LEASE_SECONDS,
+        help=f"Seconds a claimed figure stays leased without renewal (default: {DEFAULT_LEASE_SECONDS})."
+    )
+    parser.add_argument(
+        '--run-id',
+        type=str,
+        default=os.environ.get("GITHUB_RUN_ID"),
+        help="Shared by the processes of one run, so figures completed by one are not\nredone by another (default: $GITHUB_RUN_ID). Give one for sharded --all-figures\nruns; without it only the related-figures rebuild is deduplicated."
+    )
+    parser.add_argument(
+        '--token-budget',
+        type=int,
+        help="Stop starting new figures once this many LLM tokens are used; the rest\nstay queued for the next run (highest-priority figures run first)."
+    )
+    parser.add_argument(
+        '--time-budget',
+        type=int,
+        help="Stop starting new figures once this many seconds have passed (e.g. below\nthe CI job timeout); the rest stay queued for the next run."
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=1,
+        help="Number of figure pipelines to run at once (default: 1)."
+    )
+    parser.add_argument(
+        '--llm-concurrency',
+        type=int,
+        default=DEFAULT_MAX_CONCURRENT_REQUESTS,
+        help=f"Maximum in-flight LLM requests shared by all figures (default: {DEFAULT_MAX_CONCURRENT_REQUESTS})."
+    )
+
     args = parser.parse_args()
+    budget = RunBudget(args.token_budget, args.time_budget) if args.token_budget or args.time_budget else None
+    LLMGovernor.install(args.llm_concurrency)
     master_updater = MasterUpdater()
+    master_updater.budget = budget
+    if args.lease_backend:
+        master_updater.lease_manager = create_lease_manager(
+            args.lease_backend, db=master_updater.db, ttl=args.lease_ttl, run_id=args.run_id
+        )
+    try:
+        await run_mode(args, master_updater)
+    finally:
+        await master_updater.close()
+
+
+async def run_mode(args, master_updater: MasterUpdater):
+    """Runs the mode selected on the command line with the shared MasterUpdater."""
+    from predefined_public_figure_extractor import PredefinedPublicFigureExtractor
+    from related_figures import RelatedFiguresUpdater
+    from related_scoring import RelatedScoringEngine
+
 
     # Check if ANY argument was provided
     any_arg_provided = any([
         args.figure,
         args.all_figures,
         args.process_updated,
-        args.run_ingestion
+        args.run_ingestion,
+        args.listen
     ])
 
     # DEFAULT BEHAVIOR: Complete update when no arguments provided
@@ -144,23 +531,34 @@ async def main():
         print("=== RUNNING DEFAULT COMPLETE UPDATE ===")
         print("(No arguments provided - running ingestion + processing for updated figures)")
         
-        # STEP 1: Run ingestion to find updated figures
-        print("\n--- PHASE 1: INGESTION ---")
-        extractor = PredefinedPublicFigureExtractor(csv_filepath=args.csv)
-        updated_figure_names = await extractor.process_new_articles(limit=args.ingestion_limit)
+        # Ingestion and processing overlap: ingestion pushes each figure into the work
+        # queue as soon as its summaries are saved, and workers pick it up right away.
+        # Figures left in the queue by an interrupted run are processed too.
+        queue = WorkQueue(args.queue)
+        import_legacy_file(queue)
+        extractor = PredefinedPublicFigureExtractor(csv_filepath=args.csv, news_manager=master_updater.news_manager)
+        print("\n--- INGESTION + PROCESSING ---")
+        ingestion = asyncio.create_task(extractor.process_new_articles(limit=args.ingestion_limit, work_queue=queue))
+        try:
+            results = await master_updater.run_queue(queue, ingestion, args.backfill_compaction, args.concurrency)
+            updated_figure_names = await ingestion
+        finally:
+            if not ingestion.done():
+                ingestion.cancel()
+            queue.close()
 
         if updated_figure_names:
             print(f"\nIngestion found {len(updated_figure_names)} figures with new articles: {', '.join(updated_figure_names)}")
-            # Convert names to the document ID format
-            figure_ids = [name.lower().replace(" ", "").replace("-", "").replace(".", "") for name in updated_figure_names]
-            
-            # STEP 2: Immediately process those figures
-            print(f"\n--- PHASE 2: PROCESSING {len(figure_ids)} UPDATED FIGURES ---")
-            
-            related_figures_updater = RelatedFiguresUpdater()
-            for i, figure_id in enumerate(figure_ids):
-                print(f"\n--- Processing Updated Figure {i+1}/{len(figure_ids)} ---")
-                await master_updater.run_full_update_for_figure(figure_id, related_figures_updater)
+        # Deltas saved by an earlier --run-ingestion or --listen are applied with this run's
+        co_mention_deltas = load_co_mention_deltas() + extractor.co_mention_deltas
+        if updated_figure_names or results["succeeded"] or co_mention_deltas:
+            try:
+                master_updater.update_related_figures_incrementally(co_mention_deltas)
+            finally:
+                if co_mention_deltas:
+                    save_co_mention_deltas(co_mention_deltas)  # Not applied; the next run retries them
+            await master_updater.update_trending_figures()
+            await master_updater.enrich_new_figures()
             
             print("\n\n🎉 Complete update process finished! 🎉")
         else:
@@ -169,65 +567,122 @@ async def main():
         
         return  # Exit here for default behavior
 
+    if args.listen:
+        print("--- Running in LISTEN mode (Ctrl+C to stop) ---")
+        queue = WorkQueue(args.queue)
+        extractor = PredefinedPublicFigureExtractor(csv_filepath=args.csv, news_manager=master_updater.news_manager)
+        # Deltas saved by --run-ingestion or an earlier --listen go out with the first maintenance pass
+        extractor.co_mention_deltas = load_co_mention_deltas() + extractor.co_mention_deltas
+        debouncer = FigureDebouncer(queue, delay=args.debounce)
+        listener = asyncio.create_task(ArticleListener(extractor, debouncer, poll_only=args.poll).run())
+        maintenance = asyncio.create_task(master_updater.run_periodic_maintenance(extractor))
+        try:
+            # Workers keep claiming debounced figures for as long as the listener runs
+            await master_updater.run_queue(queue, listener, args.backfill_compaction, args.concurrency)
+        finally:
+            listener.cancel()
+            maintenance.cancel()
+            await asyncio.gather(listener, maintenance, return_exceptions=True)
+            queue.close()
+            if extractor.co_mention_deltas:
+                # Not applied since the last maintenance pass; the next run picks them up
+                save_co_mention_deltas(extractor.co_mention_deltas)
+        return
+
     # ALL YOUR EXISTING CONDITIONS REMAIN THE SAME:
     if args.run_ingestion:
         print("--- Running in INGESTION-ONLY mode ---")
-        extractor = PredefinedPublicFigureExtractor(csv_filepath=args.csv)
-        updated_figure_names = await extractor.process_new_articles(limit=args.ingestion_limit)
+        extractor = PredefinedPublicFigureExtractor(csv_filepath=args.csv, news_manager=master_updater.news_manager)
+        queue = WorkQueue(args.queue)
+        try:
+            updated_figure_names = await extractor.process_new_articles(limit=args.ingestion_limit, work_queue=queue)
+            pending = queue.counts()["pending"]
+        finally:
+            queue.close()
 
         if updated_figure_names:
             print(f"\nIngestion found {len(updated_figure_names)} figures with new articles: {', '.join(updated_figure_names)}")
-            figure_ids = [name.lower().replace(" ", "").replace("-", "").replace(".", "") for name in updated_figure_names]
-            
-            with open("figures_to_update.json", "w") as f:
-                json.dump(figure_ids, f)
-            print("Successfully saved list to 'figures_to_update.json'.")
+            print(f"Work queue '{args.queue}' now has {pending} figures pending.")
+
+            # Append to any deltas not yet applied by a previous --process-updated run
+            save_co_mention_deltas(extractor.co_mention_deltas)
             print("Run the next step with: python run_full_update.py --process-updated")
         else:
             print("\nIngestion complete. No new figures with articles were found.")
 
     elif args.figure:
-        related_figures_updater = RelatedFiguresUpdater()
-        await master_updater.run_full_update_for_figure(args.figure, related_figures_updater)
+        related_figures_updater = RelatedFiguresUpdater(news_manager=master_updater.news_manager)
+        await master_updater.run_figure(args.figure, related_figures_updater, args.backfill_compaction)
 
     elif args.all_figures:
-        print("\nPre-calculating all figure relationships for efficiency...")
-        related_figures_updater = RelatedFiguresUpdater()
-        
+        started_at = datetime.now(timezone.utc)
         all_ids = await master_updater.get_all_figure_ids()
         if not all_ids:
             print("No figures found to process.")
             return
             
-        for i, figure_id in enumerate(all_ids):
-            print(f"\n\n--- Processing Figure {i+1}/{len(all_ids)} ---")
-            await master_updater.run_full_update_for_figure(figure_id, related_figures_updater)
+        results = await master_updater.run_figures(all_ids, args.backfill_compaction, args.concurrency)
+        if results["remaining"]:
+            # The durable work queue is the checkpoint; --process-updated picks up from there
+            queue = WorkQueue(args.queue)
+            queue.push_many(results["remaining"])
+            queue.close()
+            print(f"Queued the {len(results['remaining'])} remaining figures in '{args.queue}'.")
+            print("Continue with: python run_full_update.py --process-updated")
+            # The relationship rebuild waits until every figure has been processed
+            return
+
+        # A single corpus scan rebuilds every figure's related figures
+        async def rebuild_related():
+            related_figures_updater = RelatedFiguresUpdater(news_manager=master_updater.news_manager)
+            # Another process of this sharded run may have rebuilt (and released the lease)
+            # already; the completion time is checked so this works without --run-id too
+            if await asyncio.to_thread(related_figures_updater.rebuilt_since, started_at):
+                print("\nRelated figures were already rebuilt since this run started; skipping the rebuild.")
+                return
+            print("\nRebuilding all figure relationships in a single pass...")
+            await asyncio.to_thread(related_figures_updater.rebuild_all)
+            await asyncio.to_thread(RelatedScoringEngine(related_figures_updater).run)
+
+        if master_updater.lease_manager:
+            # Only one of the processes sharing the run does the rebuild
+            await master_updater.lease_manager.run_leased(RELATED_REBUILD_LEASE, rebuild_related)
+        else:
+            await rebuild_related()
         
         print("\n\n🎉 All figures have been processed! 🎉")
         
     elif args.process_updated:
         print("--- Running in PROCESS-UPDATED mode ---")
+        queue = WorkQueue(args.queue)
         try:
-            with open("figures_to_update.json", "r") as f:
-                ids_to_process = json.load(f)
-            
-            if not ids_to_process:
-                print("'figures_to_update.json' is empty. No figures to process.")
+            import_legacy_file(queue)
+            counts = queue.counts()
+            pending = counts["pending"] + counts["leased"]  # Leases left by a crashed run expire and are reclaimed
+            if not pending:
+                print(f"Work queue '{args.queue}' is empty. No figures to process.")
+                print("Run the ingestion first with: python run_full_update.py --run-ingestion")
                 return
 
-            print(f"Found {len(ids_to_process)} figures to process from file.")
-            
-            related_figures_updater = RelatedFiguresUpdater()
-            for i, figure_id in enumerate(ids_to_process):
-                print(f"\n\n--- Processing Figure {i+1}/{len(ids_to_process)} ---")
-                await master_updater.run_full_update_for_figure(figure_id, related_figures_updater)
-            
-            print("\n\n🎉 All updated figures have been processed! 🎉")
-
-        except FileNotFoundError:
-            print("ERROR: 'figures_to_update.json' not found.")
-            print("Please run the ingestion first with: python run_full_update.py --run-ingestion")
+            print(f"Found {pending} figures to process in the work queue.")
+            await master_updater.run_queue(queue, None, args.backfill_compaction, args.concurrency)
+        finally:
+            queue.close()
 
+        co_mention_deltas = load_co_mention_deltas()
+        try:
+            master_updater.update_related_figures_incrementally(co_mention_deltas)
+        finally:
+            if co_mention_deltas:
+                save_co_mention_deltas(co_mention_deltas)  # Not applied; the next run retries them
+        await master_updater.update_trending_figures()
+        await master_updater.enrich_new_figures()
+        
+        print("\n\n🎉 All updated figures have been processed! 🎉")
 
 if __name__ == "__main__":
+    # Example: keep timelines within minutes of publication
+    # python run_full_update.py --listen --concurrency 2 --debounce 120
+    # Example: share a full-site update between two processes (or machines) with Firestore leases
+    # python run_full_update.py --all-figures --lease-backend firestore --run-id 2024-06-01 --concurrency 4
     asyncio.run(main())
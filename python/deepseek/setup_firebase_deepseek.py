@@ -1,19 +1,81 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-from dotenv import load_dotenv
+# firebase_admin, openai, httpx and dotenv are imported on first use, so importing
+# this module (and running `--help` on any script) stays as cheap as argparse.
 import os
-from typing import List
+from typing import List, TYPE_CHECKING
 import asyncio
-from openai import OpenAI
-from openai import AsyncOpenAI
+from llm_governor import GovernedClient
+
+if TYPE_CHECKING:
+    import httpx
+
+# --- CONFIGURATION ---
+# Connection pool for a long-running, shared DeepSeek client
+HTTP_MAX_CONNECTIONS = 64
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 120
+HTTP_TIMEOUT_SECONDS = 300.0  # Long completions
+HTTP_CONNECT_TIMEOUT_SECONDS = 10.0  # Fast failure on connect
+
+
+def create_http_client() -> "httpx.AsyncClient":
+    """
+    Creates a keep-alive HTTP client with tuned pool limits, using HTTP/2 when
+    the 'h2' package is installed (pip install httpx[http2]). Pass it to one
+    NewsManager and share that manager across a whole run, so every request
+    reuses the same connections instead of paying for new TLS handshakes.
+    """
+    import httpx
+
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        print("⚠️  'h2' is not installed; the pooled DeepSeek client will use HTTP/1.1.")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+    )
+
 
 class NewsManager:
-    def __init__(self):
-        self.db = self.setup_firebase()
-        self.setup_deepseek()
+    """
+    Holds the Firestore and DeepSeek clients. Both are created on first access
+    of `db` / `client`, so constructing a manager costs nothing.
+    """
+    def __init__(self, http_client: "httpx.AsyncClient" = None):
+        """
+        Args:
+            http_client (httpx.AsyncClient, optional): HTTP client for the DeepSeek API,
+                e.g. from create_http_client(). It is closed together with this manager.
+        """
+        self._http_client = http_client
+        self._db = None
+        self._client = None
+        self.model = "deepseek-chat"
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = self.setup_firebase()
+        return self._db
+
+    @property
+    def client(self):
+        if self._client is None:
+            self.setup_deepseek(self._http_client)
+        return self._client
         
-    def setup_deepseek(self):
+    def setup_deepseek(self, http_client: "httpx.AsyncClient" = None):
         """Initialize DeepSeek API client using the ASYNCHRONOUS client"""
+        from dotenv import load_dotenv
+        from openai import AsyncOpenAI
+
         load_dotenv()
         api_key = os.getenv('DEEPSEEK_API_KEY')
         
@@ -21,16 +83,22 @@ class NewsManager:
             raise ValueError("DEEPSEEK_API_KEY not found in environment variables")
         
         # UPDATED: Instantiate AsyncOpenAI for use with 'await'
-        self.client = AsyncOpenAI(
+        # Requests go through the process-wide LLMGovernor when one is installed
+        self._client = GovernedClient(AsyncOpenAI(
             api_key=api_key,
-            base_url="https://api.deepseek.com"
-        )
+            base_url="https://api.deepseek.com",
+            http_client=http_client
+        ))
         self.model = "deepseek-chat"
         
         print("✓ DeepSeek ASYNC client initialized successfully")
         
     def setup_firebase(self):
         """Initialize Firebase with environment variables and proper error handling"""
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        from dotenv import load_dotenv
+
         load_dotenv()
         
         try:
@@ -71,8 +139,11 @@ class NewsManager:
     async def close(self):
         """Properly close any resources"""
         try:
-            if hasattr(self.client, 'close'):
-                await self.client.close()
+            # Nothing to close if the client was never used
+            if self._client is not None and hasattr(self._client, 'close'):
+                await self._client.close()
+            elif self._http_client is not None:
+                await self._http_client.aclose()
         except Exception as e:
             print(f"Warning: Error while closing DeepSeek client: {e}")
     
@@ -225,5 +296,22 @@ class NewsManager:
         except Exception as e:
             print(f"\n❌ An error occurred during migration: {e}")
             raise
-        
-news_manager = NewsManager()
\ No newline at end of file
+
+
+_shared_news_manager = None
+
+
+def get_news_manager() -> NewsManager:
+    """Returns the process-wide NewsManager, creating it on first use."""
+    global _shared_news_manager
+    if _shared_news_manager is None:
+        _shared_news_manager = NewsManager()
+    return _shared_news_manager
+
+
+def __getattr__(name):
+    # Backwards compatibility for `from setup_firebase_deepseek import news_manager`,
+    # which used to build a manager at import time
+    if name == "news_manager":
+        return get_news_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
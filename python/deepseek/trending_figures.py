@@ -0,0 +1,201 @@
+# trending_figures.py
+
+import argparse
+import asyncio
+import math
+from datetime import datetime, timedelta, timezone
+from setup_firebase_deepseek import NewsManager
+from figure_identity import FigureIdentityResolver
+
+# --- CONFIGURATION ---
+PIPELINE_STATE_COLLECTION = "pipeline-state"
+TRENDING_STATE_DOC = "trending-figures"  # Decayed scores + watermark, internal to the job
+TRENDING_COLLECTION = "trending"
+TRENDING_DOC = "figures"  # Precomputed list read by the homepage in one fetch
+HALF_LIFE_DAYS = 3.0  # A mention's weight halves every HALF_LIFE_DAYS
+INITIAL_LOOKBACK_DAYS = 30  # First run only; older mentions would have decayed below 0.1%
+TOP_N = 30
+MIN_SCORE = 0.01  # Scores below this are dropped from the state document
+MAX_PENDING_HOLD_DAYS = 2  # Unprocessed articles older than this no longer hold the watermark back
+MAX_COUNTED_IDS = 15000  # Keeps the state document well under Firestore's 1 MiB limit
+
+
+def _parse_send_date(send_date):
+    """Parses a 'sendDate' (YYYYMMDD) into a UTC datetime, or None."""
+    try:
+        return datetime.strptime(str(send_date)[:8], "%Y%m%d").replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+class TrendingFiguresJob:
+    """
+    Ranks figures by time-decayed mention velocity in 'newsArticles'.
+
+    Scores are kept in a state document and decayed forward on every run, so
+    each run only reads the articles at or after the last watermark.
+    """
+    def __init__(self, news_manager: NewsManager = None, half_life_days: float = HALF_LIFE_DAYS, top_n: int = TOP_N):
+        """
+        Args:
+            news_manager (NewsManager, optional): A shared manager to reuse.
+            half_life_days (float): Half-life of a mention's weight.
+            top_n (int): Number of figures written to the trending document.
+        """
+        self._owns_manager = news_manager is None
+        self.news_manager = news_manager or NewsManager()
+        self.db = self.news_manager.db
+        self.half_life_days = half_life_days
+        self.top_n = top_n
+        self.state_ref = self.db.collection(PIPELINE_STATE_COLLECTION).document(TRENDING_STATE_DOC)
+        self.trending_ref = self.db.collection(TRENDING_COLLECTION).document(TRENDING_DOC)
+
+    def _decay(self, elapsed_days: float) -> float:
+        return 0.5 ** (max(elapsed_days, 0.0) / self.half_life_days)
+
+    def _load_state(self, now: datetime, rebuild: bool) -> dict:
+        state = {} if rebuild else (self.state_ref.get().to_dict() or {})
+        if not state.get("watermark_date"):
+            print(f"  -> No watermark found. Scanning the last {INITIAL_LOOKBACK_DAYS} days.")
+            return {
+                "scores": {},
+                "scored_at": now,
+                "watermark_date": (now - timedelta(days=INITIAL_LOOKBACK_DAYS)).strftime("%Y%m%d"),
+                "counted_ids": {},
+            }
+        return state
+
+    def update_scores(self, rebuild: bool = False) -> dict:
+        """
+        Decays the stored scores to now, adds the articles since the watermark,
+        and saves the new state.
+
+        Returns:
+            dict: {figure_id: score} for every figure with a non-negligible score.
+        """
+        from firebase_admin import firestore
+
+        now = datetime.now(timezone.utc)
+        state = self._load_state(now, rebuild)
+        elapsed_days = (now - state["scored_at"]).total_seconds() / 86400
+        scores = {figure_id: score * self._decay(elapsed_days) for figure_id, score in state["scores"].items()}
+        # Article IDs already counted at or after the watermark date, so re-reading the boundary is idempotent
+        counted_ids = dict(state.get("counted_ids", {}))
+
+        resolver = FigureIdentityResolver.load_or_build(self.db)
+        query = self.db.collection("newsArticles") \
+            .where(filter=firestore.FieldFilter("sendDate", ">=", state["watermark_date"])) \
+            .select(["public_figures", "public_figures_processed", "sendDate"])
+
+        new_articles = 0
+        pending_dates = []
+        hold_cutoff = (now - timedelta(days=MAX_PENDING_HOLD_DAYS)).strftime("%Y%m%d")
+        max_date = state["watermark_date"]
+        for article in query.stream():
+            article_data = article.to_dict()
+            send_date = str(article_data.get("sendDate", ""))[:8]
+            if article.id in counted_ids:
+                continue
+            if not article_data.get("public_figures_processed"):
+                # Not ingested yet; keep the watermark before it, unless it looks abandoned
+                if send_date >= hold_cutoff:
+                    pending_dates.append(send_date)
+                continue
+
+            sent_at = _parse_send_date(send_date)
+            if sent_at:
+                weight = self._decay((now - sent_at).total_seconds() / 86400)
+                for figure_id in resolver.resolve_many(article_data.get("public_figures", [])):
+                    scores[figure_id] = scores.get(figure_id, 0.0) + weight
+            counted_ids[article.id] = send_date
+            max_date = max(max_date, send_date)
+            new_articles += 1
+
+        watermark_date = min(pending_dates) if pending_dates else max_date
+        watermark_date = self._cap_watermark(counted_ids, watermark_date)
+        counted_ids = {article_id: date for article_id, date in counted_ids.items() if date >= watermark_date}
+        scores = {figure_id: score for figure_id, score in scores.items() if score >= MIN_SCORE}
+
+        self.state_ref.set({
+            "scores": scores,
+            "scored_at": now,
+            "watermark_date": watermark_date,
+            "counted_ids": counted_ids,
+            "half_life_days": self.half_life_days,
+        })
+        print(f"  ✓ Added {new_articles} new articles; watermark is now {watermark_date} "
+              f"({len(pending_dates)} articles still awaiting ingestion).")
+        return scores
+
+    def _cap_watermark(self, counted_ids: dict, watermark_date: str) -> str:
+        """
+        Moves the watermark forward by whole days until at most MAX_COUNTED_IDS
+        counted articles are on or after it. Articles before the new watermark
+        are no longer read, so a late ingestion of one of them is not counted.
+        """
+        dates = sorted((date for date in counted_ids.values() if date >= watermark_date), reverse=True)
+        if len(dates) <= MAX_COUNTED_IDS:
+            return watermark_date
+        capped = dates[MAX_COUNTED_IDS - 1]
+        if dates[MAX_COUNTED_IDS] == capped:
+            # The boundary day doesn't fit entirely; start at the next day
+            capped = (_parse_send_date(capped) + timedelta(days=1)).strftime("%Y%m%d")
+        print(f"  ⚠️ {len(dates)} counted articles since {watermark_date}; moving the watermark to {capped}")
+        return capped
+
+    def write_trending(self, scores: dict) -> list:
+        """Writes the top figures with the fields the homepage renders to the trending document."""
+        from firebase_admin import firestore
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.top_n]
+        figure_refs = [self.db.collection("selected-figures").document(figure_id) for figure_id, _ in top]
+        figure_docs = {doc.id: doc.to_dict() or {} for doc in self.db.get_all(figure_refs, field_paths=["name", "profilePic"]) if doc.exists}
+
+        figures = []
+        for figure_id, score in top:
+            if figure_id not in figure_docs:
+                continue
+            figures.append({
+                "id": figure_id,
+                "name": figure_docs[figure_id].get("name", ""),
+                "profilePic": figure_docs[figure_id].get("profilePic", ""),
+                # Decayed mentions per day
+                "score": round(score * math.log(2) / self.half_life_days, 3),
+            })
+
+        self.trending_ref.set({
+            "figures": figures,
+            "updatedAt": firestore.SERVER_TIMESTAMP,
+            "half_life_days": self.half_life_days,
+        })
+        print(f"✓ Wrote {len(figures)} trending figures to '{TRENDING_COLLECTION}/{TRENDING_DOC}'.")
+        return figures
+
+    async def run(self, rebuild: bool = False):
+        print("🚀 Updating trending figures...")
+        try:
+            figures = self.write_trending(self.update_scores(rebuild=rebuild))
+            for i, figure in enumerate(figures[:10], 1):
+                print(f"    {i:2d}. {figure['name']} ({figure['id']}): {figure['score']}")
+        finally:
+            if self._owns_manager:
+                await self.news_manager.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Ranks figures by time-decayed mention velocity for the homepage.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help=f"Ignore the stored state and rescan the last {INITIAL_LOOKBACK_DAYS} days.")
+    parser.add_argument("--half-life-days", type=float, default=HALF_LIFE_DAYS,
+                        help=f"Half-life of a mention's weight (default: {HALF_LIFE_DAYS}).")
+    parser.add_argument("--top", type=int, default=TOP_N, help=f"Number of figures to publish (default: {TOP_N}).")
+    args = parser.parse_args()
+
+    await TrendingFiguresJob(half_life_days=args.half_life_days, top_n=args.top).run(rebuild=args.rebuild)
+
+
+if __name__ == "__main__":
+    # Example:
+    # python trending_figures.py
+    # python trending_figures.py --rebuild --half-life-days 7
+    asyncio.run(main())
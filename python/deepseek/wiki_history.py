@@ -0,0 +1,175 @@
+# wiki_history.py
+
+import argparse
+import asyncio
+import hashlib
+from setup_firebase_deepseek import NewsManager
+
+# --- CONFIGURATION ---
+WIKI_CONTENT_COLLECTION = "wiki-content"
+WIKI_HISTORY_COLLECTION = "wiki-history"  # Cold storage for prior versions, never read by the frontend
+
+
+def content_hash(content: str) -> str:
+    """Returns a stable SHA-256 hex digest for a piece of wiki text."""
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def archive_wiki_version(wiki_doc_ref, content: str, reason: str, batch=None) -> str:
+    """
+    Stores a prior version of a 'wiki-content' document in the figure's
+    'wiki-history' subcollection and returns its content hash.
+
+    The history document ID is derived from the wiki document ID and the
+    content hash, so archiving the same text twice is idempotent.
+
+    Args:
+        wiki_doc_ref: Reference to selected-figures/{id}/wiki-content/{doc_id}.
+        content (str): The text being replaced.
+        reason (str): Why the version was archived (e.g. 'compaction', 'wiki-update').
+        batch: Optional write batch. If omitted, the history doc is written immediately.
+    """
+    from firebase_admin import firestore
+
+    digest = content_hash(content)
+    figure_ref = wiki_doc_ref.parent.parent
+    history_ref = figure_ref.collection(WIKI_HISTORY_COLLECTION).document(f"{wiki_doc_ref.id}-{digest[:20]}")
+    history_data = {
+        "wiki_doc_id": wiki_doc_ref.id,
+        "content": content,
+        "content_hash": digest,
+        "length": len(content or ""),
+        "reason": reason,
+        "archived_at": firestore.SERVER_TIMESTAMP,
+    }
+    if batch is not None:
+        batch.set(history_ref, history_data)
+    else:
+        history_ref.set(history_data)
+    return digest
+
+
+def load_wiki_version(wiki_doc_ref, version_hash: str):
+    """
+    Returns the archived text of a 'wiki-content' document for a full content
+    hash (as returned by archive_wiki_version), or None if it is not archived.
+    """
+    figure_ref = wiki_doc_ref.parent.parent
+    history_doc = figure_ref.collection(WIKI_HISTORY_COLLECTION) \
+        .document(f"{wiki_doc_ref.id}-{version_hash[:20]}").get()
+    if not history_doc.exists:
+        return None
+    return history_doc.to_dict().get("content")
+
+
+def restore_wiki_version(db, figure_id: str, wiki_doc_id: str, version_hash: str) -> bool:
+    """
+    Rolls a 'wiki-content' document back to an archived version. The current
+    content is archived first so the rollback itself can be undone.
+    """
+    from firebase_admin import firestore
+
+    figure_ref = db.collection("selected-figures").document(figure_id)
+    history_docs = figure_ref.collection(WIKI_HISTORY_COLLECTION) \
+        .where("wiki_doc_id", "==", wiki_doc_id).stream()
+
+    match = None
+    for history_doc in history_docs:
+        if history_doc.to_dict().get("content_hash", "").startswith(version_hash):
+            match = history_doc.to_dict()
+            break
+
+    if not match:
+        print(f"❌ No archived version '{version_hash}' found for '{figure_id}/{wiki_doc_id}'.")
+        return False
+
+    wiki_doc_ref = figure_ref.collection(WIKI_CONTENT_COLLECTION).document(wiki_doc_id)
+    current = wiki_doc_ref.get()
+    batch = db.batch()
+    if current.exists and current.to_dict().get("content"):
+        archive_wiki_version(wiki_doc_ref, current.to_dict()["content"], reason="pre-rollback", batch=batch)
+    batch.set(wiki_doc_ref, {
+        "content": match["content"],
+        "lastUpdated": firestore.SERVER_TIMESTAMP,
+        # The restored text is the full version now; drop the pointer to the replaced full
+        # text so the next update edits the restored content, and let compaction redo it
+        "full_content_hash": firestore.DELETE_FIELD,
+        "is_compacted": False,
+    }, merge=True)
+    batch.commit()
+    print(f"✓ Restored '{figure_id}/{wiki_doc_id}' to version {match['content_hash'][:12]}.")
+    return True
+
+
+def migrate_original_content(db, figure_id: str = None):
+    """
+    One-time migration: moves legacy 'original_content' backups out of the hot
+    'wiki-content' documents into 'wiki-history' and deletes the field.
+    """
+    from firebase_admin import firestore
+
+    if figure_id:
+        print(f"--- RUNNING IN TEST MODE FOR FIGURE: {figure_id} ---")
+        wiki_docs = db.collection("selected-figures").document(figure_id) \
+            .collection(WIKI_CONTENT_COLLECTION).stream()
+    else:
+        print("--- RUNNING IN FULL MIGRATION MODE ---")
+        wiki_docs = db.collection_group(WIKI_CONTENT_COLLECTION).stream()
+
+    batch = db.batch()
+    pending_ops = 0
+    moved_count = 0
+
+    for wiki_doc in wiki_docs:
+        original_content = wiki_doc.to_dict().get("original_content")
+        if original_content is None:
+            continue
+
+        if original_content:
+            archive_wiki_version(wiki_doc.reference, original_content, reason="compaction", batch=batch)
+            pending_ops += 1
+        batch.update(wiki_doc.reference, {"original_content": firestore.DELETE_FIELD})
+        pending_ops += 1
+        moved_count += 1
+        print(f"  -> Moving original_content of '{wiki_doc.reference.path}' to history")
+
+        # Firestore batches have a limit of 500 operations.
+        if pending_ops >= 400:
+            batch.commit()
+            batch = db.batch()
+            pending_ops = 0
+
+    if pending_ops:
+        batch.commit()
+
+    print(f"\n✅ Migration complete. Moved {moved_count} backups into '{WIKI_HISTORY_COLLECTION}'.")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Manage archived versions of 'wiki-content' documents.")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Move legacy 'original_content' fields into the 'wiki-history' subcollection.")
+    parser.add_argument("--figure", type=str, help="Limit the migration to a single figure ID.")
+    parser.add_argument("--restore", nargs=2, metavar=("WIKI_DOC_ID", "CONTENT_HASH"),
+                        help="Roll a wiki document of --figure back to an archived version.")
+    args = parser.parse_args()
+
+    manager = NewsManager()
+    try:
+        if args.restore:
+            if not args.figure:
+                parser.error("--restore requires --figure")
+            restore_wiki_version(manager.db, args.figure, args.restore[0], args.restore[1])
+        elif args.migrate:
+            migrate_original_content(manager.db, figure_id=args.figure)
+        else:
+            parser.print_help()
+    finally:
+        await manager.close()
+
+
+if __name__ == "__main__":
+    # Examples:
+    # python wiki_history.py --migrate
+    # python wiki_history.py --figure newjeans --restore main-overview 3f2a9c
+    asyncio.run(main())
@@ -0,0 +1,202 @@
+# work_queue.py
+
+# Durable local queue of figure IDs between ingestion and processing.
+#
+# Ingestion pushes a figure as soon as its summaries are saved; processing
+# workers claim figures, run their pipeline and ack them. Items are leased
+# rather than removed when claimed, so a crashed worker's figures become
+# claimable again once the lease expires (at-least-once delivery). Pushes are
+# deduplicated by figure ID: a figure that is already pending stays one item,
+# and a figure pushed while a worker holds it is marked dirty and re-queued
+# on ack, so articles saved mid-run are never missed.
+
+import os
+import sqlite3
+import time
+
+# --- CONFIGURATION ---
+DEFAULT_QUEUE_PATH = "figure_work_queue.sqlite3"
+DEFAULT_LEASE_SECONDS = 30 * 60  # Longer than the slowest figure pipeline
+DEFAULT_MAX_ATTEMPTS = 3  # Failures before an item is parked as 'failed'
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    figure_id   TEXT PRIMARY KEY,
+    state       TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    dirty       INTEGER NOT NULL DEFAULT 0,
+    last_error  TEXT,
+    priority    REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS work_items_state ON work_items (state, enqueued_at);
+"""
+
+
+class WorkQueue:
+    """
+    SQLite-backed queue of figure IDs with deduplication and leases.
+    Safe to share between processes on one machine; within a process, use
+    it from a single thread (the asyncio event loop).
+    """
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, lease_seconds: int = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            path (str): SQLite database file. Created if missing.
+            lease_seconds (int): How long a claimed item stays invisible to other workers.
+            max_attempts (int): Failed attempts before an item stops being retried.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit mode; every multi-statement change takes an explicit write lock
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(work_items)")}
+        if "priority" not in columns:  # Queue files created before priorities existed
+            self._conn.execute("ALTER TABLE work_items ADD COLUMN priority REAL NOT NULL DEFAULT 0")
+
+    def push(self, figure_id: str) -> bool:
+        """
+        Queues a figure for processing. Returns True if a new pending item was
+        created, False if the figure was already pending or is re-queued after
+        its current lease.
+        """
+        now = time.time()
+        with self._write():
+            row = self._conn.execute("SELECT state FROM work_items WHERE figure_id = ?", (figure_id,)).fetchone()
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO work_items (figure_id, state, enqueued_at) VALUES (?, ?, ?)",
+                    (figure_id, PENDING, now)
+                )
+                return True
+            if row[0] == PENDING:
+                return False
+            if row[0] == LEASED:
+                # New work arrived while a worker has the figure; run it again after the ack
+                self._conn.execute("UPDATE work_items SET dirty = 1 WHERE figure_id = ?", (figure_id,))
+                return False
+            # Done or failed: start over
+            self._conn.execute(
+                "UPDATE work_items SET state = ?, enqueued_at = ?, lease_until = NULL, attempts = 0, "
+                "dirty = 0, last_error = NULL WHERE figure_id = ?",
+                (PENDING, now, figure_id)
+            )
+            return True
+
+    def push_many(self, figure_ids) -> int:
+        """Queues several figures. Returns the number of new pending items."""
+        return sum(1 for figure_id in figure_ids if self.push(figure_id))
+
+    def claim(self):
+        """
+        Leases the highest-priority pending item (oldest first among equals), or
+        one whose lease expired, and returns its figure ID, or None when nothing
+        is claimable.
+        """
+        now = time.time()
+        with self._write():
+            row = self._conn.execute(
+                "SELECT figure_id FROM work_items "
+                "WHERE state = ? OR (state = ? AND lease_until < ?) "
+                "ORDER BY priority DESC, enqueued_at LIMIT 1",
+                (PENDING, LEASED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE work_items SET state = ?, lease_until = ?, dirty = 0 WHERE figure_id = ?",
+                (LEASED, now + self.lease_seconds, row[0])
+            )
+            return row[0]
+
+    def ack(self, figure_id: str):
+        """Marks a claimed figure as processed, re-queueing it if it was pushed again meanwhile."""
+        with self._write():
+            self._conn.execute(
+                "UPDATE work_items SET state = CASE dirty WHEN 1 THEN ? ELSE ? END, "
+                "lease_until = NULL, attempts = 0, dirty = 0, last_error = NULL WHERE figure_id = ?",
+                (PENDING, DONE, figure_id)
+            )
+
+    def fail(self, figure_id: str, error: str):
+        """Returns a claimed figure to the queue, or parks it as failed after max_attempts."""
+        with self._write():
+            self._conn.execute(
+                "UPDATE work_items SET attempts = attempts + 1, lease_until = NULL, last_error = ?, "
+                "state = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END WHERE figure_id = ?",
+                (error, self.max_attempts, FAILED, PENDING, figure_id)
+            )
+
+    def pending_ids(self) -> list:
+        """Figure IDs waiting to be claimed, in claim order."""
+        return [row[0] for row in self._conn.execute(
+            "SELECT figure_id FROM work_items WHERE state = ? ORDER BY priority DESC, enqueued_at", (PENDING,)
+        ).fetchall()]
+
+    def set_priorities(self, priorities: dict):
+        """Sets the claim priority of queued figures ({figure_id: priority}, higher first)."""
+        with self._write():
+            self._conn.executemany(
+                "UPDATE work_items SET priority = ? WHERE figure_id = ?",
+                [(priority, figure_id) for figure_id, priority in priorities.items()]
+            )
+
+    def counts(self) -> dict:
+        """Number of items in each state."""
+        rows = self._conn.execute("SELECT state, COUNT(*) FROM work_items GROUP BY state").fetchall()
+        return {state: 0 for state in (PENDING, LEASED, DONE, FAILED)} | dict(rows)
+
+    def failed_items(self) -> dict:
+        """{figure_id: last_error} for items that ran out of attempts."""
+        return dict(self._conn.execute(
+            "SELECT figure_id, last_error FROM work_items WHERE state = ?", (FAILED,)
+        ).fetchall())
+
+    def purge_done(self):
+        """Deletes finished items so the file doesn't grow without bound."""
+        with self._write():
+            self._conn.execute("DELETE FROM work_items WHERE state = ?", (DONE,))
+
+    def close(self):
+        self._conn.close()
+
+    def _write(self):
+        return _WriteTransaction(self._conn)
+
+
+class _WriteTransaction:
+    """BEGIN IMMEDIATE ... COMMIT, so a read-then-write is atomic across processes."""
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __enter__(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def import_legacy_file(queue: WorkQueue, path: str = "figures_to_update.json") -> int:
+    """
+    Queues the figure IDs left in a 'figures_to_update.json' from an older
+    ingestion run and removes the file. Returns the number of IDs imported.
+    """
+    import json
+
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r") as f:
+        figure_ids = json.load(f) or []
+    queue.push_many(figure_ids)
+    os.remove(path)
+    print(f"✓ Imported {len(figure_ids)} figures from legacy '{path}' into the work queue")
+    return len(figure_ids)
@@ -40,6 +40,7 @@ interface PublicFigureBase {
     company?: string;
     debutDate?: string;
     related_figures?: Record<string, number>
+    related_figures_scored?: Record<string, number>
 }
 
 interface IndividualPerson extends PublicFigureBase {
@@ -204,6 +205,7 @@ async function getPublicFigureData(publicFigureSlug: string): Promise<PublicFigu
         debutDate: data.debutDate || '',
         lastUpdated: data.lastUpdated || '',
         related_figures: data.related_figures || {},
+        related_figures_scored: data.related_figures_scored || {},
     };
 
     if (publicFigureData.is_group) {
@@ -334,11 +336,17 @@ async function PublicFigurePageContent({ publicFigureId }: { publicFigureId: str
         // console.log(`Found ${uniqueArticleIds.length} unique source IDs.`);
         // console.log(uniqueArticleIds);
 
-        const relatedFiguresObject = publicFigureData.related_figures || {};
+        // Prefer the time-decayed, normalized scores; fall back to raw co-mention counts
+        const scoredFiguresObject = publicFigureData.related_figures_scored || {};
+        const relatedFiguresObject = Object.keys(scoredFiguresObject).length > 0
+            ? scoredFiguresObject
+            : publicFigureData.related_figures || {};
 
         // 1. Get [key, value] pairs: [['akmu', 25], ['kimsoohyun', 18]]
         const similarFigureIds = Object.entries(relatedFiguresObject)
-            // 2. Sort pairs by count (the value) in descending order
+            // Incremental decrements can leave counts at zero until the next rebuild
+            .filter(([, count]) => count > 0)
+            // 2. Sort pairs by score (the value) in descending order
             .sort(([, countA], [, countB]) => countB - countA)
             // 3. Extract just the ID (the key) from the sorted pairs
             .map(([figureId]) => figureId)
@@ -41,7 +41,15 @@ interface HomepageFigureFromDB {
     profilePic?: string;
 }
 
-// Hardcoded list of top 30 figures to display on homepage
+// Precomputed by python/deepseek/trending_figures.py
+interface TrendingFigure {
+    id: string;
+    name: string;
+    profilePic?: string;
+    score: number;
+}
+
+// Fallback list of top 30 figures, used until the trending document exists
 const TOP_FIGURES_IDS = [
     "bts", "blackpink", "bigbang", "exo", "bongjoonho", "jungkook",
     "rm", "girls'generation", "twice", "suga", "jimin", "jin",
@@ -56,7 +64,21 @@ export async function GET(request: Request) {
         const isTopRequest = url.pathname.includes('/top');
 
         if (isTopRequest) {
-            // --- OPTIMIZED LOGIC FOR TOP FIGURES ---
+            // --- TRENDING FIGURES: a single document fetch ---
+            const trendingSnapshot = await getDoc(doc(db, 'trending', 'figures'));
+            const trendingFigures = (trendingSnapshot.exists()
+                ? trendingSnapshot.data().figures
+                : []) as TrendingFigure[] | undefined;
+
+            if (trendingFigures && trendingFigures.length > 0) {
+                return NextResponse.json(trendingFigures.map(figure => ({
+                    id: figure.id,
+                    name: figure.name,
+                    profilePic: figure.profilePic || '/images/default-profile.png'
+                })));
+            }
+
+            // --- FALLBACK: HARDCODED TOP FIGURES ---
             const figuresRef = collection(db, 'selected-figures');
 
             const q = query(figuresRef, where(documentId(), 'in', TOP_FIGURES_IDS));